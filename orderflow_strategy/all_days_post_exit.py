@@ -3,16 +3,16 @@ import json, sys
 from pathlib import Path
 import numpy as np
 sys.path.insert(0, str(Path(__file__).parent))
-from config import DATA_DIR
+from config import DATA_DIR, dbn_files, dbn_stem
 from backtest_engine import load_dbn_streaming, run_backtest
 
 BAR_SEC = 60.0
 params = json.loads((DATA_DIR / "baseline_params.json").read_text())
-files = sorted(DATA_DIR.glob("mnq_*_RTH_*.dbn"))
+files = dbn_files()
 all_rows = []
 for f in files:
     bars, tr = load_dbn_streaming(f, freq_sec=BAR_SEC)
-    r, details = run_backtest(bars=bars, trades_df=tr, params=params, bar_sec=BAR_SEC, return_trade_details=True, day_label=f.stem)
+    r, details = run_backtest(bars=bars, trades_df=tr, params=params, bar_sec=BAR_SEC, return_trade_details=True, day_label=dbn_stem(f))
     mid = bars["mid"].values
     for d in details:
         exit_bar = d["exit_bar"]
@@ -24,7 +24,7 @@ for f in files:
         low_vs_exit = float(post60_low - ex)
         tp_dist = d.get("tp_distance_pts")
         all_rows.append({
-            "day": f.stem, "exit_reason": d["exit_reason"], "pnl_pts": d["pnl_pts"],
+            "day": dbn_stem(f), "exit_reason": d["exit_reason"], "pnl_pts": d["pnl_pts"],
             "tp_distance_pts": tp_dist, "post60_run_pts": run60, "post60_low_vs_exit": low_vs_exit,
             "mfe_pts": d["mfe_pts"], "mae_pts": d["mae_pts"],
         })
@@ -14,7 +14,7 @@ import numpy as np
 import databento as db
 
 sys.path.insert(0, str(Path(__file__).parent))
-from config import DATA_DIR
+from config import dbn_files
 
 
 def stream_analyze(dbn_path: Path):
@@ -59,7 +59,7 @@ def stream_analyze(dbn_path: Path):
 
 
 def main():
-    files = sorted(DATA_DIR.glob("mnq_*_RTH_*.dbn"))
+    files = dbn_files()
     if not files:
         print("No RTH .dbn files in data/")
         return
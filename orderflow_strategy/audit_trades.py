@@ -12,7 +12,7 @@ import numpy as np
 
 sys.path.insert(0, str(Path(__file__).parent))
 
-from config import DATA_DIR
+from config import DATA_DIR, dbn_files, dbn_stem
 from backtest_engine import load_dbn_streaming, run_backtest, get_best_params, BacktestResult
 
 
@@ -74,7 +74,7 @@ def main():
     args = ap.parse_args()
 
     bar_sec = 60.0
-    all_files = sorted(DATA_DIR.glob("mnq_*_RTH_*.dbn"))
+    all_files = dbn_files()
     if not all_files:
         print("No .dbn files in data/. Run fetch first.")
         return
@@ -118,7 +118,7 @@ def main():
         bars, trades_df = load_dbn_streaming(f, freq_sec=bar_sec)
         out = run_backtest(
             bars=bars, trades_df=trades_df, params=params, bar_sec=bar_sec,
-            return_trade_details=True, day_label=f.stem,
+            return_trade_details=True, day_label=dbn_stem(f),
         )
         if isinstance(out, tuple):
             result, details = out
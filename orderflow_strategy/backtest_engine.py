@@ -14,15 +14,36 @@ Exit: Reversal BOS or SL below support. All no look-ahead.
 from pathlib import Path
 from dataclasses import dataclass, field
 from typing import Optional
-from collections import defaultdict
+from collections import OrderedDict, defaultdict
 import itertools
 
 import databento as db
 import pandas as pd
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 
-from config import DATA_DIR
+from config import dbn_files, dbn_stem
 from backtest_params import ParamGrid
+import bar_cache
+from cob_ladder import CobLadder, ResistanceIndex
+from bar_arrays import BarArrays
+from bar_builder import (
+    BarAccumulator,
+    feed_dbn,
+    load_dbn_vectorized,
+    load_dbn_multi_vectorized,
+    TICK_PX,
+    UNDEF_PRICE,
+    NO_PRICE_TICKS,
+)
+from trade_tape import TradeTape, SIDE_CODES
+from bos_detector import BosDetector
+from instruments import Instrument, dbn_instrument
+from latency import LatencyRecorder
+import backtest_kernel
+
+# Bump whenever load_dbn_streaming's output changes: invalidates every data/bar_cache entry.
+LOADER_VERSION = 4
 
 
 @dataclass
@@ -37,23 +58,302 @@ class BacktestResult:
     win_rate: float = 0.0
 
 
+# run_backtest_batch's metrics matrix columns (BacktestResult fields)
+BATCH_METRICS = ("trades", "total_pnl_ticks", "wins", "losses", "max_drawdown_ticks", "win_rate", "sharpe")
+
+
+# Params the entry search reads (with run_backtest's defaults): configs that agree on these share entries
+ENTRY_PARAMS = {
+    "min_passive_accumulation_count": 3,
+    "passive_cob_threshold": 50,
+    "passive_lookback_bars": 60,
+    "key_level_points": 20,
+    "aggressive_min_volume": 150,
+    "aggressive_window_seconds": 60,
+    "bos_swing_lookback": 10,
+    "bos_min_break_ticks": 2,
+    "bos_search_bars": 120,
+    "bounce_bars": 3,
+    "enable_shorts": True,
+    "no_first_minutes": 0,
+    "lunch_window": "none",
+    "entry_bar_offset": 0,
+}
+# LRU bound on memoized entries per DayContext, in entries held (each a few dozen bytes)
+ENTRY_MEMO_MAX_ENTRIES = 100_000
+
+
+class _EntrySequence:
+    """A _generate_entries run, advanced only as far as a consumer iterates and kept for the next one."""
+
+    def __init__(self, gen, on_item=None):
+        self._gen = gen
+        self.items = []
+        self.done = False
+        self.on_item = on_item  # called after each new item (the owning memo's size count); None once evicted
+
+    def __iter__(self):
+        k = 0
+        while True:
+            if k == len(self.items):
+                if self.done:
+                    return
+                try:
+                    self.items.append(next(self._gen))
+                except StopIteration:
+                    self.done = True
+                    self._gen = None
+                    return
+                if self.on_item is not None:
+                    self.on_item()
+            yield self.items[k]
+            k += 1
+
+
+@dataclass
+class DayContext:
+    """
+    One day's inputs for run_backtest / run_backtest_batch: bar arrays, half-tick prices and the trade tape,
+    plus features that depend on one param only (swing masks per bos_swing_lookback, passive masks per
+    passive_cob_threshold, aggression windows per aggressive_window_seconds, bounce windows, COB ladder),
+    each built on first use and then shared by every config run on this context. Entry-search BOS scans
+    are memoized too: configs with the same lookback / break ticks / search window reuse each other's.
+    Whole entry sequences are memoized per ENTRY_PARAMS values (LRU, ENTRY_MEMO_MAX_ENTRIES), so configs
+    that differ only in exit params run the exit stage alone.
+    """
+    bars: Optional[pd.DataFrame]         # None for a context over prebuilt arrays (from_arrays)
+    arr: BarArrays
+    price: np.ndarray                    # int64 half ticks
+    running_max: np.ndarray              # session high / low up to each bar
+    running_min: np.ndarray
+    bar_sec: float
+    trades: Optional[TradeTape] = None
+    df: Optional[pd.DataFrame] = None    # only when built from a raw df
+    _cache: dict = field(default_factory=dict, repr=False)
+    _entry_memo: OrderedDict = field(default_factory=OrderedDict, repr=False)
+    _entry_held: int = field(default=0, repr=False)  # entries held by _entry_memo, + 1 per sequence
+
+    @classmethod
+    def build(
+        cls,
+        bars: Optional[pd.DataFrame] = None,
+        trades_df=None,
+        bar_sec: float = 1.0,
+        df: Optional[pd.DataFrame] = None,
+    ) -> Optional["DayContext"]:
+        """Same inputs as run_backtest. None when there are fewer than 20 bars (nothing to backtest)."""
+        if bars is None and df is not None:
+            bars = _build_bars(df, freq_sec=bar_sec)
+        if bars is not None and trades_df is None and df is not None:
+            trades_df = df[df["action"] == "T"][["side", "size"]].copy()
+            trades_df["ts_recv"] = pd.to_datetime(df.loc[df["action"] == "T"].index.get_level_values("ts_recv"))
+        if bars is None or len(bars) < 20:
+            return None
+        arr = BarArrays.from_frame(bars)
+        price = _to_half_ticks(arr.mid)
+        return cls(
+            bars=bars,
+            arr=arr,
+            price=price,
+            running_max=np.maximum.accumulate(price),
+            running_min=np.minimum.accumulate(price),
+            bar_sec=bar_sec,
+            trades=TradeTape.coerce(trades_df),
+            df=df,
+        )
+
+    @classmethod
+    def from_arrays(
+        cls,
+        arr: BarArrays,
+        price: np.ndarray,
+        running_max: np.ndarray,
+        running_min: np.ndarray,
+        bar_sec: float,
+        trades: Optional[TradeTape] = None,
+        cob: Optional[CobLadder] = None,
+        cob_rows: Optional[np.ndarray] = None,
+    ) -> "DayContext":
+        """
+        A context over already built arrays, without a bars frame (e.g. views into a shared-memory day,
+        day_store.SharedDay): the COB ladder and each bar's row in it are given instead of read off the bars.
+        """
+        ctx = cls(bars=None, arr=arr, price=price, running_max=running_max, running_min=running_min,
+                  bar_sec=bar_sec, trades=trades)
+        ctx._cache[("cob",)] = (cob, cob_rows)
+        return ctx
+
+    def _cached(self, key, build):
+        if key not in self._cache:
+            self._cache[key] = build()
+        return self._cache[key]
+
+    def swings(self, lookback: int) -> tuple:
+        """_swing_masks(price, lookback)."""
+        return self._cached(("swings", lookback), lambda: _swing_masks(self.price, lookback))
+
+    def bounce(self, bounce_bars: int) -> tuple:
+        """(max, min) of price[t + 1 : t + bounce_bars + 1] per bar t (int64 min / max sentinels past the end)."""
+        def build():
+            n = len(self.price)
+            bounce_max = np.full(n, np.iinfo(np.int64).min, dtype=np.int64)
+            bounce_min = np.full(n, np.iinfo(np.int64).max, dtype=np.int64)
+            if bounce_bars > 0 and n > bounce_bars:
+                win = sliding_window_view(self.price[1:], bounce_bars)
+                bounce_max[: len(win)] = win.max(axis=1)
+                bounce_min[: len(win)] = win.min(axis=1)
+            return bounce_max, bounce_min
+        return self._cached(("bounce", bounce_bars), build)
+
+    def aggression(self, agg_win_sec: int) -> Optional[tuple]:
+        """_aggression_windows for this window length."""
+        return self._cached(
+            ("aggression", agg_win_sec), lambda: _aggression_windows(self.arr, self.trades, self.bar_sec, agg_win_sec)
+        )
+
+    def entries(self, params: dict) -> _EntrySequence:
+        """_generate_entries(self, params), memoized by the ENTRY_PARAMS subset of params (LRU)."""
+        key = tuple(params.get(name, default) for name, default in ENTRY_PARAMS.items())
+        seq = self._entry_memo.get(key)
+        if seq is not None:
+            self._entry_memo.move_to_end(key)
+            return seq
+        seq = _EntrySequence(_generate_entries(self, params), self._entry_added)
+        self._entry_memo[key] = seq
+        self._entry_added()
+        return seq
+
+    def _entry_added(self) -> None:
+        """
+        Count one more entry held by the memo (sequences grow as they are iterated) and evict least
+        recently used sequences while over ENTRY_MEMO_MAX_ENTRIES; the most recent one is always kept.
+        """
+        self._entry_held += 1
+        while self._entry_held > ENTRY_MEMO_MAX_ENTRIES and len(self._entry_memo) > 1:
+            _, evicted = self._entry_memo.popitem(last=False)
+            evicted.on_item = None  # a consumer still iterating it no longer counts against the memo
+            self._entry_held -= len(evicted.items) + 1
+
+    def bos(self, start: int, length: int, lookback: int, min_break_ticks: int, direction: str) -> list:
+        """_detect_bos on price[start : start + length] with the day's swing masks, memoized per scan."""
+        key = ("bos", start, length, lookback, min_break_ticks, direction)
+        if key not in self._cache:
+            self._cache[key] = _detect_bos(
+                self.price[start : start + length], lookback, min_break_ticks, direction,
+                HALF_TICKS_PER_TICK, self.swings(lookback), start,
+            )
+        return self._cache[key]
+
+    def bounce_candidates(self, bounce_bars: int, direction: str) -> np.ndarray:
+        """
+        Sorted bars t that can retest and bounce at all: some bar in the bounce window trades above (long) /
+        below (short) price[t]. Any level's retest-and-bounce bars are a subset, found with searchsorted.
+        """
+        def build():
+            bounce_max, bounce_min = self.bounce(bounce_bars)
+            return np.flatnonzero(self.price < bounce_max if direction == "long" else self.price > bounce_min)
+        return self._cached(("bounce_candidates", bounce_bars, direction), build)
+
+    def resistance(self, min_depth: float, near_key_pts: float) -> Optional[ResistanceIndex]:
+        """COB TP lookup (half ticks) for cob_tp_threshold / cob_near_key_pts; None without a ladder."""
+        def build():
+            ladder = self.cob()[0]
+            if ladder is None:
+                return None
+            PT = HALF_TICKS_PER_POINT
+            return ResistanceIndex(ladder, min_depth, near_key_pts * PT, 50 * PT, unit=HALF_TICKS_PER_TICK)
+        return self._cached(("resistance", min_depth, near_key_pts), build)
+
+    def passive_mask(self, direction: str, threshold: float) -> tuple:
+        """(depth >= threshold per bar, prefix count of it) for the passive side of direction."""
+        def build():
+            above = self.arr.depth(direction) >= threshold
+            return above, np.concatenate(([0], np.cumsum(above)))
+        return self._cached(("passive", direction, threshold), build)
+
+    def passive_level(self, start_idx: int, lookback_bars: int, threshold: float, min_count: int, direction: str) -> tuple:
+        """_passive_accumulation_level on the half-tick prices, counting from the cached mask's prefix sums."""
+        above, count = self.passive_mask(direction, threshold)
+        end = start_idx + 1
+        start = max(0, start_idx - lookback_bars)
+        if count[end] - count[start] < min_count:
+            return False, None
+        acc_mids = self.price[start:end][above[start:end]]
+        return True, (np.min(acc_mids) if direction == "long" else np.max(acc_mids)).item()
+
+    def cob(self) -> tuple:
+        """(CobLadder, each bar's row in it) built from the bars' COB on first use; (None, None) without COB."""
+        def build():
+            ladder = CobLadder.from_bars(self.bars)
+            if ladder is None:  # bars without COB (build_cob=False, nocob cache, plain frames): no COB TP
+                return None, None
+            return ladder, ladder.rows_for(self.bars.index)
+        return self._cached(("cob",), build)
+
+
 def load_dbn(dbn_path: Path) -> pd.DataFrame:
     """Load full DBN to DataFrame (RAM-heavy). Prefer load_dbn_streaming for optimize."""
     store = db.DBNStore.from_file(str(dbn_path))
     return store.to_df()
 
 
-def load_dbn_streaming(dbn_path: Path, freq_sec: float = 60.0, build_cob: bool = True):
+def _cache_schema(schema: str, inst: Instrument) -> str:
+    """bar_cache schema tag: the tick grid is part of the output, the default one keeps existing entries."""
+    return schema if inst.tick_size == TICK_PX else f"{schema}_tick{inst.tick_size:g}"
+
+
+def load_dbn_streaming(
+    dbn_path: Path,
+    freq_sec: float = 60.0,
+    build_cob: bool = True,
+    use_cache: bool = True,
+    engine: str = "numpy",
+    workers: int = 1,
+    latency: Optional[LatencyRecorder] = None,
+    instrument: Optional[Instrument] = None,
+):
     """
     Build bars + trades from DBN using replay() - never loads full df. Keeps RAM low.
-    When build_cob=True, each bar gets cob_ask: list of (price, depth) for resistance (heatmap).
-    Returns (bars: pd.DataFrame, trades_df: pd.DataFrame).
+    When build_cob=True, bars.attrs["cob"] is a CobLadder (cob_ladder.py): per-bar ask depth by price
+    in CSR arrays, for resistance (heatmap).
+    use_cache=True: first load writes data/bar_cache (see bar_cache.py), later loads skip the replay.
+    engine="numpy": chunked structured-array ingestion (bar_builder.py), same output, many times faster.
+    engine="python": original per-record replay() callback (reference).
+    workers > 1 (numpy engine): decode the file in that many byte-range shards in a process pool.
+    latency (numpy engine): per chunk decode / bar_update times (one-pass reads) and finish(), when the
+    file is decoded (nothing is recorded on a cache hit).
+    instrument: tick grid of COB / trade prices (instruments.py); default from the file name (MNQ if none).
+    Returns (bars: pd.DataFrame, trades: TradeTape) - trades is a structured array of the day's trades
+    (trade_tape.py; .to_frame() gives the old ts_recv/side/size DataFrame).
     """
     store = db.DBNStore.from_file(str(dbn_path))
+    inst = instrument if instrument is not None else dbn_instrument(dbn_path)
+    schema = _cache_schema(str(store.schema), inst)
+    if use_cache:
+        cached = bar_cache.load(dbn_path, freq_sec, build_cob, schema, LOADER_VERSION)
+        if cached is not None:
+            return cached
+    if engine == "numpy":
+        del store
+        bars, trades_df = load_dbn_vectorized(
+            dbn_path, freq_sec=freq_sec, build_cob=build_cob, workers=workers, latency=latency,
+            tick_px=inst.tick_size,
+        )
+        if use_cache:
+            bar_cache.save(dbn_path, freq_sec, build_cob, schema, LOADER_VERSION, bars, trades_df)
+        return bars, trades_df
+    if engine != "python":
+        raise ValueError(f"engine must be 'numpy' or 'python', got {engine!r}")
     first_ts_ns = [None]
     bars_dict = {}
     trades_list = []
-    TICK_PX = 0.25  # MNQ
+    px_per_tick = inst.px_per_tick
+    half_tick = px_per_tick // 2
+
+    def ask_ticks(lev):
+        # COB key: raw fixed-point ask / tick in integer math (no float rounding per level)
+        px = lev.ask_px
+        return None if px == UNDEF_PRICE else (px + half_tick) // px_per_tick
 
     def callback(r):
         try:
@@ -73,11 +373,13 @@ def load_dbn_streaming(dbn_path: Path, freq_sec: float = 60.0, build_cob: bool =
         if action == "T":
             side = str(getattr(r, "side", "B"))
             size = int(getattr(r, "size", 0))
-            trades_list.append((ts_ns, side, size))
+            raw_px = getattr(r, "price", UNDEF_PRICE)
+            px_ticks = NO_PRICE_TICKS if raw_px == UNDEF_PRICE else (raw_px + half_tick) // px_per_tick
+            trades_list.append((ts_ns, side, size, px_ticks))
             if bar_idx not in bars_dict:
                 bars_dict[bar_idx] = {"mid_sum": 0.0, "mid_last": 0.0, "bid_sum": 0.0, "ask_sum": 0.0, "n": 0, "buy_vol": 0, "sell_vol": 0}
                 if build_cob:
-                    bars_dict[bar_idx]["ask_at_price"] = defaultdict(float)
+                    bars_dict[bar_idx]["ask_at_price"] = defaultdict(int)
             d = bars_dict[bar_idx]
             if side == "B":
                 d["buy_vol"] = d.get("buy_vol", 0) + size
@@ -108,8 +410,9 @@ def load_dbn_streaming(dbn_path: Path, freq_sec: float = 60.0, build_cob: bool =
                     if build_cob:
                         for lev in levels:
                             try:
-                                px = round(lev.pretty_ask_px / TICK_PX) * TICK_PX
-                                d["ask_at_price"][px] += lev.ask_sz
+                                px = ask_ticks(lev)
+                                if px is not None:
+                                    d["ask_at_price"][px] += lev.ask_sz
                             except (AttributeError, TypeError):
                                 pass
                 except (IndexError, AttributeError, TypeError):
@@ -126,7 +429,7 @@ def load_dbn_streaming(dbn_path: Path, freq_sec: float = 60.0, build_cob: bool =
                 if bar_idx not in bars_dict:
                     bars_dict[bar_idx] = {"mid_sum": 0.0, "mid_last": mid, "bid_sum": 0.0, "ask_sum": 0.0, "n": 0, "buy_vol": 0, "sell_vol": 0}
                     if build_cob:
-                        bars_dict[bar_idx]["ask_at_price"] = defaultdict(float)
+                        bars_dict[bar_idx]["ask_at_price"] = defaultdict(int)
                 d = bars_dict[bar_idx]
                 d["mid_last"] = mid
                 d["bid_sum"] += bid_d
@@ -135,20 +438,22 @@ def load_dbn_streaming(dbn_path: Path, freq_sec: float = 60.0, build_cob: bool =
                 if build_cob:
                     for lev in levels:
                         try:
-                            px = round(lev.pretty_ask_px / TICK_PX) * TICK_PX
-                            d["ask_at_price"][px] += lev.ask_sz
+                            px = ask_ticks(lev)
+                            if px is not None:
+                                d["ask_at_price"][px] += lev.ask_sz
                         except (AttributeError, TypeError):
                             pass
     store.replay(callback)
     del store
 
     if not bars_dict:
-        return pd.DataFrame(columns=["mid", "bid_depth", "ask_depth"]), pd.DataFrame(columns=["ts_recv", "side", "size"])
+        return pd.DataFrame(columns=["mid", "bid_depth", "ask_depth"]), TradeTape.from_arrays([], [], [])
 
     bar_idx_sorted = sorted(bars_dict.keys())
     base = pd.Timestamp(first_ts_ns[0], unit="ns")
     times = [base + pd.Timedelta(seconds=int(i) * freq_sec) for i in bar_idx_sorted]
     rows = []
+    cob_pos, cob_ticks, cob_depth = [], [], []
     last_mid = 0.0
     last_bid_depth = 0.0
     last_ask_depth = 0.0
@@ -172,11 +477,12 @@ def load_dbn_streaming(dbn_path: Path, freq_sec: float = 60.0, build_cob: bool =
             "sell_vol": d.get("sell_vol", 0),
         }
         if build_cob and "ask_at_price" in d:
-            # Store (price, depth) for levels with depth >= 1; sorted by price for fast nearest-above lookup
-            cob_ask = sorted([(p, depth) for p, depth in d["ask_at_price"].items() if depth >= 1])
-            row["cob_ask"] = cob_ask
-        else:
-            row["cob_ask"] = []
+            # (tick, depth) for levels with depth >= 1; sorted by price for fast nearest-above lookup
+            for p, depth in sorted(d["ask_at_price"].items()):
+                if depth >= 1:
+                    cob_pos.append(len(rows))
+                    cob_ticks.append(p)
+                    cob_depth.append(depth)
         rows.append(row)
     # Back-fill leading bars that had no book update (mid/depth were 0)
     first_valid = None
@@ -191,20 +497,123 @@ def load_dbn_streaming(dbn_path: Path, freq_sec: float = 60.0, build_cob: bool =
             rows[j]["ask_depth"] = rows[first_valid]["ask_depth"]
     bars = pd.DataFrame(rows, index=pd.DatetimeIndex(times))
     bars.index.name = "ts"
-
-    if trades_list:
-        trades_df = pd.DataFrame(
-            [(pd.Timestamp(t, unit="ns"), s, sz) for t, s, sz in trades_list],
-            columns=["ts_recv", "side", "size"],
+    if build_cob:
+        bars.attrs["cob"] = CobLadder.from_flat(
+            bars.index.as_unit("ns").asi8,
+            np.asarray(cob_pos, dtype=np.int64),
+            np.asarray(cob_ticks, dtype=np.int64),
+            np.asarray(cob_depth, dtype=np.float64),
+            inst.tick_size,
         )
-    else:
-        trades_df = pd.DataFrame(columns=["ts_recv", "side", "size"])
+
+    trades_df = TradeTape.from_arrays(
+        [t for t, _, _, _ in trades_list],
+        [SIDE_CODES.get(s, 0) for _, s, _, _ in trades_list],
+        [sz for _, _, sz, _ in trades_list],
+        [px for _, _, _, px in trades_list],
+    )
+    if use_cache:
+        bar_cache.save(dbn_path, freq_sec, build_cob, schema, LOADER_VERSION, bars, trades_df)
     return bars, trades_df
 
 
+def load_dbn_multi(
+    dbn_path: Path,
+    freqs: list,
+    build_cob: bool = True,
+    use_cache: bool = True,
+    engine: str = "numpy",
+    workers: int = 1,
+    instrument: Optional[Instrument] = None,
+) -> dict:
+    """
+    Several bar sizes from ONE pass over the DBN (e.g. [60, 10] for V1 vs V2, [60, 1] for tick replay).
+    Returns {freq_sec: (bars, trades)}; each entry is identical to load_dbn_streaming(dbn_path, freq_sec).
+    Sizes already in data/bar_cache are read from there; only the missing ones are built.
+    """
+    freqs = list(dict.fromkeys(float(f) for f in freqs))
+    if engine == "python":
+        return {f: load_dbn_streaming(dbn_path, f, build_cob, use_cache, engine, instrument=instrument) for f in freqs}
+    out = {}
+    inst = instrument if instrument is not None else dbn_instrument(dbn_path)
+    schema = _cache_schema(str(db.DBNStore.from_file(str(dbn_path)).schema), inst)
+    if use_cache:
+        for f in freqs:
+            cached = bar_cache.load(dbn_path, f, build_cob, schema, LOADER_VERSION)
+            if cached is not None:
+                out[f] = cached
+    missing = [f for f in freqs if f not in out]
+    if missing:
+        built = load_dbn_multi_vectorized(dbn_path, missing, build_cob=build_cob, workers=workers, tick_px=inst.tick_size)
+        for f in missing:
+            out[f] = built[f]
+            if use_cache:
+                bar_cache.save(dbn_path, f, build_cob, schema, LOADER_VERSION, *built[f])
+    return {f: out[f] for f in freqs}
+
+
+def load_dbn_incremental(
+    dbn_paths,
+    freq_sec: float = 60.0,
+    build_cob: bool = True,
+    day: Optional[str] = None,
+    latency: Optional[LatencyRecorder] = None,
+    instrument: Optional[Instrument] = None,
+):
+    """
+    Same (bars, trades) as load_dbn_streaming, but the aggregation state is kept in
+    data/bar_cache/incremental/<day>/ so a later call only decodes records it has not seen.
+    dbn_paths: one .dbn(.zst) that keeps growing (re-fetched with a later end), or the day's list of
+    files in time order (first fetch + appended chunks); the last file seen may grow, new files may be
+    added at the end. Any other change (earlier file replaced, last file rewritten) rebuilds the day.
+    Intraday re-runs cost O(new records) decode plus writing the state back.
+    latency: decode / bar_update of the records fed (see feed_dbn).
+    instrument: as in load_dbn_streaming.
+    """
+    paths = [Path(dbn_paths)] if isinstance(dbn_paths, (str, Path)) else [Path(p) for p in dbn_paths]
+    day = day or dbn_stem(paths[0])
+    inst = instrument if instrument is not None else dbn_instrument(paths[0])
+    schema = _cache_schema(str(db.DBNStore.from_file(str(paths[0])).schema), inst)
+    saved = bar_cache.load_state(day, freq_sec, build_cob, schema, LOADER_VERSION)
+    acc, done = None, []
+    if saved is not None:
+        state, done = saved
+        closed, last = done[:-1], done[-1:]
+        unchanged = len(done) <= len(paths) and all(
+            d["name"] == p.name and d["size"] == p.stat().st_size and d["mtime_ns"] == p.stat().st_mtime_ns
+            for d, p in zip(closed, paths)
+        ) and all(d["name"] == p.name for d, p in zip(last, paths[len(closed):]))
+        acc = BarAccumulator.from_state(state) if unchanged else None
+    if acc is None:
+        acc, done = BarAccumulator(freq_sec=freq_sec, build_cob=build_cob, tick_px=inst.tick_size), []
+
+    files = done[:-1]
+    for p in paths[len(files):]:
+        resume = len(files) < len(done)
+        start = done[len(files)]["records"] if resume else 0
+        fed = feed_dbn(acc, p, start, acc.last_record if resume else None, latency=latency)
+        if fed is None:
+            # The file under the saved state changed: forget it and replay everything
+            bar_cache.clear_state(day, freq_sec, build_cob, schema, LOADER_VERSION)
+            return load_dbn_incremental(paths, freq_sec, build_cob, day, latency, instrument)
+        st = p.stat()
+        files.append({"name": p.name, "size": st.st_size, "mtime_ns": st.st_mtime_ns, "records": start + fed})
+    bar_cache.save_state(day, freq_sec, build_cob, schema, LOADER_VERSION, acc.state(), files)
+    return acc.finish()
+
+
 # MNQ tick size; 1 point = 1.0 (index points)
 TICK = 0.25
 POINT = 1.0
+# run_backtest prices: int64 half ticks (BBO mid sits on a half tick), converted to points only in results
+HALF_TICKS_PER_TICK = 2
+HALF_TICKS_PER_POINT = int(round(POINT / TICK)) * HALF_TICKS_PER_TICK
+
+
+def _to_half_ticks(mid: np.ndarray) -> np.ndarray:
+    """Bar mids (points) -> int64 half ticks. A NaN mid (undefined BBO) carries the previous bar's."""
+    mid = pd.Series(np.asarray(mid, dtype=np.float64)).ffill().bfill().fillna(0.0).to_numpy()
+    return np.rint(mid * HALF_TICKS_PER_POINT).astype(np.int64)
 
 
 def _build_bars(df: pd.DataFrame, freq_sec: float = 1.0) -> pd.DataFrame:
@@ -228,18 +637,26 @@ def _build_bars(df: pd.DataFrame, freq_sec: float = 1.0) -> pd.DataFrame:
     return bars
 
 
+def _swing_masks(price: np.ndarray, lookback: int) -> tuple:
+    """
+    Boolean (swing_high, swing_low) masks: price[i] is the max / min of price[i - lookback : i + lookback + 1].
+    Bars without a full window on both sides are False. Rolling max/min over sliding_window_view, no Python loop.
+    """
+    n = len(price)
+    high = np.zeros(n, dtype=bool)
+    low = np.zeros(n, dtype=bool)
+    if n >= 2 * lookback + 1:
+        win = sliding_window_view(price, 2 * lookback + 1)
+        center = price[lookback : n - lookback]
+        high[lookback : n - lookback] = center == win.max(axis=1)
+        low[lookback : n - lookback] = center == win.min(axis=1)
+    return high, low
+
+
 def _swing_highs_lows(price: np.ndarray, lookback: int):
     """Return arrays of swing high/low indices."""
-    n = len(price)
-    swing_high_idx = []
-    swing_low_idx = []
-    for i in range(lookback, n - lookback):
-        window = price[i - lookback : i + lookback + 1]
-        if price[i] == np.max(window):
-            swing_high_idx.append(i)
-        if price[i] == np.min(window):
-            swing_low_idx.append(i)
-    return swing_high_idx, swing_low_idx
+    high, low = _swing_masks(price, lookback)
+    return np.flatnonzero(high).tolist(), np.flatnonzero(low).tolist()
 
 
 def _detect_bos(
@@ -247,28 +664,43 @@ def _detect_bos(
     lookback: int,
     min_break_ticks: int,
     direction: str,
+    tick: float = TICK,
+    swings: Optional[tuple] = None,
+    offset: int = 0,
 ) -> list:
-    """Detect Break of Structure. Returns indices where BOS occurred."""
-    swing_high_idx, swing_low_idx = _swing_highs_lows(price, lookback)
-    bos_idx = []
-    min_break = min_break_ticks * TICK
+    """
+    Detect Break of Structure. Returns indices where BOS occurred. tick = one tick in price's units.
+    swings: _swing_masks(day_price, lookback) of the whole day when price is day_price[offset:offset + len(price)];
+    a swing's window only looks at its own neighbours, so the day masks (minus the sub-array's edges) are
+    reused instead of recomputed for every sub-array.
+    """
+    n = len(price)
+    start = lookback * 2 + 1
+    window = lookback * 4
+    if n <= start or window == 0:
+        return []
+    if swings is None:
+        mask = _swing_masks(price, lookback)[0 if direction == "up" else 1]
+    else:
+        mask = swings[0 if direction == "up" else 1][offset : offset + n].copy()
+        mask[:lookback] = False
+        mask[n - lookback :] = False
+    min_break = min_break_ticks * tick
+    px = np.asarray(price, dtype=np.float64)
 
+    # Swing levels within the last `window` bars before i (j < i, i - j <= window): rolling max / min
     if direction == "up":
         # Bullish BOS: price breaks above recent swing high
-        for i in range(lookback * 2 + 1, len(price)):
-            recent_highs = [price[j] for j in swing_high_idx if j < i and i - j <= lookback * 4]
-            if recent_highs and price[i] > max(recent_highs) + min_break:
-                bos_idx.append(i)
-                break  # first break
+        levels = np.where(mask, px, -np.inf)
+        recent = sliding_window_view(np.concatenate((np.full(window, -np.inf), levels)), window)[start:n].max(axis=1)
+        hit = np.isfinite(recent) & (px[start:] > recent + min_break)
     else:
         # Bearish BOS: price breaks below recent swing low
-        for i in range(lookback * 2 + 1, len(price)):
-            recent_lows = [price[j] for j in swing_low_idx if j < i and i - j <= lookback * 4]
-            if recent_lows and price[i] < min(recent_lows) - min_break:
-                bos_idx.append(i)
-                break
-
-    return bos_idx
+        levels = np.where(mask, px, np.inf)
+        recent = sliding_window_view(np.concatenate((np.full(window, np.inf), levels)), window)[start:n].min(axis=1)
+        hit = np.isfinite(recent) & (px[start:] < recent - min_break)
+    first = np.flatnonzero(hit)
+    return [start + int(first[0])] if len(first) else []  # first break
 
 
 def _passive_accumulation_count(
@@ -289,32 +721,33 @@ def _passive_accumulation_count(
 
 
 def _passive_accumulation_level(
-    bars: pd.DataFrame,
+    bars,
     start_idx: int,
     lookback_bars: int,
     cob_threshold: float,
     min_count: int,
     direction: str,
+    price: Optional[np.ndarray] = None,
 ) -> tuple:
     """
     Long: passive accumulation (bid_depth >= cob), level = min(mid) = support.
     Short: passive distribution (ask_depth >= cob), level = max(mid) = resistance.
     Returns (True, level) if we have >= min_count such bars; else (False, None).
+    bars: DataFrame or BarArrays.
+    price: the bars' mids in other units (run_backtest passes half ticks); level comes back in those units.
     """
+    arr = BarArrays.coerce(bars)
     end = start_idx + 1
     start = max(0, start_idx - lookback_bars)
-    window = bars.iloc[start:end]
-    col = "bid_depth" if direction == "long" else "ask_depth"
-    above = window[col] >= cob_threshold
-    if above.sum() < min_count:
+    above = arr.depth(direction)[start:end] >= cob_threshold
+    if np.count_nonzero(above) < min_count:
         return False, None
-    mid_vals = window["mid"].values
-    above_vals = above.values
-    acc_mids = mid_vals[above_vals]
+    mid_vals = arr.mid[start:end] if price is None else price[start:end]
+    acc_mids = mid_vals[above]
     if direction == "long":
-        level = float(np.min(acc_mids))
+        level = np.min(acc_mids).item()
     else:
-        level = float(np.max(acc_mids))
+        level = np.max(acc_mids).item()
     return True, level
 
 
@@ -332,47 +765,70 @@ def _aggressive_accumulation(
         return False
     buy_vol = trades[trades["side"] == "B"]["size"].sum()
     sell_vol = trades[trades["side"] == "A"]["size"].sum()
-    if direction == "long":
-        return buy_vol > sell_vol and buy_vol >= min_volume
-    return sell_vol > buy_vol and sell_vol >= min_volume
+    return _aggression_ok(buy_vol, sell_vol, min_volume, direction)
 
 
 def _aggressive_accumulation_bars(
-    bars: pd.DataFrame,
+    bars,
     entry_bar_idx: int,
     bar_sec: float,
     agg_win_sec: int,
     min_volume: int,
     direction: str,
 ) -> bool:
-    """O(1) aggressive check using pre-aggregated buy_vol, sell_vol per bar."""
-    if "buy_vol" not in bars.columns or "sell_vol" not in bars.columns:
+    """Aggressive check using pre-aggregated buy_vol, sell_vol per bar (bars: DataFrame or BarArrays)."""
+    arr = BarArrays.coerce(bars)
+    if not arr.has_volume:
         return False
     agg_bars = max(1, int(agg_win_sec / bar_sec))
     start = max(0, entry_bar_idx - agg_bars + 1)
-    sub = bars.iloc[start : entry_bar_idx + 1]
-    buy_vol = sub["buy_vol"].sum()
-    sell_vol = sub["sell_vol"].sum()
-    if direction == "long":
-        return buy_vol > sell_vol and buy_vol >= min_volume
-    return sell_vol > buy_vol and sell_vol >= min_volume
+    buy_vol = np.nansum(arr.buy_vol[start : entry_bar_idx + 1])
+    sell_vol = np.nansum(arr.sell_vol[start : entry_bar_idx + 1])
+    return _aggression_ok(buy_vol, sell_vol, min_volume, direction)
 
 
 def _aggressive_accumulation_trades(
-    trades_df: pd.DataFrame,
+    trades,
     start_ts: pd.Timestamp,
     window_sec: int,
     min_volume: int,
     direction: str,
 ) -> bool:
-    """Same as above but for minimal trades_df with columns ts_recv, side, size. O(n) per call."""
-    end_ts = start_ts + pd.Timedelta(seconds=window_sec)
-    mask = (trades_df["ts_recv"] >= start_ts) & (trades_df["ts_recv"] <= end_ts)
-    t = trades_df.loc[mask]
-    if t.empty:
-        return False
-    buy_vol = t[t["side"] == "B"]["size"].sum()
-    sell_vol = t[t["side"] == "A"]["size"].sum()
+    """
+    Same as above but from the trade tape (TradeTape, or a trades DataFrame with ts_recv, side, size).
+    Window [start_ts, start_ts + window_sec]: searchsorted + prefix sums, O(log n) per call.
+    start_ts: Timestamp or int ns.
+    """
+    tape = TradeTape.coerce(trades)
+    start_ns = pd.Timestamp(start_ts).as_unit("ns").value
+    end_ns = start_ns + pd.Timedelta(seconds=window_sec).as_unit("ns").value
+    buy_vol, sell_vol = tape.window_volume(start_ns, end_ns)
+    return _aggression_ok(buy_vol, sell_vol, min_volume, direction)
+
+
+def _aggression_windows(arr: BarArrays, trades, bar_sec: float, agg_win_sec: int) -> Optional[tuple]:
+    """
+    (buy, sell) aggressive volume of every bar's aggression window, from prefix sums: the bar check
+    (_aggressive_accumulation_bars: the agg_bars bars ending at the bar) when the bars carry volume,
+    else the tape check (_aggressive_accumulation_trades: [bar ts, bar ts + window]). None without either.
+    """
+    n = len(arr)
+    if arr.has_volume:
+        agg_bars = max(1, int(agg_win_sec / bar_sec))
+        end = np.arange(1, n + 1)
+        start = np.maximum(end - agg_bars, 0)
+        sums = []
+        for vol in (arr.buy_vol, arr.sell_vol):
+            cum = np.concatenate(([0], np.cumsum(np.nan_to_num(vol))))
+            sums.append(cum[end] - cum[start])
+        return sums[0], sums[1]
+    if trades is not None:
+        win_ns = pd.Timedelta(seconds=agg_win_sec).as_unit("ns").value
+        return TradeTape.coerce(trades).window_volumes(arr.ts_ns, arr.ts_ns + win_ns)
+    return None
+
+
+def _aggression_ok(buy_vol, sell_vol, min_volume, direction: str) -> bool:
     if direction == "long":
         return buy_vol > sell_vol and buy_vol >= min_volume
     return sell_vol > buy_vol and sell_vol >= min_volume
@@ -389,41 +845,150 @@ def _near_key_level(price: float, key_levels: list, points: int) -> bool:
 
 
 def _nearest_cob_resistance_above(
-    cob_ask: list,
+    cob_px: np.ndarray,
+    cob_depth: np.ndarray,
     current_price: float,
     min_depth: float,
     buffer_pts: float = 2.0,
     key_levels: Optional[list] = None,
     near_key_pts: float = 20.0,
+    point: float = POINT,
 ) -> Optional[float]:
     """
     Find nearest real resistance above current price from COB/heatmap (ask depth).
-    cob_ask: list of (price, depth) sorted by price.
+    cob_px / cob_depth: one bar's CobLadder row, sorted by price (searchsorted finds the levels above).
+    Prices (cob_px, current_price, key_levels, result) share one unit with `point` per point:
+    points by default, half ticks from run_backtest.
     Returns TP price = resistance - buffer_pts, or None if no valid resistance in view.
     Prefer levels at/near key levels or round numbers (within near_key_pts) when given.
     """
-    if not cob_ask:
-        return None
-    candidates = [(p, d) for p, d in cob_ask if p > current_price and d >= min_depth]
-    if not candidates:
+    start = np.searchsorted(cob_px, current_price, side="right")
+    strong = cob_depth[start:] >= min_depth
+    if not strong.any():
         return None
+    candidates = cob_px[start:][strong]
     # Prefer resistance at/near key levels or round numbers (more likely real orders)
     if key_levels:
-        near = []
-        for p, d in candidates:
-            for kl in key_levels:
-                if kl is not None and not np.isnan(kl) and abs(p - kl) <= near_key_pts:
-                    near.append((p, d))
-                    break
-            else:
-                round50 = round(p / 50) * 50
-                if abs(p - round50) <= near_key_pts:
-                    near.append((p, d))
-        if near:
-            candidates = near
-    # Nearest above = min price; TP just below resistance
-    resistance = min(p for p, d in candidates)
-    return resistance - buffer_pts * POINT
+        round_step = 50 * point
+        near_dist = near_key_pts * point
+        near = np.abs(candidates - np.round(candidates / round_step) * round_step) <= near_dist
+        for kl in key_levels:
+            if kl is not None and not np.isnan(kl):
+                near |= np.abs(candidates - kl) <= near_dist
+        if near.any():
+            candidates = candidates[near]
+    # Nearest above = min price (rows are sorted); TP just below resistance
+    resistance = candidates[0].item()
+    return resistance - buffer_pts * point
+
+
+def _trade_detail(
+    price: np.ndarray,
+    day_label: Optional[str],
+    side: str,
+    entry_bar_idx: int,
+    exit_bar_k: int,
+    entry_price,
+    exit_price,
+    exit_reason: Optional[str],
+    level_at_entry,
+    pnl_ticks: float,
+) -> dict:
+    """One trade's details dict; prices in half ticks (run_backtest units), reported in points."""
+    PT = HALF_TICKS_PER_POINT
+    high_run = price[entry_bar_idx : exit_bar_k + 1].max()
+    low_run = price[entry_bar_idx : exit_bar_k + 1].min()
+    if side == "long":
+        mfe_pts = (high_run - entry_price) / PT
+        mae_pts = (entry_price - low_run) / PT
+    else:
+        mfe_pts = (entry_price - low_run) / PT
+        mae_pts = (high_run - entry_price) / PT
+    # Reporting edge: half ticks -> points
+    detail = {
+        "day": day_label,
+        "side": side,
+        "entry_bar": entry_bar_idx,
+        "minutes_from_open": entry_bar_idx,
+        "exit_bar": exit_bar_k,
+        "entry_price": entry_price / PT,
+        "exit_price": exit_price / PT,
+        "pnl_ticks": pnl_ticks,
+        "pnl_pts": pnl_ticks * TICK / POINT,
+        "exit_reason": exit_reason or "unknown",
+        "mfe_pts": mfe_pts,
+        "mae_pts": mae_pts,
+        "acc_level": level_at_entry / PT,
+    }
+    if exit_reason == "tp":
+        detail["tp_distance_pts"] = abs(exit_price - entry_price) / PT
+    else:
+        detail["tp_distance_pts"] = None
+    return detail
+
+
+def _summarize(params: dict, trade_pnls: list) -> BacktestResult:
+    """BacktestResult from the per-trade PnLs (ticks), in trade order."""
+    trades = len(trade_pnls)
+    wins = sum(1 for p in trade_pnls if p > 0)
+    losses = sum(1 for p in trade_pnls if p <= 0)
+    total_pnl = sum(trade_pnls)
+    win_rate = wins / trades if trades else 0
+    dd = 0.0
+    cum = 0
+    for p in trade_pnls:
+        cum += p
+        dd = min(dd, cum)
+    sharpe = (np.mean(trade_pnls) / (np.std(trade_pnls) + 1e-9)) * np.sqrt(252) if len(trade_pnls) >= 2 else None
+
+    return BacktestResult(
+        params=params,
+        trades=trades,
+        wins=wins,
+        losses=losses,
+        total_pnl_ticks=total_pnl,
+        sharpe=sharpe,
+        max_drawdown_ticks=abs(dd),
+        win_rate=win_rate,
+    )
+
+
+def _kernel_inputs(params, arr, price, aggression, swings, bounce, running, cob_rows, PT, TK) -> tuple:
+    """run_kernel's positional arguments: per-bar arrays resolved from the bars / tape plus typed params."""
+    n = len(price)
+    agg_buy, agg_sell = (v.astype(np.float64) for v in aggression)
+    if arr.has_volume:
+        buy_vol, sell_vol = arr.buy_vol.astype(np.float64), arr.sell_vol.astype(np.float64)
+    else:
+        buy_vol = sell_vol = np.zeros(n)
+    cob, rows = cob_rows
+    if cob is not None:
+        cob_args = (cob.offsets, cob.ticks, cob.ref_tick, cob.depth, rows.astype(np.int64), True)
+    else:
+        cob_args = (np.zeros(1, np.int64), np.zeros(0, np.int32), 0, np.zeros(0, np.float32), np.full(n, -1, np.int64), False)
+    lunch = params.get("lunch_window", "none")
+    lunch_start, lunch_end = (0, 0) if lunch == "none" else {
+        "11-1": (90, 210), "11:30-1": (120, 210), "12-1": (150, 210)
+    }.get(lunch, (0, 0))
+    g = params.get
+    return (
+        price, arr.bid_depth, arr.ask_depth, agg_buy, agg_sell, True, buy_vol, sell_vol, arr.has_volume,
+        swings[0], swings[1], bounce[0], bounce[1], running[0], running[1],
+        *cob_args,
+        PT, TK,
+        int(g("min_passive_accumulation_count", 3)), float(g("passive_cob_threshold", 50)),
+        int(g("passive_lookback_bars", 60)), float(g("key_level_points", 20)), float(g("aggressive_min_volume", 150)),
+        int(g("bos_swing_lookback", 10)), int(g("bos_min_break_ticks", 2)), int(g("bos_search_bars", 120)),
+        int(g("bounce_bars", 3)), bool(g("enable_shorts", True)),
+        backtest_kernel.TP_STYLES.get(g("tp_style", "cob"), backtest_kernel.TP_FIXED),
+        float(g("tp_points", 40)), float(g("tp_buffer", 15)), float(g("min_run_pts", 10)),
+        float(g("cob_tp_threshold", 30)), float(g("tp_buffer_pts_cob", 2)), float(g("cob_near_key_pts", 20)),
+        float(g("min_tp_pts_above_entry", 0)), bool(g("exit_on_reversal_bos", True)), bool(g("exit_on_exhaustion", False)),
+        g("sl_style", "level") == "level", float(g("sl_buffer_pts", 2)), float(g("sl_points_fallback", 15)),
+        float(g("sl_ticks", 12)), float(g("sl_max_pts", 25)), float(g("trail_sl_pts", 15)),
+        float(g("trail_activation_pts", 0)), int(g("entry_bar_offset", 0)), int(g("max_hold_bars", 80)),
+        int(g("max_trades_per_day", 5)), int(g("no_first_minutes", 0)), lunch_start, lunch_end,
+    )
 
 
 def run_backtest(
@@ -434,146 +999,139 @@ def run_backtest(
     bar_sec: float = 1.0,
     return_trade_details: bool = False,
     day_label: Optional[str] = None,
+    engine: str = "python",
 ):
     """
     Run strategy backtest.
     Pass either (df, params) or (bars, trades_df, params). Latter avoids holding full df in RAM.
+    trades_df: TradeTape from the loaders, or a DataFrame with ts_recv, side, size.
     If return_trade_details=True, returns (BacktestResult, list[dict]) with per-trade exit_reason, MFE, MAE.
+    engine="numba": compiled kernel (backtest_kernel.py), same trades; stays on the Python loop when numba
+    isn't installed or aggression can only come from the raw df.
     """
+    if engine not in ("python", "numba"):
+        raise ValueError(f"engine must be 'python' or 'numba', got {engine!r}")
     if params is None:
         return BacktestResult(
             params={}, trades=0, wins=0, losses=0,
             total_pnl_ticks=0.0, sharpe=None, max_drawdown_ticks=0.0,
         )
-    if bars is None and df is not None:
-        bars = _build_bars(df, freq_sec=bar_sec)
-    if bars is not None and trades_df is None and df is not None:
-        trades_df = df[df["action"] == "T"][["side", "size"]].copy()
-        trades_df["ts_recv"] = pd.to_datetime(df.loc[df["action"] == "T"].index.get_level_values("ts_recv"))
-    if bars is None or len(bars) < 20:
+    ctx = DayContext.build(df=df, bars=bars, trades_df=trades_df, bar_sec=bar_sec)
+    if ctx is None:
         return BacktestResult(
             params=params,
             trades=0, wins=0, losses=0,
             total_pnl_ticks=0.0, sharpe=None, max_drawdown_ticks=0.0,
         )
+    return _run_day(ctx, params, return_trade_details, day_label, engine)
 
-    min_pa = params.get("min_passive_accumulation_count", 3)
-    cob = params.get("passive_cob_threshold", 50)  # filter: only 50+ COB = heatmap levels
-    passive_lookback_bars = params.get("passive_lookback_bars", 60)  # in-the-move: e.g. 60 min
-    kl_pts = params.get("key_level_points", 20)   # baseline 20 (same as 9-day edge)
-    agg_vol = params.get("aggressive_min_volume", 150)   # baseline 150
-    agg_win = params.get("aggressive_window_seconds", 60)  # baseline 60 sec
-    bos_lookback = params.get("bos_swing_lookback", 10)   # baseline 10 bars
-    bos_ticks = params.get("bos_min_break_ticks", 2)      # baseline 2 ticks
-    bos_search_bars = params.get("bos_search_bars", 120)  # max bars to search for BOS (e.g. 2 hr)
-    tp_pts = params.get("tp_points", 40)
-    sl_ticks = params.get("sl_ticks", 12)
-    tp_style = params.get("tp_style", "cob")      # baseline "cob" (real resistance from heatmap)
-    tp_buffer = params.get("tp_buffer", 15)       # baseline 15
-    cob_tp_threshold = params.get("cob_tp_threshold", 30)  # min ask depth to treat as real resistance
-    tp_buffer_pts_cob = params.get("tp_buffer_pts_cob", 2)  # baseline 2 pts below resistance
-    cob_near_key_pts = params.get("cob_near_key_pts", 20)   # prefer resistance within this of key/round levels
-    exit_on_reversal_bos = params.get("exit_on_reversal_bos", True)
-    sl_style = params.get("sl_style", "level")    # "level" | "fixed"
-    sl_buffer_pts = params.get("sl_buffer_pts", 2)       # points below support
-    sl_points_fallback = params.get("sl_points_fallback", 15)  # pts below entry when no level
 
-    # Key levels at entry = running high/low to entry bar only (no look-ahead)
-    price = bars["mid"].values
-    trade_pnls = []
-    trade_details = []
-    bounce_bars = params.get("bounce_bars", 3)   # baseline 3 bars after retest
+def run_backtest_batch(day_ctx: "DayContext", param_list: list, engine: str = "python") -> np.ndarray:
+    """
+    Evaluate many configs on one day: (len(param_list), len(BATCH_METRICS)) float array, row j = run_backtest
+    of param_list[j] (sharpe NaN when None). Features shared by configs (swing masks per bos_swing_lookback,
+    passive masks per passive_cob_threshold, aggression windows, COB ladder) are built once in day_ctx.
+    """
+    if engine not in ("python", "numba"):
+        raise ValueError(f"engine must be 'python' or 'numba', got {engine!r}")
+    out = np.zeros((len(param_list), len(BATCH_METRICS)))
+    for j, params in enumerate(param_list):
+        r = _run_day(day_ctx, params, engine=engine)
+        out[j] = [np.nan if getattr(r, m) is None else getattr(r, m) for m in BATCH_METRICS]
+    return out
+
+
+def _generate_entries(ctx: "DayContext", params: dict):
+    """
+    Entry search of run_backtest: yields (entry_bar_idx, level_at_entry, side) in trade order, after
+    entry_bar_offset. Reads only ENTRY_PARAMS (the search resumes at entry_bar_idx + 1 whatever the exit),
+    so every config with the same entry params gets the same sequence.
+    """
+    min_pa = params.get("min_passive_accumulation_count", 3)
+    cob = params.get("passive_cob_threshold", 50)
+    passive_lookback_bars = params.get("passive_lookback_bars", 60)
+    kl_pts = params.get("key_level_points", 20)
+    agg_vol = params.get("aggressive_min_volume", 150)
+    agg_win = params.get("aggressive_window_seconds", 60)
+    bos_lookback = params.get("bos_swing_lookback", 10)
+    bos_ticks = params.get("bos_min_break_ticks", 2)
+    bos_search_bars = params.get("bos_search_bars", 120)
+    bounce_bars = params.get("bounce_bars", 3)
     enable_shorts = params.get("enable_shorts", True)
+    n_bars = len(ctx.arr)
+    ts_ns = ctx.arr.ts_ns
+    df = ctx.df
+    price = ctx.price
+    PT = HALF_TICKS_PER_POINT
+    bounce_max, bounce_min = ctx.bounce(bounce_bars)
+    aggression = ctx.aggression(agg_win)
     i = 0
 
-    while i < len(bars) - passive_lookback_bars - bos_lookback * 4:
-        def _time_ok(entry_bar_idx):
-            no_first_minutes = params.get("no_first_minutes", 0)
-            if no_first_minutes and entry_bar_idx < no_first_minutes:
+    def _time_ok(entry_bar_idx):
+        no_first_minutes = params.get("no_first_minutes", 0)
+        if no_first_minutes and entry_bar_idx < no_first_minutes:
+            return False
+        lunch_window = params.get("lunch_window", "none")
+        if lunch_window != "none":
+            start_bar, end_bar = {"11-1": (90, 210), "11:30-1": (120, 210), "12-1": (150, 210)}.get(lunch_window, (0, 0))
+            if start_bar <= entry_bar_idx < end_bar:
                 return False
-            lunch_window = params.get("lunch_window", "none")
-            if lunch_window != "none":
-                start_bar, end_bar = {"11-1": (90, 210), "11:30-1": (120, 210), "12-1": (150, 210)}.get(lunch_window, (0, 0))
-                if start_bar <= entry_bar_idx < end_bar:
-                    return False
-            return True
+        return True
 
+    def _first_entry(direction, level):
+        """First retest-bounce-BOS bar t in [i, i + bos_search_bars) whose entry passes; (entry_bar_idx, entry_ts)."""
+        end = min(i + bos_search_bars, n_bars - bos_lookback * 2 - bounce_bars - 1)
+        if end <= i:
+            return None
+        # Only bars with any bounce after them can retest and bounce: jump over the rest with searchsorted
+        idx = ctx.bounce_candidates(bounce_bars, direction)
+        ts = idx[np.searchsorted(idx, i) : np.searchsorted(idx, end)]
+        if direction == "long":
+            ts = ts[(price[ts] <= level + kl_pts * PT) & (bounce_max[ts] > level + kl_pts * PT)]
+        else:
+            ts = ts[(price[ts] >= level - kl_pts * PT) & (bounce_min[ts] < level - kl_pts * PT)]
+        for t in ts.tolist():
+            length = min(t + bos_search_bars, n_bars) - t
+            if length < bos_lookback * 2 + 1:
+                continue
+            bos_list = ctx.bos(t, length, bos_lookback, bos_ticks, "up" if direction == "long" else "down")
+            if not bos_list:
+                continue
+            entry_bar_idx = t + bos_list[0]
+            if entry_bar_idx >= n_bars:
+                continue
+            entry_price = price[entry_bar_idx]
+            entry_ts = ts_ns[entry_bar_idx]
+            if direction == "long" and entry_price < level - kl_pts * PT:
+                continue
+            if direction == "short" and entry_price > level + kl_pts * PT:
+                continue
+            if aggression is not None:
+                agg_ok = _aggression_ok(aggression[0][entry_bar_idx], aggression[1][entry_bar_idx], agg_vol, direction)
+            else:
+                agg_ok = _aggressive_accumulation(df, pd.Timestamp(entry_ts), agg_win, agg_vol, direction)
+            if not agg_ok or not _time_ok(entry_bar_idx):
+                continue
+            return entry_bar_idx, entry_price, entry_ts
+        return None
+
+    while i < n_bars - passive_lookback_bars - bos_lookback * 4:
         # --- Find next LONG entry ---
         long_candidate = None
-        has_pa, acc_level = _passive_accumulation_level(
-            bars, i, passive_lookback_bars, cob, min_pa, "long"
-        )
+        has_pa, acc_level = ctx.passive_level(i, passive_lookback_bars, cob, min_pa, "long")
         if has_pa and acc_level is not None:
-            for t in range(i, min(i + bos_search_bars, len(bars) - bos_lookback * 2 - bounce_bars - 1)):
-                if bars["mid"].iloc[t] > acc_level + kl_pts * POINT:
-                    continue
-                if t + bounce_bars + 1 >= len(bars):
-                    break
-                next_mids = bars["mid"].iloc[t + 1 : t + bounce_bars + 1].values
-                if np.max(next_mids) <= acc_level + kl_pts * POINT:
-                    continue
-                sub_price = price[t : min(t + bos_search_bars, len(bars))]
-                if len(sub_price) < bos_lookback * 2 + 1:
-                    continue
-                bos_list = _detect_bos(sub_price, bos_lookback, bos_ticks, "up")
-                if not bos_list:
-                    continue
-                entry_bar_idx = t + bos_list[0]
-                if entry_bar_idx >= len(bars):
-                    continue
-                entry_price = price[entry_bar_idx]
-                entry_ts = bars.index[entry_bar_idx]
-                if entry_price < acc_level - kl_pts * POINT:
-                    continue
-                if "buy_vol" in bars.columns and "sell_vol" in bars.columns:
-                    agg_ok = _aggressive_accumulation_bars(bars, entry_bar_idx, bar_sec, agg_win, agg_vol, "long")
-                elif trades_df is not None:
-                    agg_ok = _aggressive_accumulation_trades(trades_df, entry_ts, agg_win, agg_vol, "long")
-                else:
-                    agg_ok = _aggressive_accumulation(df, entry_ts, agg_win, agg_vol, "long")
-                if not agg_ok or not _time_ok(entry_bar_idx):
-                    continue
-                long_candidate = (entry_bar_idx, entry_price, entry_ts, acc_level, "long")
-                break
+            found = _first_entry("long", acc_level)
+            if found is not None:
+                long_candidate = (*found, acc_level, "long")
 
         # --- Find next SHORT entry (if enabled) ---
         short_candidate = None
         if enable_shorts:
-            has_dist, res_level = _passive_accumulation_level(
-                bars, i, passive_lookback_bars, cob, min_pa, "short"
-            )
+            has_dist, res_level = ctx.passive_level(i, passive_lookback_bars, cob, min_pa, "short")
             if has_dist and res_level is not None:
-                for t in range(i, min(i + bos_search_bars, len(bars) - bos_lookback * 2 - bounce_bars - 1)):
-                    if bars["mid"].iloc[t] < res_level - kl_pts * POINT:
-                        continue
-                    if t + bounce_bars + 1 >= len(bars):
-                        break
-                    next_mids = bars["mid"].iloc[t + 1 : t + bounce_bars + 1].values
-                    if np.min(next_mids) >= res_level - kl_pts * POINT:
-                        continue
-                    sub_price = price[t : min(t + bos_search_bars, len(bars))]
-                    if len(sub_price) < bos_lookback * 2 + 1:
-                        continue
-                    bos_list = _detect_bos(sub_price, bos_lookback, bos_ticks, "down")
-                    if not bos_list:
-                        continue
-                    entry_bar_idx = t + bos_list[0]
-                    if entry_bar_idx >= len(bars):
-                        continue
-                    entry_price = price[entry_bar_idx]
-                    entry_ts = bars.index[entry_bar_idx]
-                    if entry_price > res_level + kl_pts * POINT:
-                        continue
-                    if "buy_vol" in bars.columns and "sell_vol" in bars.columns:
-                        agg_ok = _aggressive_accumulation_bars(bars, entry_bar_idx, bar_sec, agg_win, agg_vol, "short")
-                    elif trades_df is not None:
-                        agg_ok = _aggressive_accumulation_trades(trades_df, entry_ts, agg_win, agg_vol, "short")
-                    else:
-                        agg_ok = _aggressive_accumulation(df, entry_ts, agg_win, agg_vol, "short")
-                    if not agg_ok or not _time_ok(entry_bar_idx):
-                        continue
-                    short_candidate = (entry_bar_idx, entry_price, entry_ts, res_level, "short")
-                    break
+                found = _first_entry("short", res_level)
+                if found is not None:
+                    short_candidate = (*found, res_level, "short")
 
         # Take the earlier of long vs short
         chosen = None
@@ -590,16 +1148,94 @@ def run_backtest(
         entry_bar_idx, entry_price, entry_ts, level_at_entry, side = chosen
         # Optional: test "theoretical better entry" (e.g. 1 bar earlier/later) without tick data
         entry_bar_offset = params.get("entry_bar_offset", 0)
-        entry_bar_idx = max(0, min(entry_bar_idx + entry_bar_offset, len(bars) - 1))
+        entry_bar_idx = max(0, min(entry_bar_idx + entry_bar_offset, n_bars - 1))
+        yield entry_bar_idx, level_at_entry, side
+        i = entry_bar_idx + 1
+
+
+def _run_day(
+    ctx: "DayContext",
+    params: dict,
+    return_trade_details: bool = False,
+    day_label: Optional[str] = None,
+    engine: str = "python",
+):
+    """run_backtest on a built DayContext."""
+    agg_win = params.get("aggressive_window_seconds", 60)  # baseline 60 sec
+    bos_lookback = params.get("bos_swing_lookback", 10)   # baseline 10 bars
+    bos_ticks = params.get("bos_min_break_ticks", 2)      # baseline 2 ticks
+    tp_pts = params.get("tp_points", 40)
+    sl_ticks = params.get("sl_ticks", 12)
+    tp_style = params.get("tp_style", "cob")      # baseline "cob" (real resistance from heatmap)
+    tp_buffer = params.get("tp_buffer", 15)       # baseline 15
+    cob_tp_threshold = params.get("cob_tp_threshold", 30)  # min ask depth to treat as real resistance
+    tp_buffer_pts_cob = params.get("tp_buffer_pts_cob", 2)  # baseline 2 pts below resistance
+    cob_near_key_pts = params.get("cob_near_key_pts", 20)   # prefer resistance within this of key/round levels
+    exit_on_reversal_bos = params.get("exit_on_reversal_bos", True)
+    sl_style = params.get("sl_style", "level")    # "level" | "fixed"
+    sl_buffer_pts = params.get("sl_buffer_pts", 2)       # points below support
+    sl_points_fallback = params.get("sl_points_fallback", 15)  # pts below entry when no level
+
+    # Loops below read plain NumPy arrays (bar_arrays.py) and per-day features cached on the context
+    arr = ctx.arr
+    n_bars = len(arr)
+    has_volume = arr.has_volume
+    # All prices below are int64 half ticks; PT = one point, TK = one tick in those units
+    price = ctx.price
+    PT = HALF_TICKS_PER_POINT
+    TK = HALF_TICKS_PER_TICK
+    # Swing high/low masks of the whole day; the entry search's BOS scans (ctx.bos) run on sub-arrays of price
+    swings = ctx.swings(bos_lookback)
+    # COB heatmap ladder (CSR) and each bar's row in it
+    cob_ladder, cob_rows = ctx.cob() if tp_style == "cob" else (None, None)
+    # Depth-filtered, round-number-flagged ladder for the COB TP: one bisect per bar of an open trade
+    resistance = ctx.resistance(cob_tp_threshold, cob_near_key_pts) if cob_ladder is not None else None
+    trade_pnls = []
+    trade_details = []
+    bounce_bars = params.get("bounce_bars", 3)   # baseline 3 bars after retest
+    # Bounce window after a retest at bar t: max / min of price[t + 1 : t + bounce_bars + 1]
+    bounce_max, bounce_min = ctx.bounce(bounce_bars)
+    # Key levels at entry = running high/low to entry bar only (no look-ahead)
+    running_max, running_min = ctx.running_max, ctx.running_min
+    # Aggressive buy / sell volume of each bar's window (None: only the raw df has trades)
+    aggression = ctx.aggression(agg_win)
+
+    if engine == "numba" and backtest_kernel.HAVE_NUMBA and aggression is not None:
+        rows = backtest_kernel.run_kernel(*_kernel_inputs(
+            params, arr, price, aggression, swings, (bounce_max, bounce_min), (running_max, running_min),
+            (cob_ladder, cob_rows), PT, TK,
+        ))
+        for side_sign, entry_bar_idx, exit_bar_k, _, exit_price, reason, level_at_entry in rows:
+            entry_bar_idx, exit_bar_k = int(entry_bar_idx), int(exit_bar_k)
+            side = "long" if side_sign > 0 else "short"
+            entry_price = price[entry_bar_idx]
+            exit_reason = backtest_kernel.EXIT_REASONS[int(reason)]
+            pnl_ticks = (exit_price - entry_price) / TK if side == "long" else (entry_price - exit_price) / TK
+            trade_pnls.append(pnl_ticks)
+            if return_trade_details:
+                trade_details.append(_trade_detail(
+                    price, day_label, side, entry_bar_idx, exit_bar_k, entry_price, exit_price, exit_reason,
+                    int(level_at_entry), pnl_ticks,
+                ))
+        entries = ()  # skip the Python loop
+    else:
+        # Entries depend only on the entry params: memoized per day on the context, shared across exit-only variants
+        entries = ctx.entries(params)
+
+    for entry_bar_idx, level_at_entry, side in entries:
         entry_price = price[entry_bar_idx]
-        entry_ts = bars.index[entry_bar_idx]
-        running_high = bars["mid"].iloc[: entry_bar_idx + 1].max()
-        running_low = bars["mid"].iloc[: entry_bar_idx + 1].min()
+        running_high = running_max[entry_bar_idx]
+        running_low = running_min[entry_bar_idx]
         key_levels_at_entry = [running_low, running_high, level_at_entry]
+        key_bounds = resistance.key_bounds(key_levels_at_entry) if resistance is not None else None
 
         exit_price = None
         exit_reason = None
         exit_bar_k = None
+        # Reversal BOS on price[entry_bar_idx : k + 1], updated one bar at a time instead of re-run per bar
+        bos_exit = BosDetector(bos_lookback, bos_ticks * TK) if exit_on_reversal_bos else None
+        if bos_exit is not None:
+            bos_exit.push(price[entry_bar_idx])
 
         if side == "long":
             # SL: below support (running_low at entry), capped.
@@ -607,178 +1243,125 @@ def run_backtest(
             trail_sl_pts = params.get("trail_sl_pts", 15)
             if sl_style == "level":
                 support = running_low
-                sl_price = support - sl_buffer_pts * POINT
+                sl_price = support - sl_buffer_pts * PT
                 dist_pts = entry_price - sl_price
-                if sl_price >= entry_price or dist_pts < 3 * POINT:
-                    sl_price = entry_price - sl_points_fallback * POINT
-                elif dist_pts > sl_max_pts:
-                    sl_price = entry_price - sl_points_fallback * POINT
+                if sl_price >= entry_price or dist_pts < 3 * PT:
+                    sl_price = entry_price - sl_points_fallback * PT
+                elif dist_pts > sl_max_pts * PT:
+                    sl_price = entry_price - sl_points_fallback * PT
             else:
-                sl_price = entry_price - sl_ticks * TICK
+                sl_price = entry_price - sl_ticks * TK
             trail_activation_pts = params.get("trail_activation_pts", 0)
-            for k in range(entry_bar_idx + 1, len(bars)):
-                p = bars["mid"].iloc[k]
-                high_so_far = bars["mid"].iloc[entry_bar_idx : k + 1].max()
+            high_so_far = entry_price  # max of price[entry_bar_idx : k + 1], carried bar to bar
+            for k in range(entry_bar_idx + 1, n_bars):
+                p = price[k]
+                reversal = bos_exit is not None and bos_exit.push(p)[1]
+                high_prior = high_so_far  # max of price[entry_bar_idx : k]
+                high_so_far = max(high_so_far, p)
                 if trail_sl_pts:
                     if trail_activation_pts > 0:
-                        if high_so_far >= entry_price + trail_activation_pts * POINT:
-                            sl_price = max(sl_price, high_so_far - trail_sl_pts * POINT)
+                        if high_so_far >= entry_price + trail_activation_pts * PT:
+                            sl_price = max(sl_price, high_so_far - trail_sl_pts * PT)
                     else:
-                        if p >= entry_price + trail_sl_pts * POINT:
-                            sl_price = max(sl_price, entry_price - 2 * POINT)
+                        if p >= entry_price + trail_sl_pts * PT:
+                            sl_price = max(sl_price, entry_price - 2 * PT)
                 if p <= sl_price:
                     exit_price = sl_price
                     exit_reason = "sl"
                     exit_bar_k = k
                     break
-                if exit_on_reversal_bos and k > entry_bar_idx + bos_lookback:
-                    sub = price[entry_bar_idx : k + 1]
-                    if len(sub) >= bos_lookback * 2 + 1 and _detect_bos(sub, bos_lookback, bos_ticks, "down"):
-                        exit_price = p
-                        exit_reason = "reversal_bos"
-                        exit_bar_k = k
-                        break
+                if reversal:
+                    exit_price = p
+                    exit_reason = "reversal_bos"
+                    exit_bar_k = k
+                    break
                 exit_on_exhaustion = params.get("exit_on_exhaustion", False)
-                if exit_on_exhaustion and exit_price is None and k >= entry_bar_idx + 2 and "buy_vol" in bars.columns and "sell_vol" in bars.columns:
-                    unrealized_pts = (p - entry_price) / POINT
+                if exit_on_exhaustion and exit_price is None and k >= entry_bar_idx + 2 and has_volume:
+                    unrealized_pts = (p - entry_price) / PT
                     if unrealized_pts > 5:
-                        prev_mid = bars["mid"].iloc[k - 1]
-                        prev2_mid = bars["mid"].iloc[k - 2]
-                        if p < prev_mid and prev_mid < prev2_mid and bars["sell_vol"].iloc[k] > bars["buy_vol"].iloc[k] and bars["sell_vol"].iloc[k - 1] > bars["buy_vol"].iloc[k - 1]:
+                        prev_mid = price[k - 1]
+                        prev2_mid = price[k - 2]
+                        if p < prev_mid and prev_mid < prev2_mid and arr.sell_vol[k] > arr.buy_vol[k] and arr.sell_vol[k - 1] > arr.buy_vol[k - 1]:
                             exit_price = p
                             exit_reason = "exhaustion"
                             exit_bar_k = k
                             break
                 if tp_style == "hold":
                     pass
-                elif tp_style == "cob" and "cob_ask" in bars.columns:
-                    cob_ask = bars.iloc[k].get("cob_ask") or []
-                    if isinstance(cob_ask, list) and cob_ask:
-                        tp_price = _nearest_cob_resistance_above(
-                            cob_ask, p, cob_tp_threshold,
-                            buffer_pts=tp_buffer_pts_cob,
-                            key_levels=key_levels_at_entry,
-                            near_key_pts=cob_near_key_pts,
-                        )
-                        if tp_price is not None and tp_price > entry_price and p >= tp_price:
+                elif tp_style == "cob" and resistance is not None:
+                    # Same level as _nearest_cob_resistance_above(row, p, cob_tp_threshold, key_levels_at_entry)
+                    level = resistance.nearest_above(cob_rows[k], p, key_bounds)
+                    if level is not None:
+                        tp_price = level - tp_buffer_pts_cob * PT
+                        if tp_price > entry_price and p >= tp_price:
                             min_tp_pts = params.get("min_tp_pts_above_entry", 0)
-                            if min_tp_pts <= 0 or (tp_price - entry_price) >= min_tp_pts * POINT:
+                            if min_tp_pts <= 0 or (tp_price - entry_price) >= min_tp_pts * PT:
                                 exit_price = tp_price
                                 exit_reason = "tp"
                                 exit_bar_k = k
                                 break
                 if tp_style == "session_high" and exit_price is None:
-                    high_prior = bars["mid"].iloc[entry_bar_idx:k].max() if k > entry_bar_idx else entry_price
-                    if high_prior >= entry_price + params.get("min_run_pts", 10) * POINT:
-                        tp_price = high_prior - tp_buffer * POINT
+                    if high_prior >= entry_price + params.get("min_run_pts", 10) * PT:
+                        tp_price = high_prior - tp_buffer * PT
                         if tp_price > entry_price and p >= tp_price:
                             exit_price = tp_price
                             exit_reason = "tp"
                             exit_bar_k = k
                             break
                 if tp_style not in ("cob", "session_high", "hold") and exit_price is None:
-                    if p >= entry_price + tp_pts * TICK:
-                        exit_price = entry_price + tp_pts * TICK
+                    if p >= entry_price + tp_pts * TK:
+                        exit_price = entry_price + tp_pts * TK
                         exit_reason = "tp"
                         exit_bar_k = k
                         break
         else:
             # Short: SL above resistance, exit on price >= sl_price or reversal BOS up
-            sl_price = running_high + sl_buffer_pts * POINT
+            sl_price = running_high + sl_buffer_pts * PT
             dist_pts = sl_price - entry_price
-            if dist_pts < 3 * POINT or dist_pts > params.get("sl_max_pts", 25) * POINT:
-                sl_price = entry_price + sl_points_fallback * POINT
+            if dist_pts < 3 * PT or dist_pts > params.get("sl_max_pts", 25) * PT:
+                sl_price = entry_price + sl_points_fallback * PT
             trail_sl_pts = params.get("trail_sl_pts", 15)
-            for k in range(entry_bar_idx + 1, len(bars)):
-                p = bars["mid"].iloc[k]
-                low_so_far = bars["mid"].iloc[entry_bar_idx : k + 1].min()
-                if trail_sl_pts and p <= entry_price - trail_sl_pts * POINT:
-                    sl_price = min(sl_price, entry_price + 2 * POINT)
+            for k in range(entry_bar_idx + 1, n_bars):
+                p = price[k]
+                reversal = bos_exit is not None and bos_exit.push(p)[0]
+                if trail_sl_pts and p <= entry_price - trail_sl_pts * PT:
+                    sl_price = min(sl_price, entry_price + 2 * PT)
                 if p >= sl_price:
                     exit_price = sl_price
                     exit_reason = "sl"
                     exit_bar_k = k
                     break
-                if exit_on_reversal_bos and k > entry_bar_idx + bos_lookback:
-                    sub = price[entry_bar_idx : k + 1]
-                    if len(sub) >= bos_lookback * 2 + 1 and _detect_bos(sub, bos_lookback, bos_ticks, "up"):
-                        exit_price = p
-                        exit_reason = "reversal_bos"
-                        exit_bar_k = k
-                        break
+                if reversal:
+                    exit_price = p
+                    exit_reason = "reversal_bos"
+                    exit_bar_k = k
+                    break
                 # Optional fixed TP below for shorts
                 if tp_style not in ("hold", "cob", "session_high") and exit_price is None:
-                    tp_price_short = entry_price - tp_pts * TICK
+                    tp_price_short = entry_price - tp_pts * TK
                     if p <= tp_price_short:
                         exit_price = tp_price_short
                         exit_reason = "tp"
                         exit_bar_k = k
                         break
         max_hold_bars = params.get("max_hold_bars", 80)
-        if exit_price is None and entry_bar_idx + max_hold_bars < len(bars):
-            exit_bar_k = min(entry_bar_idx + max_hold_bars, len(bars) - 1)
-            exit_price = bars["mid"].iloc[exit_bar_k]
+        if exit_price is None and entry_bar_idx + max_hold_bars < n_bars:
+            exit_bar_k = min(entry_bar_idx + max_hold_bars, n_bars - 1)
+            exit_price = price[exit_bar_k]
             exit_reason = "time"
         if exit_price is not None:
-            pnl_ticks = (exit_price - entry_price) / TICK if side == "long" else (entry_price - exit_price) / TICK
+            pnl_ticks = (exit_price - entry_price) / TK if side == "long" else (entry_price - exit_price) / TK
             trade_pnls.append(pnl_ticks)
             if return_trade_details and exit_bar_k is not None:
-                high_run = bars["mid"].iloc[entry_bar_idx : exit_bar_k + 1].max()
-                low_run = bars["mid"].iloc[entry_bar_idx : exit_bar_k + 1].min()
-                if side == "long":
-                    mfe_pts = (high_run - entry_price) / POINT
-                    mae_pts = (entry_price - low_run) / POINT
-                else:
-                    mfe_pts = (entry_price - low_run) / POINT
-                    mae_pts = (high_run - entry_price) / POINT
-                detail = {
-                    "day": day_label,
-                    "side": side,
-                    "entry_bar": entry_bar_idx,
-                    "minutes_from_open": entry_bar_idx,
-                    "exit_bar": exit_bar_k,
-                    "entry_price": entry_price,
-                    "exit_price": exit_price,
-                    "pnl_ticks": pnl_ticks,
-                    "pnl_pts": pnl_ticks * TICK / POINT,
-                    "exit_reason": exit_reason or "unknown",
-                    "mfe_pts": mfe_pts,
-                    "mae_pts": mae_pts,
-                    "acc_level": level_at_entry,
-                }
-                if exit_reason == "tp":
-                    detail["tp_distance_pts"] = abs(exit_price - entry_price) / POINT
-                else:
-                    detail["tp_distance_pts"] = None
-                trade_details.append(detail)
-        i = entry_bar_idx + 1
+                trade_details.append(_trade_detail(
+                    price, day_label, side, entry_bar_idx, exit_bar_k, entry_price, exit_price, exit_reason,
+                    level_at_entry, pnl_ticks,
+                ))
         max_trades_per_day = params.get("max_trades_per_day", 5)
         if len(trade_pnls) >= max_trades_per_day:
             break
 
-    # Results
-    trades = len(trade_pnls)
-    wins = sum(1 for p in trade_pnls if p > 0)
-    losses = sum(1 for p in trade_pnls if p <= 0)
-    total_pnl = sum(trade_pnls)
-    win_rate = wins / trades if trades else 0
-    dd = 0.0
-    cum = 0
-    for p in trade_pnls:
-        cum += p
-        dd = min(dd, cum)
-    sharpe = (np.mean(trade_pnls) / (np.std(trade_pnls) + 1e-9)) * np.sqrt(252) if len(trade_pnls) >= 2 else None
-
-    result = BacktestResult(
-        params=params,
-        trades=trades,
-        wins=wins,
-        losses=losses,
-        total_pnl_ticks=total_pnl,
-        sharpe=sharpe,
-        max_drawdown_ticks=abs(dd),
-        win_rate=win_rate,
-    )
+    result = _summarize(params, trade_pnls)
     if return_trade_details:
         return result, trade_details
     return result
@@ -846,7 +1429,7 @@ def get_best_params(results: list[BacktestResult], metric: str = "total_pnl_tick
 
 
 if __name__ == "__main__":
-    data_files = list(DATA_DIR.glob("*.dbn"))
+    data_files = dbn_files("*")
     if not data_files:
         print("No .dbn files. Run fetch_data.py --confirm first.")
     else:
@@ -0,0 +1,319 @@
+"""
+Compiled backtest kernel: run_backtest's entry sequence and exit rules as @njit loops over arrays
+(run_backtest(..., engine="numba")). Same trades as the Python engine; run check_engine_parity.py
+after changing either one.
+
+Everything that needs pandas / a trade tape is resolved into per-bar arrays before the call
+(backtest_engine._kernel_inputs): half-tick prices, depths, aggressive buy/sell volume of the window
+ending (bars) or starting (tape) at each bar, swing masks, bounce max/min, the COB ladder's CSR arrays
+and each bar's row. The kernel returns one row per trade; run_backtest turns those into the usual
+BacktestResult / trade details.
+
+numba is optional: without it HAVE_NUMBA is False, run_backtest stays on the Python engine, and the
+functions here still import (as plain Python) so the parity script can exercise them.
+"""
+import numpy as np
+
+try:
+    from numba import njit
+
+    HAVE_NUMBA = True
+except ImportError:
+    HAVE_NUMBA = False
+
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda f: f
+
+
+# Exit reasons (index into EXIT_REASONS)
+EXIT_REASONS = ("sl", "reversal_bos", "exhaustion", "tp", "time")
+EXIT_SL, EXIT_REVERSAL, EXIT_EXHAUSTION, EXIT_TP, EXIT_TIME = range(5)
+# tp_style codes
+TP_FIXED, TP_COB, TP_SESSION_HIGH, TP_HOLD = range(4)
+TP_STYLES = {"cob": TP_COB, "session_high": TP_SESSION_HIGH, "hold": TP_HOLD}
+# Columns of the trade rows returned by run_kernel
+TRADE_COLS = ("side", "entry_bar", "exit_bar", "entry_price", "exit_price", "exit_reason", "level")
+
+
+@njit(cache=True)
+def _passive_level(price, depth, start_idx, lookback_bars, cob_threshold, min_count, is_long):
+    """_passive_accumulation_level on arrays: (found, level)."""
+    start = max(0, start_idx - lookback_bars)
+    count = 0
+    level = 0
+    for j in range(start, start_idx + 1):
+        if depth[j] >= cob_threshold:
+            if count == 0 or (is_long and price[j] < level) or (not is_long and price[j] > level):
+                level = price[j]
+            count += 1
+    return count >= min_count, level
+
+
+@njit(cache=True)
+def _first_bos(price, mask, t, length, lookback, min_break, is_up):
+    """_detect_bos(price[t:t + length], ..., swings, t): first break index in the sub-array, or -1."""
+    start = lookback * 2 + 1
+    window = lookback * 4
+    if length <= start or window == 0:
+        return -1
+    for i in range(start, length):
+        found = False
+        best = 0.0
+        # Swings of the sub-array: full window inside it (lookback <= j < length - lookback)
+        for j in range(max(i - window, lookback), min(i, length - lookback)):
+            if mask[t + j]:
+                v = float(price[t + j])
+                if not found or (is_up and v > best) or (not is_up and v < best):
+                    best = v
+                    found = True
+        if found:
+            p = float(price[t + i])
+            if (is_up and p > best + min_break) or (not is_up and p < best - min_break):
+                return i
+    return -1
+
+
+@njit(cache=True)
+def _reversal(price, mask, entry, k, lookback, min_break, is_up):
+    """BosDetector.push on price[entry:k + 1]: does bar k break given the swings confirmed by bar k?"""
+    i = k - entry
+    if lookback == 0 or i < 2 * lookback + 1:
+        return False
+    found = False
+    best = 0.0
+    for j in range(max(i - 4 * lookback, lookback), i - lookback + 1):
+        if mask[entry + j]:
+            v = float(price[entry + j])
+            if not found or (is_up and v > best) or (not is_up and v < best):
+                best = v
+                found = True
+    if not found:
+        return False
+    p = float(price[k])
+    return (is_up and p > best + min_break) or (not is_up and p < best - min_break)
+
+
+@njit(cache=True)
+def _cob_tp(cob_offsets, cob_ticks, cob_ref, cob_depth, row, p, tk, min_depth, buffer_pts, key0, key1, key2,
+            near_key_pts, point):
+    """_nearest_cob_resistance_above on one ladder row (half ticks). Returns (found, tp price)."""
+    s = cob_offsets[row]
+    e = cob_offsets[row + 1]
+    if e == s:
+        return False, 0.0
+    round_step = 50.0 * point
+    near_dist = near_key_pts * point
+    first_strong = -1.0
+    first_near = -1.0
+    have_strong = False
+    have_near = False
+    for q in range(s, e):
+        c = (cob_ticks[q] + cob_ref) * tk
+        if c <= p or not cob_depth[q] >= min_depth:
+            continue
+        cf = float(c)
+        if not have_strong:
+            first_strong = cf
+            have_strong = True
+        near = abs(cf - np.rint(cf / round_step) * round_step) <= near_dist
+        near = near or abs(cf - key0) <= near_dist or abs(cf - key1) <= near_dist or abs(cf - key2) <= near_dist
+        if near:
+            first_near = cf
+            have_near = True
+            break
+    if not have_strong:
+        return False, 0.0
+    resistance = first_near if have_near else first_strong
+    return True, resistance - buffer_pts * point
+
+
+@njit(cache=True)
+def run_kernel(
+    price, bid_depth, ask_depth, agg_buy, agg_sell, has_agg, buy_vol, sell_vol, has_volume,
+    swing_high, swing_low, bounce_max, bounce_min, running_max, running_min,
+    cob_offsets, cob_ticks, cob_ref, cob_depth, cob_rows, has_cob,
+    pt, tk,
+    min_pa, cob, passive_lookback_bars, kl_pts, agg_vol, bos_lookback, bos_ticks, bos_search_bars,
+    bounce_bars, enable_shorts, tp_style, tp_pts, tp_buffer, min_run_pts, cob_tp_threshold,
+    tp_buffer_pts_cob, cob_near_key_pts, min_tp_pts, exit_on_reversal_bos, exit_on_exhaustion,
+    sl_level, sl_buffer_pts, sl_points_fallback, sl_ticks, sl_max_pts, trail_sl_pts, trail_activation_pts,
+    entry_bar_offset, max_hold_bars, max_trades_per_day, no_first_minutes, lunch_start, lunch_end,
+):
+    """
+    run_backtest's bar loop. Returns trade rows (see TRADE_COLS; side +1 long / -1 short, prices in
+    half ticks, exit_reason indexes EXIT_REASONS).
+    """
+    n = len(price)
+    out = np.zeros((max(n, 1), 7), dtype=np.float64)
+    n_trades = 0
+    min_break = float(bos_ticks * tk)
+    kl = kl_pts * pt
+    i = 0
+    while i < n - passive_lookback_bars - bos_lookback * 4:
+        # --- Next long / short entry: (entry bar, level); -1 = none
+        cand_bar = np.array([-1, -1])
+        cand_level = np.array([0, 0], dtype=np.int64)
+        for side in range(2):
+            is_long = side == 0
+            if not is_long and not enable_shorts:
+                continue
+            found, level = _passive_level(price, bid_depth if is_long else ask_depth, i, passive_lookback_bars, cob, min_pa, is_long)
+            if not found:
+                continue
+            for t in range(i, min(i + bos_search_bars, n - bos_lookback * 2 - bounce_bars - 1)):
+                if is_long and price[t] > level + kl:
+                    continue
+                if not is_long and price[t] < level - kl:
+                    continue
+                if t + bounce_bars + 1 >= n:
+                    break
+                if is_long and bounce_max[t] <= level + kl:
+                    continue
+                if not is_long and bounce_min[t] >= level - kl:
+                    continue
+                length = min(t + bos_search_bars, n) - t
+                if length < bos_lookback * 2 + 1:
+                    continue
+                b = _first_bos(price, swing_high if is_long else swing_low, t, length, bos_lookback, min_break, is_long)
+                if b < 0:
+                    continue
+                e = t + b
+                if e >= n:
+                    continue
+                if is_long and price[e] < level - kl:
+                    continue
+                if not is_long and price[e] > level + kl:
+                    continue
+                if not has_agg:
+                    continue
+                if is_long:
+                    agg_ok = agg_buy[e] > agg_sell[e] and agg_buy[e] >= agg_vol
+                else:
+                    agg_ok = agg_sell[e] > agg_buy[e] and agg_sell[e] >= agg_vol
+                if not agg_ok:
+                    continue
+                if no_first_minutes and e < no_first_minutes:
+                    continue
+                if lunch_start <= e < lunch_end:
+                    continue
+                cand_bar[side] = e
+                cand_level[side] = level
+                break
+        if cand_bar[0] < 0 and cand_bar[1] < 0:
+            i += 1
+            continue
+        if cand_bar[0] >= 0 and (cand_bar[1] < 0 or cand_bar[0] <= cand_bar[1]):
+            is_long = True
+            entry = cand_bar[0]
+            level_at_entry = cand_level[0]
+        else:
+            is_long = False
+            entry = cand_bar[1]
+            level_at_entry = cand_level[1]
+
+        entry = max(0, min(entry + entry_bar_offset, n - 1))
+        entry_price = price[entry]
+        running_high = running_max[entry]
+        running_low = running_min[entry]
+
+        exit_found = False
+        exit_price = 0.0
+        exit_reason = -1
+        exit_bar = -1
+        if is_long:
+            if sl_level:
+                sl_price = float(running_low - sl_buffer_pts * pt)
+                dist = entry_price - sl_price
+                if sl_price >= entry_price or dist < 3 * pt:
+                    sl_price = float(entry_price - sl_points_fallback * pt)
+                elif dist > sl_max_pts * pt:
+                    sl_price = float(entry_price - sl_points_fallback * pt)
+            else:
+                sl_price = float(entry_price - sl_ticks * tk)
+            high_so_far = entry_price
+            high_prior = entry_price
+            for k in range(entry + 1, n):
+                p = price[k]
+                reversal = exit_on_reversal_bos and _reversal(price, swing_low, entry, k, bos_lookback, min_break, False)
+                high_prior = high_so_far  # max of price[entry:k]
+                high_so_far = max(high_so_far, p)
+                if trail_sl_pts:
+                    if trail_activation_pts > 0:
+                        if high_so_far >= entry_price + trail_activation_pts * pt:
+                            sl_price = max(sl_price, high_so_far - trail_sl_pts * pt)
+                    else:
+                        if p >= entry_price + trail_sl_pts * pt:
+                            sl_price = max(sl_price, float(entry_price - 2 * pt))
+                if p <= sl_price:
+                    exit_found, exit_price, exit_reason, exit_bar = True, sl_price, EXIT_SL, k
+                    break
+                if reversal:
+                    exit_found, exit_price, exit_reason, exit_bar = True, float(p), EXIT_REVERSAL, k
+                    break
+                if exit_on_exhaustion and k >= entry + 2 and has_volume:
+                    if (p - entry_price) / pt > 5:
+                        prev_mid = price[k - 1]
+                        prev2_mid = price[k - 2]
+                        if p < prev_mid and prev_mid < prev2_mid and sell_vol[k] > buy_vol[k] and sell_vol[k - 1] > buy_vol[k - 1]:
+                            exit_found, exit_price, exit_reason, exit_bar = True, float(p), EXIT_EXHAUSTION, k
+                            break
+                if tp_style == TP_COB and has_cob:
+                    row = cob_rows[k]
+                    if row >= 0:
+                        ok, tp_price = _cob_tp(
+                            cob_offsets, cob_ticks, cob_ref, cob_depth, row, p, tk, cob_tp_threshold,
+                            tp_buffer_pts_cob, float(running_low), float(running_high), float(level_at_entry),
+                            cob_near_key_pts, float(pt),
+                        )
+                        if ok and tp_price > entry_price and p >= tp_price:
+                            if min_tp_pts <= 0 or (tp_price - entry_price) >= min_tp_pts * pt:
+                                exit_found, exit_price, exit_reason, exit_bar = True, tp_price, EXIT_TP, k
+                                break
+                if tp_style == TP_SESSION_HIGH:
+                    if high_prior >= entry_price + min_run_pts * pt:
+                        tp_price = high_prior - tp_buffer * pt
+                        if tp_price > entry_price and p >= tp_price:
+                            exit_found, exit_price, exit_reason, exit_bar = True, float(tp_price), EXIT_TP, k
+                            break
+                if tp_style == TP_FIXED:
+                    if p >= entry_price + tp_pts * tk:
+                        exit_found, exit_price, exit_reason, exit_bar = True, float(entry_price + tp_pts * tk), EXIT_TP, k
+                        break
+        else:
+            sl_price = float(running_high + sl_buffer_pts * pt)
+            dist = sl_price - entry_price
+            if dist < 3 * pt or dist > sl_max_pts * pt:
+                sl_price = float(entry_price + sl_points_fallback * pt)
+            for k in range(entry + 1, n):
+                p = price[k]
+                reversal = exit_on_reversal_bos and _reversal(price, swing_high, entry, k, bos_lookback, min_break, True)
+                if trail_sl_pts and p <= entry_price - trail_sl_pts * pt:
+                    sl_price = min(sl_price, float(entry_price + 2 * pt))
+                if p >= sl_price:
+                    exit_found, exit_price, exit_reason, exit_bar = True, sl_price, EXIT_SL, k
+                    break
+                if reversal:
+                    exit_found, exit_price, exit_reason, exit_bar = True, float(p), EXIT_REVERSAL, k
+                    break
+                if tp_style == TP_FIXED:
+                    if p <= entry_price - tp_pts * tk:
+                        exit_found, exit_price, exit_reason, exit_bar = True, float(entry_price - tp_pts * tk), EXIT_TP, k
+                        break
+        if not exit_found and entry + max_hold_bars < n:
+            exit_bar = min(entry + max_hold_bars, n - 1)
+            exit_found, exit_price, exit_reason = True, float(price[exit_bar]), EXIT_TIME
+        if exit_found:
+            out[n_trades, 0] = 1.0 if is_long else -1.0
+            out[n_trades, 1] = entry
+            out[n_trades, 2] = exit_bar
+            out[n_trades, 3] = entry_price
+            out[n_trades, 4] = exit_price
+            out[n_trades, 5] = exit_reason
+            out[n_trades, 6] = level_at_entry
+            n_trades += 1
+        i = entry + 1
+        if n_trades >= max_trades_per_day:
+            break
+    return out[:n_trades]
@@ -0,0 +1,61 @@
+"""
+Bars as a struct of contiguous NumPy arrays for run_backtest's per-bar loops: positional reads and
+slices are plain array indexing instead of bars["col"].iloc[...] / bars.iloc[a:b] pandas calls.
+
+The bars DataFrame stays the input / output format; BarArrays.from_frame() converts it once per run
+(columns are viewed, not copied, when already contiguous). The COB ladder and each bar's row in it
+(-1 = no row) come along when asked for, so TP lookups read the CSR arrays directly.
+"""
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from cob_ladder import CobLadder
+
+
+@dataclass
+class BarArrays:
+    ts_ns: np.ndarray                        # int64 bar timestamps
+    mid: np.ndarray                          # float64, points
+    bid_depth: np.ndarray                    # float64
+    ask_depth: np.ndarray                    # float64
+    buy_vol: Optional[np.ndarray] = None     # None when the bars have no buy_vol / sell_vol columns
+    sell_vol: Optional[np.ndarray] = None
+    cob: Optional[CobLadder] = None
+    cob_rows: Optional[np.ndarray] = None    # ladder row of each bar, -1 where the ladder has none
+
+    def __len__(self) -> int:
+        return len(self.mid)
+
+    @property
+    def has_volume(self) -> bool:
+        return self.buy_vol is not None and self.sell_vol is not None
+
+    @classmethod
+    def from_frame(cls, bars: pd.DataFrame, with_cob: bool = False) -> "BarArrays":
+        def col(name, dtype=None):
+            return np.ascontiguousarray(bars[name].to_numpy(dtype=dtype)) if name in bars.columns else None
+
+        has_volume = "buy_vol" in bars.columns and "sell_vol" in bars.columns
+        cob = CobLadder.from_bars(bars) if with_cob else None
+        return cls(
+            ts_ns=bars.index.as_unit("ns").asi8 if isinstance(bars.index, pd.DatetimeIndex) else np.asarray(bars.index),
+            mid=col("mid", np.float64),
+            bid_depth=col("bid_depth", np.float64),
+            ask_depth=col("ask_depth", np.float64),
+            buy_vol=col("buy_vol") if has_volume else None,
+            sell_vol=col("sell_vol") if has_volume else None,
+            cob=cob,
+            cob_rows=cob.rows_for(bars.index) if cob is not None else None,
+        )
+
+    @classmethod
+    def coerce(cls, bars) -> "BarArrays":
+        """BarArrays as-is, a bars DataFrame converted (without the COB)."""
+        return bars if isinstance(bars, cls) else cls.from_frame(bars)
+
+    def depth(self, direction: str) -> np.ndarray:
+        """Passive side's depth: bid_depth for longs, ask_depth for shorts."""
+        return self.bid_depth if direction == "long" else self.ask_depth
@@ -0,0 +1,728 @@
+"""
+Vectorized DBN -> bars ingestion. Same output as the per-record replay() callback in
+backtest_engine.load_dbn_streaming (engine="python"), but the DBN is read in fixed-size chunks of
+NumPy structured arrays (DBNStore.to_ndarray) and every per-record step - bar index, mid, summed
+bid/ask depth, aggressive buy/sell volume, ask depth by price - is an array op / bincount.
+Prices stay int64 ticks (raw fixed-point / tick, integer math) for COB keys and the trade tape; only the
+bar mid is written out in points.
+
+BarAccumulator holds the running per-bar sums so chunks can be fed one at a time (RAM stays at one chunk).
+Sums roll up exactly to any multiple of the bar size, so several resolutions come out of one pass
+(load_dbn_multi_vectorized).
+
+Uncompressed DBN records are fixed-size, so a big day can also be cut into byte-range shards that a
+process pool decodes in parallel (workers > 1); the shard accumulators merge back exactly.
+Single-process reads (and all .dbn.zst days) are pipelined: a reader thread decompresses / reads raw
+record blocks into a bounded queue while the main thread aggregates the previous chunk.
+"""
+import multiprocessing
+import queue
+import struct
+import threading
+from math import gcd
+from pathlib import Path
+from typing import Optional
+
+import databento as db
+import numpy as np
+import pandas as pd
+import zstandard
+
+from cob_ladder import CobLadder
+from latency import LatencyRecorder
+from trade_tape import TradeTape
+
+FIXED_PRICE_SCALE = 1e9      # databento fixed-point prices: 1 unit = 1e-9
+UNDEF_PRICE = np.iinfo(np.int64).max
+TICK_PX = 0.25  # MNQ (default; instruments.py has the others)
+CHUNK_RECORDS = 250_000      # ~90 MB per chunk for MBP-10 (368 B/record)
+DENSE_COB_MAX_CELLS = 1 << 24  # bars x price span below this -> dense bincount instead of np.unique
+
+_COB_TICK_BIAS = 1 << 31     # COB key = bar << 32 | (ticks + bias): sorts by bar, then price
+MIN_BASE_BAR_NS = 1_000_000  # multi-res: finer common grid than 1 ms -> one accumulator per resolution
+MIN_SHARD_RECORDS = 2 * CHUNK_RECORDS  # smaller shards cost more in process start-up than they save
+PREFETCH_CHUNKS = 2          # raw chunks the reader thread may run ahead of aggregation
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+
+PX_PER_TICK = int(round(TICK_PX * FIXED_PRICE_SCALE))  # fixed-point units in one tick
+NO_PRICE_TICKS = -1          # price_ticks of a trade without a price
+
+
+def px_to_ticks(px: np.ndarray, px_per_tick: int = PX_PER_TICK) -> np.ndarray:
+    """Raw fixed-point prices -> int64 ticks (nearest tick), integer math only. Undefined -> NO_PRICE_TICKS."""
+    px = np.asarray(px, dtype=np.int64)
+    undef = px == UNDEF_PRICE
+    ticks = (np.where(undef, 0, px) + px_per_tick // 2) // px_per_tick
+    ticks[undef] = NO_PRICE_TICKS
+    return ticks
+
+
+def _mid_from_ticks(bid_px: np.ndarray, ask_px: np.ndarray, tick_px: float = TICK_PX) -> np.ndarray:
+    """BBO mid in points from the integer tick prices (bid + ask is the mid in half ticks); NaN where undefined."""
+    px_per_tick = int(round(tick_px * FIXED_PRICE_SCALE))
+    half_ticks = (px_to_ticks(bid_px, px_per_tick) + px_to_ticks(ask_px, px_per_tick)).astype(np.float64)
+    out = half_ticks * (tick_px / 2)
+    out[(bid_px == UNDEF_PRICE) | (ask_px == UNDEF_PRICE)] = np.nan
+    return out
+
+
+_STATE_ARRAYS = ("exists", "n", "bid_sum", "ask_sum", "buy_vol", "sell_vol", "mid_last", "mid_seq")
+
+
+class BarAccumulator:
+    """
+    Running per-bar aggregates for one session. Bars are indexed from the first record's ts_recv.
+    update(chunk) takes one structured array from DBNStore.to_ndarray; finish() builds the frames.
+    state() / from_state() round-trip everything update() has accumulated, so a day can be resumed
+    from its last processed record (load_dbn_incremental).
+    tick_px: the instrument's tick in points (COB / trade prices are ticks of it, mids are in points).
+    """
+
+    def __init__(self, freq_sec: float = 60.0, build_cob: bool = True, tick_px: float = TICK_PX):
+        self.freq_sec = freq_sec
+        self.build_cob = build_cob
+        self.tick_px = tick_px
+        self.px_per_tick = int(round(tick_px * FIXED_PRICE_SCALE))
+        self.bar_ns = int(freq_sec * 1_000_000_000)
+        self.first_ts_ns: Optional[int] = None
+        size = 512
+        self.exists = np.zeros(size, dtype=bool)
+        self.n = np.zeros(size, dtype=np.int64)
+        self.bid_sum = np.zeros(size, dtype=np.float64)
+        self.ask_sum = np.zeros(size, dtype=np.float64)
+        self.buy_vol = np.zeros(size, dtype=np.int64)
+        self.sell_vol = np.zeros(size, dtype=np.int64)
+        self.mid_last = np.zeros(size, dtype=np.float64)
+        self.mid_seq = np.full(size, -1, dtype=np.int64)  # record number that set mid_last (-1 = none)
+        self.records_seen = 0
+        self.last_record: Optional[bytes] = None  # raw bytes of record records_seen - 1 (resume check)
+        # COB: (key, depth) pairs per chunk, reduced lazily
+        self._cob_keys: list = []
+        self._cob_depth: list = []
+        self._cob_pending = 0
+        self._trade_ts: list = []
+        self._trade_side: list = []
+        self._trade_size: list = []
+        self._trade_px: list = []
+
+    def _grow(self, max_bar: int) -> None:
+        size = len(self.exists)
+        if max_bar < size:
+            return
+        new_size = max(max_bar + 1, size * 2)
+        for name in _STATE_ARRAYS:
+            old = getattr(self, name)
+            new = np.full(new_size, -1 if name == "mid_seq" else 0, dtype=old.dtype)
+            new[:size] = old
+            setattr(self, name, new)
+
+    def update(self, rec: np.ndarray) -> None:
+        if len(rec) == 0:
+            return
+        names = rec.dtype.names
+        ts = rec["ts_recv"].astype(np.int64)
+        if self.first_ts_ns is None:
+            self.first_ts_ns = int(ts[0])
+        bar = (ts - self.first_ts_ns) // self.bar_ns
+        seq = np.arange(self.records_seen, self.records_seen + len(rec), dtype=np.int64)
+        self.records_seen += len(rec)
+        self.last_record = rec[-1].tobytes()
+        ok = bar >= 0
+        if not ok.all():
+            rec, bar, seq = rec[ok], bar[ok], seq[ok]
+            if len(rec) == 0:
+                return
+        is_trade = rec["action"] == b"T"
+        n_levels = sum(1 for k in range(10) if f"bid_px_{k:02d}" in names)
+        has_levels = n_levels > 0
+
+        # A bar exists once it sees a trade or a book record with levels
+        creates = np.ones(len(rec), dtype=bool) if has_levels else is_trade
+        nb_needed = int(bar.max()) + 1
+        self._grow(nb_needed - 1)
+        self.exists[bar[creates]] = True
+
+        # Aggressive volume: side "B" = buy, anything else counts as sell (same as the callback)
+        t_bar = bar[is_trade]
+        t_size = rec["size"][is_trade].astype(np.int64)
+        t_side = rec["side"][is_trade]
+        is_buy = t_side == b"B"
+        self.buy_vol[:nb_needed] += np.bincount(t_bar[is_buy], weights=t_size[is_buy], minlength=nb_needed).astype(np.int64)
+        self.sell_vol[:nb_needed] += np.bincount(t_bar[~is_buy], weights=t_size[~is_buy], minlength=nb_needed).astype(np.int64)
+        self._trade_ts.append(rec["ts_recv"][is_trade].astype(np.int64))
+        self._trade_side.append(t_side.copy())
+        self._trade_size.append(t_size)
+        self._trade_px.append(px_to_ticks(rec["price"][is_trade], self.px_per_tick) if "price" in names else np.full(int(is_trade.sum()), NO_PRICE_TICKS, np.int64))
+
+        # Mid of each record: BBO mid when levels exist, else trade price (trade-only schemas)
+        if has_levels:
+            mid = _mid_from_ticks(rec["bid_px_00"], rec["ask_px_00"], self.tick_px)
+            has_mid = np.ones(len(rec), dtype=bool)
+            bid_d = np.zeros(len(rec), dtype=np.int64)
+            ask_d = np.zeros(len(rec), dtype=np.int64)
+            for k in range(n_levels):
+                bid_d += rec[f"bid_sz_{k:02d}"]
+                ask_d += rec[f"ask_sz_{k:02d}"]
+            self.n[:nb_needed] += np.bincount(bar, minlength=nb_needed)
+            self.bid_sum[:nb_needed] += np.bincount(bar, weights=bid_d, minlength=nb_needed)
+            self.ask_sum[:nb_needed] += np.bincount(bar, weights=ask_d, minlength=nb_needed)
+        else:
+            price = rec["price"]
+            mid = px_to_ticks(price, self.px_per_tick) * self.tick_px
+            has_mid = is_trade & (price != UNDEF_PRICE) & (mid > 0)
+        if has_mid.any():
+            # Last record with a mid wins within each bar (records are in file order)
+            m_bar = bar[has_mid]
+            m_val = mid[has_mid]
+            ubar, first_rev = np.unique(m_bar[::-1], return_index=True)
+            last = len(m_val) - 1 - first_rev
+            self.mid_last[ubar] = m_val[last]
+            self.mid_seq[ubar] = seq[has_mid][last]
+
+        if self.build_cob and has_levels:
+            self._add_cob(rec, bar, n_levels)
+
+    def _add_cob(self, rec: np.ndarray, bar: np.ndarray, n_levels: int) -> None:
+        bars_l, ticks_l, sz_l = [], [], []
+        for k in range(n_levels):
+            px = rec[f"ask_px_{k:02d}"]
+            sz = rec[f"ask_sz_{k:02d}"]
+            keep = (px != UNDEF_PRICE) & (sz > 0)
+            if not keep.any():
+                continue
+            ticks = px_to_ticks(px[keep], self.px_per_tick)
+            bars_l.append(bar[keep])
+            ticks_l.append(ticks)
+            sz_l.append(sz[keep].astype(np.float64))
+        if not bars_l:
+            return
+        b = np.concatenate(bars_l)
+        t = np.concatenate(ticks_l)
+        s = np.concatenate(sz_l)
+        b0, t0 = int(b.min()), int(t.min())
+        span_t = int(t.max()) - t0 + 1
+        cells = (int(b.max()) - b0 + 1) * span_t
+        if cells <= DENSE_COB_MAX_CELLS:
+            dense = np.bincount((b - b0) * span_t + (t - t0), weights=s, minlength=cells)
+            nz = np.flatnonzero(dense)
+            keys = ((nz // span_t + b0) << 32) + (nz % span_t + t0 + _COB_TICK_BIAS)
+            depth = dense[nz]
+        else:
+            raw = (b << 32) + (t + _COB_TICK_BIAS)
+            keys, inv = np.unique(raw, return_inverse=True)
+            depth = np.bincount(inv, weights=s)
+        self._cob_keys.append(keys)
+        self._cob_depth.append(depth)
+        self._cob_pending += len(keys)
+        if self._cob_pending > 4 * CHUNK_RECORDS:
+            self._reduce_cob()
+
+    def _reduce_cob(self) -> None:
+        if len(self._cob_keys) <= 1:
+            return
+        keys, inv = np.unique(np.concatenate(self._cob_keys), return_inverse=True)
+        depth = np.bincount(inv, weights=np.concatenate(self._cob_depth))
+        self._cob_keys, self._cob_depth = [keys], [depth]
+        self._cob_pending = len(keys)
+
+    def cob_arrays(self) -> tuple:
+        """Reduced COB as (bar_idx, ticks, depth), sorted by bar then price; price = ticks * tick_px."""
+        self._reduce_cob()
+        if not self._cob_keys:
+            return np.zeros(0, np.int64), np.zeros(0, np.int64), np.zeros(0, np.float64)
+        keys, depth = self._cob_keys[0], self._cob_depth[0]
+        cob_bar = keys >> 32
+        ticks = (keys & 0xFFFFFFFF) - _COB_TICK_BIAS
+        return cob_bar, ticks, depth
+
+    def merge(self, other: "BarAccumulator") -> None:
+        """
+        Fold in the accumulator of the next shard of the same file (same first_ts_ns and bar size, global
+        record numbers). Sums add; per bar, the mid with the later record number wins, so carrying
+        mid_last / depth across the shard boundary is left to finish() exactly as in a single pass.
+        """
+        nb = len(other.exists)
+        self._grow(nb - 1)
+        self.exists[:nb] |= other.exists
+        for name in ("n", "bid_sum", "ask_sum", "buy_vol", "sell_vol"):
+            getattr(self, name)[:nb] += getattr(other, name)
+        later = other.mid_seq > self.mid_seq[:nb]
+        self.mid_last[:nb][later] = other.mid_last[later]
+        self.mid_seq[:nb][later] = other.mid_seq[later]
+        if other.records_seen >= self.records_seen:
+            self.records_seen = other.records_seen
+            self.last_record = other.last_record
+        self._cob_keys.extend(other._cob_keys)
+        self._cob_depth.extend(other._cob_depth)
+        self._cob_pending += other._cob_pending
+        self._reduce_cob()
+        self._trade_ts.extend(other._trade_ts)
+        self._trade_side.extend(other._trade_side)
+        self._trade_size.extend(other._trade_size)
+        self._trade_px.extend(other._trade_px)
+
+    def state(self) -> dict:
+        """
+        Everything accumulated so far as plain arrays / scalars: per-bar sums, the open bar's partial sums
+        and last mid (mid_last / mid_seq), reduced COB and the raw trades. from_state() inverts it.
+        """
+        self._reduce_cob()
+        nb = int(np.flatnonzero(self.exists)[-1]) + 1 if self.exists.any() else 0
+        out = {name: getattr(self, name)[:nb] for name in _STATE_ARRAYS}
+        out["cob_keys"] = self._cob_keys[0] if self._cob_keys else np.zeros(0, np.int64)
+        out["cob_depth"] = self._cob_depth[0] if self._cob_depth else np.zeros(0, np.float64)
+        for name in ("ts", "side", "size", "px"):
+            parts = getattr(self, f"_trade_{name}")
+            out[f"trade_{name}"] = np.concatenate(parts) if parts else np.zeros(0, "S1" if name == "side" else np.int64)
+        out["scalars"] = {
+            "freq_sec": self.freq_sec,
+            "build_cob": self.build_cob,
+            "tick_px": self.tick_px,
+            "bar_ns": self.bar_ns,
+            "first_ts_ns": self.first_ts_ns,
+            "records_seen": self.records_seen,
+            "last_record": self.last_record.hex() if self.last_record is not None else None,
+        }
+        return out
+
+    @classmethod
+    def from_state(cls, state: dict) -> "BarAccumulator":
+        sc = state["scalars"]
+        acc = cls(freq_sec=sc["freq_sec"], build_cob=sc["build_cob"], tick_px=sc.get("tick_px", TICK_PX))
+        acc.bar_ns = sc["bar_ns"]
+        acc.first_ts_ns = sc["first_ts_ns"]
+        acc.records_seen = sc["records_seen"]
+        acc.last_record = bytes.fromhex(sc["last_record"]) if sc["last_record"] is not None else None
+        nb = len(state["exists"])
+        acc._grow(nb - 1)
+        for name in _STATE_ARRAYS:
+            getattr(acc, name)[:nb] = state[name]
+        if len(state["cob_keys"]):
+            acc._cob_keys = [np.array(state["cob_keys"])]
+            acc._cob_depth = [np.array(state["cob_depth"])]
+            acc._cob_pending = len(acc._cob_keys[0])
+        if len(state["trade_ts"]):
+            for name in ("ts", "side", "size", "px"):
+                getattr(acc, f"_trade_{name}").append(np.array(state[f"trade_{name}"]))
+        return acc
+
+    def trade_tape(self) -> TradeTape:
+        """Trades seen so far as a TradeTape (side "B" -> +1, "A" -> -1, anything else 0)."""
+        if not self._trade_ts:
+            return TradeTape.from_arrays([], [], [])
+        side = np.concatenate(self._trade_side)
+        return TradeTape.from_arrays(
+            np.concatenate(self._trade_ts),
+            np.where(side == b"B", 1, np.where(side == b"A", -1, 0)),
+            np.concatenate(self._trade_size),
+            np.concatenate(self._trade_px),
+        )
+
+    def rollup(self, freq_sec: float) -> "BarAccumulator":
+        """
+        Accumulator for a coarser bar size (must be a whole multiple of this one), built from the sums
+        alone - no second pass over the records. Coarse bar = fine bar // ratio because both are
+        floored from the same first_ts_ns.
+        """
+        coarse_ns = int(freq_sec * 1_000_000_000)
+        if coarse_ns % self.bar_ns:
+            raise ValueError(f"{freq_sec}s is not a multiple of {self.freq_sec}s")
+        ratio = coarse_ns // self.bar_ns
+        out = BarAccumulator(freq_sec=freq_sec, build_cob=self.build_cob, tick_px=self.tick_px)
+        out.first_ts_ns = self.first_ts_ns
+        out.records_seen = self.records_seen
+        out.last_record = self.last_record
+        fine = np.flatnonzero(self.exists)
+        nb = int(fine[-1]) // ratio + 1 if len(fine) else 1
+        out._grow(nb - 1)
+        coarse = fine // ratio
+        out.exists[coarse] = True
+        for name in ("n", "buy_vol", "sell_vol"):
+            getattr(out, name)[:nb] = np.bincount(coarse, weights=getattr(self, name)[fine], minlength=nb).astype(np.int64)
+        for name in ("bid_sum", "ask_sum"):
+            getattr(out, name)[:nb] = np.bincount(coarse, weights=getattr(self, name)[fine], minlength=nb)
+        # Mid: the fine bar whose mid came from the latest record wins
+        with_mid = fine[self.mid_seq[fine] >= 0]
+        if len(with_mid):
+            np.maximum.at(out.mid_seq, with_mid // ratio, self.mid_seq[with_mid])
+            pick = with_mid[self.mid_seq[with_mid] == out.mid_seq[with_mid // ratio]]
+            out.mid_last[pick // ratio] = self.mid_last[pick]
+        if self.build_cob:
+            cob_bar, _, depth = self.cob_arrays()
+            if len(cob_bar):
+                keys = self._cob_keys[0]
+                raw = ((cob_bar // ratio) << 32) + (keys & 0xFFFFFFFF)
+                ukeys, inv = np.unique(raw, return_inverse=True)
+                out._cob_keys = [ukeys]
+                out._cob_depth = [np.bincount(inv, weights=depth)]
+                out._cob_pending = len(ukeys)
+        # Trade tape is resolution independent
+        out._trade_ts = self._trade_ts
+        out._trade_side = self._trade_side
+        out._trade_size = self._trade_size
+        out._trade_px = self._trade_px
+        return out
+
+    def finish(self) -> tuple:
+        """Return (bars, trades) exactly as load_dbn_streaming builds them (COB in bars.attrs["cob"], trades a TradeTape)."""
+        bar_idx_sorted = np.flatnonzero(self.exists)
+        if len(bar_idx_sorted) == 0:
+            return pd.DataFrame(columns=["mid", "bid_depth", "ask_depth"]), self.trade_tape()
+
+        base = pd.Timestamp(self.first_ts_ns, unit="ns")
+        times = [base + pd.Timedelta(seconds=int(i) * self.freq_sec) for i in bar_idx_sorted]
+        mid_last = self.mid_last.tolist()
+        n = self.n.tolist()
+        bid_sum = self.bid_sum.tolist()
+        ask_sum = self.ask_sum.tolist()
+        buy_vol = self.buy_vol.tolist()
+        sell_vol = self.sell_vol.tolist()
+        rows = []
+        last_mid = 0.0
+        last_bid_depth = 0.0
+        last_ask_depth = 0.0
+        for i in bar_idx_sorted.tolist():
+            mid = mid_last[i] if mid_last[i] else last_mid
+            if n[i]:
+                bid_depth = bid_sum[i] / n[i]
+                ask_depth = ask_sum[i] / n[i]
+                last_mid = mid
+                last_bid_depth = bid_depth
+                last_ask_depth = ask_depth
+            else:
+                bid_depth = last_bid_depth
+                ask_depth = last_ask_depth
+            row = {
+                "mid": mid,
+                "bid_depth": bid_depth,
+                "ask_depth": ask_depth,
+                "buy_vol": buy_vol[i],
+                "sell_vol": sell_vol[i],
+            }
+            rows.append(row)
+        # Back-fill leading bars that had no book update (mid/depth were 0)
+        first_valid = None
+        for idx, row in enumerate(rows):
+            if row["mid"] > 0:
+                first_valid = idx
+                break
+        if first_valid is not None and first_valid > 0:
+            for j in range(first_valid):
+                rows[j]["mid"] = rows[first_valid]["mid"]
+                rows[j]["bid_depth"] = rows[first_valid]["bid_depth"]
+                rows[j]["ask_depth"] = rows[first_valid]["ask_depth"]
+        bars = pd.DataFrame(rows, index=pd.DatetimeIndex(times))
+        bars.index.name = "ts"
+        if self.build_cob:
+            # Levels with depth >= 1; every COB bar is a real bar (book records create bars)
+            cob_bar, cob_ticks, cob_depth = self.cob_arrays()
+            keep = cob_depth >= 1
+            bar_pos = np.searchsorted(bar_idx_sorted, cob_bar[keep])
+            bars.attrs["cob"] = CobLadder.from_flat(
+                bars.index.as_unit("ns").asi8, bar_pos, cob_ticks[keep], cob_depth[keep], self.tick_px
+            )
+
+        return bars, self.trade_tape()
+
+
+def _open_dbn_stream(dbn_path: Path):
+    """Binary stream of the DBN bytes: plain file, or a zstd decompressing reader for .dbn.zst."""
+    f = open(dbn_path, "rb")
+    if f.read(4) == ZSTD_MAGIC:
+        f.seek(0)
+        return zstandard.ZstdDecompressor().stream_reader(f, closefd=True)
+    f.seek(0)
+    return f
+
+
+def _read_exact(stream, n: int) -> bytes:
+    buf = bytearray()
+    while len(buf) < n:
+        part = stream.read(n - len(buf))
+        if not part:
+            break
+        buf += part
+    return bytes(buf)
+
+
+def _stream_record_dtype(dbn_path: Path) -> Optional[np.dtype]:
+    """Record dtype when every record is one fixed-size type laid out on disk as to_ndarray returns it."""
+    first = next(iter(db.DBNStore.from_file(str(dbn_path)).to_ndarray(count=1)), None)
+    if first is None or len(first) == 0 or "length" not in first.dtype.names:
+        return None
+    if int(first["length"][0]) * 4 != first.dtype.itemsize:
+        return None
+    with _open_dbn_stream(dbn_path) as stream:
+        head = _read_exact(stream, 8)
+        if len(head) < 8 or head[:3] != b"DBN":
+            return None
+        _read_exact(stream, struct.unpack("<I", head[4:8])[0])
+        if _read_exact(stream, first.dtype.itemsize) != first[0].tobytes():
+            return None
+    return first.dtype
+
+
+def _read_blocks(
+    dbn_path: Path, block_bytes: int, skip_bytes: int, out: queue.Queue, stop: threading.Event
+) -> None:
+    """
+    Reader thread: skip the DBN metadata and skip_bytes of records, then queue raw record blocks;
+    None ends, an exception is forwarded.
+    """
+    try:
+        with _open_dbn_stream(dbn_path) as stream:
+            head = _read_exact(stream, 8)
+            _read_exact(stream, struct.unpack("<I", head[4:8])[0])
+            if skip_bytes:
+                stream.seek(skip_bytes, 1)  # plain file: O(1); zstd reader decompresses and discards
+            while not stop.is_set():
+                block = _read_exact(stream, block_bytes)
+                if not block:
+                    break
+                out.put(block)
+                if len(block) < block_bytes:
+                    break
+        out.put(None)
+    except BaseException as e:  # re-raised in the consumer
+        out.put(e)
+
+
+def iter_dbn_chunks(
+    dbn_path: Path,
+    chunk_records: int = CHUNK_RECORDS,
+    prefetch: int = PREFETCH_CHUNKS,
+    start_record: int = 0,
+):
+    """
+    Yield the DBN's records from start_record on as structured arrays of at most chunk_records rows.
+
+    Fixed-size record files (plain .dbn or .dbn.zst) are read / decompressed by a background thread
+    that keeps up to prefetch raw chunks in a bounded queue, so zstd decode and file I/O overlap the
+    caller's aggregation of the previous chunk. Anything else goes through DBNStore.to_ndarray.
+    """
+    dtype = _stream_record_dtype(Path(dbn_path))
+    if dtype is None:
+        store = db.DBNStore.from_file(str(dbn_path))
+        skip = start_record
+        for chunk in store.to_ndarray(count=chunk_records):
+            if skip >= len(chunk):
+                skip -= len(chunk)
+                continue
+            yield chunk[skip:]
+            skip = 0
+        return
+    blocks: queue.Queue = queue.Queue(maxsize=max(1, prefetch))
+    stop = threading.Event()
+    reader = threading.Thread(
+        target=_read_blocks,
+        args=(dbn_path, chunk_records * dtype.itemsize, start_record * dtype.itemsize, blocks, stop),
+        daemon=True,
+    )
+    reader.start()
+    try:
+        while True:
+            block = blocks.get()
+            if block is None:
+                break
+            if isinstance(block, BaseException):
+                raise block
+            n = len(block) // dtype.itemsize
+            if n:
+                yield np.frombuffer(block, dtype=dtype, count=n)
+    finally:
+        # consumer stopped early (or failed): let the reader finish its current put and exit
+        stop.set()
+        while reader.is_alive():
+            try:
+                blocks.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        reader.join()
+
+
+def dbn_record_layout(dbn_path: Path) -> Optional[tuple]:
+    """
+    (records offset, record dtype, record count) when the file can be sharded by byte range: plain
+    (uncompressed) DBN holding one fixed-size record type whose on-disk layout is what to_ndarray returns.
+    None otherwise (compressed, mixed record sizes, or records upgraded on read).
+    """
+    dbn_path = Path(dbn_path)
+    with open(dbn_path, "rb") as f:
+        head = f.read(8)
+    if len(head) < 8 or head[:3] != b"DBN":
+        return None
+    offset = 8 + struct.unpack("<I", head[4:8])[0]
+    first = next(iter(db.DBNStore.from_file(str(dbn_path)).to_ndarray(count=1)), None)
+    if first is None or len(first) == 0 or "length" not in first.dtype.names:
+        return None
+    dtype = first.dtype
+    if int(first["length"][0]) * 4 != dtype.itemsize:
+        return None
+    body = dbn_path.stat().st_size - offset
+    if body % dtype.itemsize:
+        return None
+    records = np.memmap(dbn_path, dtype=dtype, mode="r", offset=offset, shape=(1,))
+    if records[0].tobytes() != first[0].tobytes():
+        return None
+    return offset, dtype, body // dtype.itemsize
+
+
+def _accumulate_shard(task: tuple) -> BarAccumulator:
+    """Pool worker: decode records [lo, hi) of the file into an accumulator on the shared bar grid."""
+    dbn_path, offset, dtype, lo, hi, first_ts_ns, bar_ns, freq_sec, build_cob, chunk_records, tick_px = task
+    acc = BarAccumulator(freq_sec=freq_sec, build_cob=build_cob, tick_px=tick_px)
+    acc.bar_ns = bar_ns
+    acc.first_ts_ns = first_ts_ns
+    acc.records_seen = lo
+    records = np.memmap(dbn_path, dtype=dtype, mode="r", offset=offset + lo * dtype.itemsize, shape=(hi - lo,))
+    for start in range(0, hi - lo, chunk_records):
+        acc.update(np.array(records[start : start + chunk_records]))
+    del records
+    acc._reduce_cob()
+    return acc
+
+
+def _decoded(chunks, latency: Optional[LatencyRecorder]):
+    """chunks, with the wait on each one recorded as "decode" when latency is given."""
+    return latency.timed(chunks, "decode") if latency is not None else chunks
+
+
+def _update(acc: BarAccumulator, chunk: np.ndarray, latency: Optional[LatencyRecorder]) -> None:
+    """acc.update(chunk), timed as "bar_update" when latency is given."""
+    if latency is None:
+        acc.update(chunk)
+        return
+    with latency.time("bar_update"):
+        acc.update(chunk)
+
+
+def _update_all(acc: BarAccumulator, chunks, latency: Optional[LatencyRecorder]) -> None:
+    for chunk in _decoded(chunks, latency):
+        _update(acc, chunk, latency)
+
+
+def accumulate_dbn(
+    dbn_path: Path,
+    freq_sec: float = 60.0,
+    build_cob: bool = True,
+    chunk_records: int = CHUNK_RECORDS,
+    workers: int = 1,
+    bar_ns: Optional[int] = None,
+    latency: Optional[LatencyRecorder] = None,
+    tick_px: float = TICK_PX,
+) -> BarAccumulator:
+    """
+    Feed the whole DBN into one BarAccumulator. workers > 1 splits an uncompressed file into that many
+    record-aligned byte ranges decoded in a process pool and merged in file order; files that can't be
+    split (see dbn_record_layout) or are too small for it are read in one pass.
+    bar_ns overrides freq_sec's bar size in ns (load_dbn_multi_vectorized's common grid).
+    latency: per chunk, "decode" (waiting on the reader) and "bar_update" (acc.update) of a one-pass read.
+    tick_px: the instrument's tick (instruments.Instrument.tick_size).
+    """
+    layout = dbn_record_layout(dbn_path) if workers > 1 else None
+    if layout is not None:
+        offset, dtype, n_records = layout
+        workers = min(workers, n_records // MIN_SHARD_RECORDS)
+    if layout is None or workers <= 1:
+        acc = BarAccumulator(freq_sec=freq_sec, build_cob=build_cob, tick_px=tick_px)
+        if bar_ns is not None:
+            acc.bar_ns = bar_ns
+        _update_all(acc, iter_dbn_chunks(dbn_path, chunk_records), latency)
+        return acc
+
+    first = np.memmap(dbn_path, dtype=dtype, mode="r", offset=offset, shape=(1,))
+    first_ts_ns = int(first["ts_recv"][0])
+    del first
+    bounds = np.linspace(0, n_records, workers + 1).astype(np.int64)
+    tasks = [
+        (str(dbn_path), offset, dtype, int(lo), int(hi), first_ts_ns,
+         bar_ns if bar_ns is not None else int(freq_sec * 1_000_000_000), freq_sec, build_cob, chunk_records, tick_px)
+        for lo, hi in zip(bounds[:-1], bounds[1:])
+    ]
+    with multiprocessing.Pool(workers) as pool:
+        shards = pool.map(_accumulate_shard, tasks)
+    acc = shards[0]
+    for shard in shards[1:]:
+        acc.merge(shard)
+    return acc
+
+
+def feed_dbn(
+    acc: BarAccumulator,
+    dbn_path: Path,
+    start_record: int = 0,
+    expect_last: Optional[bytes] = None,
+    chunk_records: int = CHUNK_RECORDS,
+    latency: Optional[LatencyRecorder] = None,
+) -> Optional[int]:
+    """
+    Feed records [start_record, end) of the file into acc and return how many were fed.
+    expect_last: raw bytes of record start_record - 1 as an earlier call saw it (acc.last_record). If the
+    file no longer holds that record there (rewritten, not appended to), nothing is fed and None is
+    returned so the caller can rebuild from scratch.
+    latency: per chunk "decode" / "bar_update" times, as in accumulate_dbn.
+    """
+    check = expect_last is not None and start_record > 0
+    chunks = iter_dbn_chunks(dbn_path, chunk_records, start_record=start_record - 1 if check else start_record)
+    fed = 0
+    try:
+        for chunk in _decoded(chunks, latency):
+            if check:
+                if chunk[0].tobytes() != expect_last:
+                    return None
+                check = False
+                chunk = chunk[1:]
+            _update(acc, chunk, latency)
+            fed += len(chunk)
+    finally:
+        chunks.close()
+    return None if check else fed  # check still pending: the file ends before the expected record
+
+
+def load_dbn_vectorized(
+    dbn_path: Path,
+    freq_sec: float = 60.0,
+    build_cob: bool = True,
+    chunk_records: int = CHUNK_RECORDS,
+    workers: int = 1,
+    latency: Optional[LatencyRecorder] = None,
+    tick_px: float = TICK_PX,
+) -> tuple:
+    """Chunked NumPy ingestion. Returns (bars, trades: TradeTape) identical to the replay() callback path."""
+    acc = accumulate_dbn(dbn_path, freq_sec, build_cob, chunk_records, workers, latency=latency, tick_px=tick_px)
+    if latency is None:
+        return acc.finish()
+    with latency.time("finish"):
+        return acc.finish()
+
+
+def load_dbn_multi_vectorized(
+    dbn_path: Path,
+    freqs: list,
+    build_cob: bool = True,
+    chunk_records: int = CHUNK_RECORDS,
+    workers: int = 1,
+    tick_px: float = TICK_PX,
+) -> dict:
+    """
+    One pass over the DBN for several bar sizes (sharded over `workers` processes when > 1). Records are
+    aggregated once on the finest common grid (gcd of the bar sizes) and every requested size is rolled up
+    from it exactly.
+    Returns {freq_sec: (bars, trades)}, each identical to load_dbn_vectorized(dbn_path, freq_sec).
+    """
+    freqs = list(dict.fromkeys(float(f) for f in freqs))
+    bar_ns = [int(f * 1_000_000_000) for f in freqs]
+    base_ns = 0
+    for b in bar_ns:
+        base_ns = gcd(base_ns, b)
+    if base_ns >= MIN_BASE_BAR_NS:
+        base_freq = next((f for f, b in zip(freqs, bar_ns) if b == base_ns), base_ns / 1_000_000_000)
+        base = accumulate_dbn(dbn_path, base_freq, build_cob, chunk_records, workers, bar_ns=base_ns, tick_px=tick_px)
+        accs = {f: base if b == base_ns else base.rollup(f) for f, b in zip(freqs, bar_ns)}
+    else:
+        accs = {f: BarAccumulator(freq_sec=f, build_cob=build_cob, tick_px=tick_px) for f in freqs}
+        for chunk in iter_dbn_chunks(dbn_path, chunk_records):
+            for acc in accs.values():
+                acc.update(chunk)
+    return {f: acc.finish() for f, acc in accs.items()}
@@ -0,0 +1,243 @@
+"""
+On-disk cache for load_dbn_streaming: replay a .dbn once, then reload bars + trades + COB from
+plain .npy columns on every later run (the bars frame is read into memory, the COB and trade tape stay
+memory-mapped). Multi-minute replay -> sub-second load.
+
+Layout: data/bar_cache/<dbn name>/<key>/{bars_*.npy, cob_*.npy, meta.json}
+        data/bar_cache/<dbn name>/<digest>_<schema>_v<version>.tape.npy  (trade tape, shared by all bar sizes)
+        data/bar_cache/incremental/<day>/<schema>_<freq>s_<cob>_v<version>/{state.npz, meta.json}
+            (load_dbn_incremental's BarAccumulator state: resumes a growing day at its last record)
+The COB is the CobLadder's own CSR arrays (cob_offsets / cob_ticks / cob_depth) and the trades are the
+TradeTape's structured array; both are memory-mapped straight back.
+Key = (content hash of the .dbn, schema, freq_sec, build_cob, loader version). A re-fetched / edited
+.dbn or a bumped LOADER_VERSION in backtest_engine misses the cache and rebuilds; stale entries for the
+same file are deleted when the new one is written.
+"""
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from config import DATA_DIR
+from cob_ladder import CobLadder
+from trade_tape import TradeTape
+
+CACHE_DIR = DATA_DIR / "bar_cache"
+HASH_CHUNK_BYTES = 8 * 1024 * 1024
+
+BAR_FLOAT_COLS = ["mid", "bid_depth", "ask_depth"]
+BAR_INT_COLS = ["buy_vol", "sell_vol"]
+
+
+def _write_json_atomic(path: Path, obj: dict) -> None:
+    tmp = path.with_name(path.name + f".tmp{os.getpid()}")
+    tmp.write_text(json.dumps(obj))
+    os.replace(tmp, path)
+
+
+def file_digest(dbn_path: Path) -> str:
+    """
+    blake2b of the file contents. Hashing a 5 GB day takes a few seconds, so the digest is remembered
+    in a sidecar (bar_cache/<name>.digest) and only recomputed when size or mtime change.
+    """
+    dbn_path = Path(dbn_path)
+    st = dbn_path.stat()
+    CACHE_DIR.mkdir(exist_ok=True)
+    sidecar = CACHE_DIR / f"{dbn_path.name}.digest"
+    if sidecar.exists():
+        try:
+            saved = json.loads(sidecar.read_text())
+            if saved.get("size") == st.st_size and saved.get("mtime_ns") == st.st_mtime_ns:
+                return saved["digest"]
+        except (json.JSONDecodeError, KeyError, OSError):
+            pass
+    h = hashlib.blake2b(digest_size=16)
+    with open(dbn_path, "rb") as f:
+        while True:
+            chunk = f.read(HASH_CHUNK_BYTES)
+            if not chunk:
+                break
+            h.update(chunk)
+    digest = h.hexdigest()
+    _write_json_atomic(sidecar, {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "digest": digest})
+    return digest
+
+
+def cache_key(digest: str, schema: str, freq_sec: float, build_cob: bool, loader_version: int) -> str:
+    """Directory name for one cached (file, resolution) entry; readable so data/bar_cache is browsable."""
+    cob = "cob" if build_cob else "nocob"
+    return f"{digest}_{schema}_{freq_sec:g}s_{cob}_v{loader_version}"
+
+
+def _entry_dir(dbn_path: Path, key: str) -> Path:
+    return CACHE_DIR / Path(dbn_path).name / key
+
+
+def _tape_path(dbn_path: Path, digest: str, schema: str, loader_version: int) -> Path:
+    return CACHE_DIR / Path(dbn_path).name / f"{digest}_{schema}_v{loader_version}.tape.npy"
+
+
+def load(
+    dbn_path: Path,
+    freq_sec: float,
+    build_cob: bool,
+    schema: str,
+    loader_version: int,
+) -> Optional[tuple]:
+    """
+    Return (bars, trades: TradeTape) from the cache, or None on miss. The bars frame is read into memory
+    (one row per bar); the COB ladder's CSR arrays and the trade tape are opened with mmap_mode='r'.
+    """
+    digest = file_digest(dbn_path)
+    key = cache_key(digest, schema, freq_sec, build_cob, loader_version)
+    entry = _entry_dir(dbn_path, key)
+    meta_path = entry / "meta.json"
+    tape_path = _tape_path(dbn_path, digest, schema, loader_version)
+    if not meta_path.exists() or not tape_path.exists():
+        return None
+    try:
+        meta = json.loads(meta_path.read_text())
+        if meta.get("key") != key:
+            return None
+
+        def arr(name):
+            return np.load(entry / f"{name}.npy", mmap_mode="r")
+
+        bars_ts = arr("bars_ts")
+        index = pd.DatetimeIndex(pd.to_datetime(np.asarray(bars_ts), unit="ns"), name="ts")
+        cols = {c: arr(f"bars_{c}") for c in BAR_FLOAT_COLS + BAR_INT_COLS}
+        bars = pd.DataFrame(cols, index=index)
+        if meta.get("cob_ref_tick") is not None:
+            bars.attrs["cob"] = CobLadder(
+                bars_ts, arr("cob_offsets"), arr("cob_ticks"), arr("cob_depth"), meta["cob_ref_tick"], meta["cob_tick_px"]
+            )
+
+        trades = TradeTape.open(tape_path)
+    except (OSError, ValueError, KeyError, json.JSONDecodeError):
+        return None
+    return bars, trades
+
+
+def save(
+    dbn_path: Path,
+    freq_sec: float,
+    build_cob: bool,
+    schema: str,
+    loader_version: int,
+    bars: pd.DataFrame,
+    trades: TradeTape,
+) -> None:
+    """Write one entry (tmp dir + rename, so a crashed run never leaves a half entry) and drop stale siblings."""
+    if bars is None or len(bars) == 0:
+        return
+    digest = file_digest(dbn_path)
+    key = cache_key(digest, schema, freq_sec, build_cob, loader_version)
+    entry = _entry_dir(dbn_path, key)
+    entry.parent.mkdir(parents=True, exist_ok=True)
+    trades = TradeTape.coerce(trades)
+    tape_path = _tape_path(dbn_path, digest, schema, loader_version)
+    if not tape_path.exists():
+        tmp_tape = tape_path.with_name(tape_path.name + f".tmp{os.getpid()}.npy")
+        trades.save(tmp_tape)
+        os.replace(tmp_tape, tape_path)
+    tmp = entry.with_name(entry.name + f".tmp{os.getpid()}")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir()
+
+    np.save(tmp / "bars_ts.npy", bars.index.as_unit("ns").asi8)
+    for c in BAR_FLOAT_COLS:
+        np.save(tmp / f"bars_{c}.npy", bars[c].to_numpy(dtype=np.float64))
+    for c in BAR_INT_COLS:
+        np.save(tmp / f"bars_{c}.npy", bars[c].to_numpy(dtype=np.int64))
+
+    # COB: bar i owns cob_ticks/cob_depth[offsets[i]:offsets[i+1]]
+    cob = CobLadder.from_bars(bars) if build_cob else None
+    if cob is not None:
+        np.save(tmp / "cob_offsets.npy", cob.offsets)
+        np.save(tmp / "cob_ticks.npy", cob.ticks)
+        np.save(tmp / "cob_depth.npy", cob.depth)
+
+    _write_json_atomic(tmp / "meta.json", {
+        "key": key,
+        "dbn": Path(dbn_path).name,
+        "schema": schema,
+        "freq_sec": freq_sec,
+        "build_cob": build_cob,
+        "loader_version": loader_version,
+        "bars": len(bars),
+        "trades": len(trades),
+        "cob_ref_tick": cob.ref_tick if cob is not None else None,
+        "cob_tick_px": cob.tick_px if cob is not None else None,
+    })
+    shutil.rmtree(entry, ignore_errors=True)
+    try:
+        os.replace(tmp, entry)
+    except OSError:
+        # Another worker published the same entry first - theirs is identical
+        shutil.rmtree(tmp, ignore_errors=True)
+        return
+
+    # Stale entries / tapes for this file: older content hash or loader version
+    for sib in entry.parent.iterdir():
+        if sib == entry or ".tmp" in sib.name:
+            continue
+        name = sib.name[: -len(".tape.npy")] if sib.name.endswith(".tape.npy") else sib.name
+        if not name.startswith(digest + "_") or not name.endswith(f"_v{loader_version}"):
+            if sib.is_dir():
+                shutil.rmtree(sib, ignore_errors=True)
+            else:
+                sib.unlink(missing_ok=True)
+
+
+def _state_dir(day: str, freq_sec: float, build_cob: bool, schema: str, loader_version: int) -> Path:
+    cob = "cob" if build_cob else "nocob"
+    return CACHE_DIR / "incremental" / day / f"{schema}_{freq_sec:g}s_{cob}_v{loader_version}"
+
+
+def load_state(day: str, freq_sec: float, build_cob: bool, schema: str, loader_version: int) -> Optional[tuple]:
+    """(accumulator state dict, files) saved by save_state for this day + resolution, or None."""
+    entry = _state_dir(day, freq_sec, build_cob, schema, loader_version)
+    try:
+        meta = json.loads((entry / "meta.json").read_text())
+        with np.load(entry / "state.npz") as z:
+            state = {name: z[name] for name in z.files}
+    except (OSError, ValueError, KeyError, json.JSONDecodeError):
+        return None
+    state["scalars"] = meta["scalars"]
+    return state, meta["files"]
+
+
+def save_state(
+    day: str,
+    freq_sec: float,
+    build_cob: bool,
+    schema: str,
+    loader_version: int,
+    state: dict,
+    files: list,
+) -> None:
+    """
+    Replace the day's saved state (tmp dir + rename). files: one dict per input file in feed order
+    (name, size, mtime_ns, records fed) so the next call knows where to resume.
+    """
+    entry = _state_dir(day, freq_sec, build_cob, schema, loader_version)
+    entry.parent.mkdir(parents=True, exist_ok=True)
+    tmp = entry.with_name(entry.name + f".tmp{os.getpid()}")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir()
+    np.savez(tmp / "state.npz", **{k: v for k, v in state.items() if k != "scalars"})
+    _write_json_atomic(tmp / "meta.json", {"day": day, "scalars": state["scalars"], "files": files})
+    old = entry.with_name(entry.name + f".old{os.getpid()}")
+    if entry.exists():
+        os.replace(entry, old)
+    os.replace(tmp, entry)
+    shutil.rmtree(old, ignore_errors=True)
+
+
+def clear_state(day: str, freq_sec: float, build_cob: bool, schema: str, loader_version: int) -> None:
+    shutil.rmtree(_state_dir(day, freq_sec, build_cob, schema, loader_version), ignore_errors=True)
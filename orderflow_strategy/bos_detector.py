@@ -0,0 +1,132 @@
+"""
+Streaming break-of-structure detector: push() one price per bar, O(1) amortized per bar.
+
+Same definitions as backtest_engine._detect_bos on the prices pushed so far (bar 0 = first push):
+- swing high / low at bar c: price[c] is the max / min of price[c - lookback : c + lookback + 1], so it is
+  confirmed when bar c + lookback arrives (and c >= lookback: no swing without a full window)
+- bullish (bearish) break at bar i >= 2 * lookback + 1: price[i] > (<) the highest swing high (lowest swing
+  low) at j < i, i - j <= 4 * lookback, plus (minus) min_break
+
+Rolling window max/min and the swing levels inside the 4 * lookback horizon are monotonic deques.
+
+push() answers "does the bar just pushed break?" with only the swings confirmed so far - what an exit
+check at bar k (run_backtest's reversal-BOS exit) or a live feed sees. Swings confirmed later can only
+raise the high-water mark of an earlier bar's horizon, so the first bar push() flags is exactly where a
+_detect_bos call re-run on every prefix first returns a break.
+
+first_break() is _detect_bos on everything pushed (the entry search's one-shot query): a bar that breaks
+when pushed stays a candidate until the swings within lookback bars before it are confirmed.
+"""
+from collections import deque
+from typing import Optional
+
+DIRECTIONS = ("up", "down")
+
+
+class BosDetector:
+    def __init__(self, lookback: int, min_break):
+        self.lookback = lookback
+        self.min_break = min_break
+        self.n = 0  # bars pushed
+        self._recent = deque(maxlen=lookback + 1)  # price[n - 1 - lookback : n]; [0] is the next swing candidate
+        self._win_max: deque = deque()  # (bar, price) over the last 2 * lookback + 1 bars, prices decreasing
+        self._win_min: deque = deque()
+        self._last_nan = -1 << 62
+        self._highs: deque = deque()  # confirmed swing highs in the horizon, levels decreasing: [0] is the max
+        self._lows: deque = deque()
+        self._candidates = {"up": deque(), "down": deque()}  # (bar, price) that broke when pushed, not yet final
+        self._first = {"up": None, "down": None}
+
+    def push(self, price) -> tuple:
+        """Add the next bar's price. Returns (bullish break, bearish break) of this bar."""
+        i = self.n
+        self.n += 1
+        lb = self.lookback
+        self._recent.append(price)
+        if price != price:  # NaN: no swing whose window holds it, never breaks
+            self._last_nan = i
+        else:
+            while self._win_max and self._win_max[-1][1] <= price:
+                self._win_max.pop()
+            self._win_max.append((i, price))
+            while self._win_min and self._win_min[-1][1] >= price:
+                self._win_min.pop()
+            self._win_min.append((i, price))
+        first_bar = i - 2 * lb
+        while self._win_max and self._win_max[0][0] < first_bar:
+            self._win_max.popleft()
+        while self._win_min and self._win_min[0][0] < first_bar:
+            self._win_min.popleft()
+
+        if lb == 0:
+            return False, False
+        # Bar c = i - lookback now has its full window [i - 2 * lookback, i]
+        c = i - lb
+        if c >= lb and self._last_nan < first_bar:
+            center = self._recent[0]
+            if center == self._win_max[0][1]:
+                self._add_swing(self._highs, c, center, "up")
+            if center == self._win_min[0][1]:
+                self._add_swing(self._lows, c, center, "down")
+        horizon = i - 4 * lb
+        while self._highs and self._highs[0][0] < horizon:
+            self._highs.popleft()
+        while self._lows and self._lows[0][0] < horizon:
+            self._lows.popleft()
+
+        bull = bear = False
+        if i >= 2 * lb + 1:
+            bull = bool(self._highs) and price > self._highs[0][1] + self.min_break
+            bear = bool(self._lows) and price < self._lows[0][1] - self.min_break
+        for direction, hit in (("up", bull), ("down", bear)):
+            pending = self._candidates[direction]
+            if hit and self._first[direction] is None:
+                pending.append((i, price))
+            # No swing can still be confirmed before a candidate pushed lookback bars ago
+            if pending and pending[0][0] <= i + 1 - lb and self._first[direction] is None:
+                self._first[direction] = pending[0][0]
+        return bull, bear
+
+    def _add_swing(self, levels: deque, bar: int, level, direction: str) -> None:
+        if direction == "up":
+            while levels and levels[-1][1] <= level:
+                levels.pop()
+        else:
+            while levels and levels[-1][1] >= level:
+                levels.pop()
+        levels.append((bar, level))
+        # Candidates after this swing now have it in their horizon: drop the ones it keeps from breaking
+        pending = self._candidates[direction]
+        if pending and self._first[direction] is None:
+            if direction == "up":
+                kept = [(b, p) for b, p in pending if b <= bar or p > level + self.min_break]
+            else:
+                kept = [(b, p) for b, p in pending if b <= bar or p < level - self.min_break]
+            if len(kept) != len(pending):
+                self._candidates[direction] = deque(kept)
+
+    def levels(self) -> tuple:
+        """
+        (swing high, swing low) the next bar's price is tested against: push(price) would flag a bullish break
+        for price > high + min_break (bearish: price < low - min_break) if no swing gets confirmed by that
+        push. None where there is no such swing (or too few bars for a break yet).
+        """
+        i = self.n
+        lb = self.lookback
+        if lb == 0 or i < 2 * lb + 1:
+            return None, None
+        horizon = i - 4 * lb
+        high = next((level for bar, level in self._highs if bar >= horizon), None)
+        low = next((level for bar, level in self._lows if bar >= horizon), None)
+        return high, low
+
+    def first_break(self, direction: str) -> Optional[int]:
+        """First bar that breaks in direction given every swing in the pushed prices (None if none)."""
+        if self._first[direction] is not None:
+            return self._first[direction]
+        pending = self._candidates[direction]
+        return pending[0][0] if pending else None
+
+    def settled(self, direction: str) -> bool:
+        """first_break(direction) can no longer change as more bars are pushed."""
+        return self._first[direction] is not None
@@ -0,0 +1,80 @@
+"""
+Parity check: run_backtest(engine="python") vs engine="numba" on every stored day, over a random grid
+of param sets (plus baseline). Results and per-trade details must match exactly; exits 1 on the first
+mismatch. Also reports the time spent in each engine.
+
+Usage: python check_engine_parity.py [n_param_sets] [seed]
+"""
+import json
+import random
+import sys
+import time
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+from config import DATA_DIR, dbn_files
+from backtest_engine import load_dbn_streaming, run_backtest
+import backtest_kernel
+
+BAR_SEC = 60.0
+GRID = {
+    "passive_cob_threshold": [20, 50, 70],
+    "min_passive_accumulation_count": [1, 3],
+    "key_level_points": [20, 60],
+    "bos_swing_lookback": [3, 5, 10],
+    "bos_min_break_ticks": [1, 2],
+    "aggressive_min_volume": [50, 150, 200],
+    "tp_style": ["cob", "session_high", "fixed", "hold"],
+    "cob_tp_threshold": [10, 30, 100],
+    "min_tp_pts_above_entry": [0, 15],
+    "sl_style": ["level", "fixed"],
+    "trail_sl_pts": [0, 15, 25],
+    "exit_on_reversal_bos": [True, False],
+    "exit_on_exhaustion": [True, False],
+    "lunch_window": ["none", "11-1", "12-1"],
+    "max_trades_per_day": [3, 5],
+    "enable_shorts": [True, False],
+}
+
+if not backtest_kernel.HAVE_NUMBA:
+    print("numba is not installed: engine='numba' falls back to the Python loop, nothing to compare")
+    sys.exit(0)
+
+n_sets = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+rnd = random.Random(int(sys.argv[2]) if len(sys.argv) > 2 else 0)
+base_path = DATA_DIR / "baseline_params.json"
+base = json.loads(base_path.read_text()) if base_path.exists() else {}
+param_sets = [base] + [{**base, **{k: rnd.choice(v) for k, v in GRID.items()}} for _ in range(n_sets)]
+
+files = dbn_files()
+if not files:
+    print("No .dbn files in", DATA_DIR)
+    sys.exit(0)
+
+elapsed = {"python": 0.0, "numba": 0.0}
+runs = trades = 0
+for f in files:
+    bars, tr = load_dbn_streaming(f, freq_sec=BAR_SEC)
+    for params in param_sets:
+        out = {}
+        for engine in ("python", "numba"):
+            t0 = time.perf_counter()
+            out[engine] = run_backtest(
+                bars=bars, trades_df=tr, params=params, bar_sec=BAR_SEC,
+                return_trade_details=True, day_label=f.name, engine=engine,
+            )
+            elapsed[engine] += time.perf_counter() - t0
+        (res_py, det_py), (res_nb, det_nb) = out["python"], out["numba"]
+        for key, a in vars(res_py).items():
+            b = getattr(res_nb, key)
+            if not (a == b or (a != a and b != b)):  # NaN == NaN
+                print(f"MISMATCH {f.name} {key}: python={a} numba={b}\nparams={params}")
+                sys.exit(1)
+        if det_py != det_nb:
+            print(f"MISMATCH {f.name} trade details\nparams={params}")
+            sys.exit(1)
+        runs += 1
+        trades += res_py.trades
+    print(f.name, "ok", flush=True)
+
+print(f"\n{runs} runs, {trades} trades: identical")
+print(f"python {elapsed['python']:.1f}s  numba {elapsed['numba']:.1f}s (includes first-call compile)")
@@ -0,0 +1,196 @@
+"""
+Per-bar COB (ask depth by price, the heatmap) in CSR form instead of a cob_ask object column of
+(price, depth) tuple lists.
+
+Bar i owns ticks[offsets[i]:offsets[i+1]] / depth[same]; ticks are int32 tick offsets from the session
+reference tick (ref_tick), sorted ascending within each bar, depth is float32. One day of L2 is a few
+flat arrays instead of millions of tuples, and "nearest resistance above price" is a searchsorted.
+
+The ladder rides along with its bars frame in bars.attrs["cob"] (load_dbn_streaming / load_dbn_multi
+put it there) so every caller keeps getting (bars, trades_df). Rows are matched to bars by timestamp,
+so a sliced bars frame (bars.iloc[a:b]) still finds its own rows.
+"""
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+TICK_PX = 0.25  # MNQ
+
+
+class CobLadder:
+    def __init__(
+        self,
+        bar_ts: np.ndarray,
+        offsets: np.ndarray,
+        ticks: np.ndarray,
+        depth: np.ndarray,
+        ref_tick: int = 0,
+        tick_px: float = TICK_PX,
+    ):
+        self.bar_ts = np.asarray(bar_ts, dtype=np.int64)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.ticks = np.asarray(ticks, dtype=np.int32)
+        self.depth = np.asarray(depth, dtype=np.float32)
+        self.ref_tick = int(ref_tick)
+        self.tick_px = tick_px
+
+    # pandas deep-copies attrs on every slice / column op; the ladder is read-only, so share it
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __len__(self) -> int:
+        return len(self.bar_ts)
+
+    @property
+    def nbytes(self) -> int:
+        return self.bar_ts.nbytes + self.offsets.nbytes + self.ticks.nbytes + self.depth.nbytes
+
+    @classmethod
+    def from_flat(
+        cls,
+        bar_ts: np.ndarray,
+        bar_pos: np.ndarray,
+        abs_ticks: np.ndarray,
+        depth: np.ndarray,
+        tick_px: float = TICK_PX,
+    ) -> "CobLadder":
+        """
+        Build from flat entries sorted by (bar position, tick): bar_pos indexes bar_ts, abs_ticks is
+        price / tick_px as an integer.
+        """
+        n = len(bar_ts)
+        offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(np.asarray(bar_pos, dtype=np.int64), minlength=n), out=offsets[1:])
+        ref_tick = int(abs_ticks.min()) if len(abs_ticks) else 0
+        return cls(bar_ts, offsets, np.asarray(abs_ticks, dtype=np.int64) - ref_tick, depth, ref_tick, tick_px)
+
+    @classmethod
+    def from_lists(cls, index: pd.DatetimeIndex, cob_ask, tick_px: float = TICK_PX) -> "CobLadder":
+        """Build from the legacy per-bar lists of (price, depth) (one list per bar in index)."""
+        bar_pos, px, depth = [], [], []
+        for i, levels in enumerate(cob_ask):
+            if not isinstance(levels, list):
+                continue
+            for p, d in sorted(levels):
+                bar_pos.append(i)
+                px.append(p)
+                depth.append(d)
+        abs_ticks = np.round(np.asarray(px, dtype=np.float64) / tick_px).astype(np.int64)
+        return cls.from_flat(index.as_unit("ns").asi8, np.asarray(bar_pos, dtype=np.int64), abs_ticks, np.asarray(depth), tick_px)
+
+    @classmethod
+    def from_bars(cls, bars: pd.DataFrame) -> Optional["CobLadder"]:
+        """The bars' ladder: attrs["cob"], else built from an old-style cob_ask column, else None."""
+        cob = bars.attrs.get("cob")
+        if cob is not None:
+            return cob
+        if "cob_ask" in bars.columns:
+            return cls.from_lists(bars.index, bars["cob_ask"].tolist())
+        return None
+
+    def rows_for(self, index: pd.DatetimeIndex) -> np.ndarray:
+        """Ladder row of each bar in index (-1 where the ladder has no such bar)."""
+        ts = index.as_unit("ns").asi8
+        pos = np.searchsorted(self.bar_ts, ts)
+        pos_c = np.minimum(pos, max(len(self.bar_ts) - 1, 0))
+        hit = (pos < len(self.bar_ts)) & (self.bar_ts[pos_c] == ts) if len(self.bar_ts) else np.zeros(len(ts), bool)
+        return np.where(hit, pos_c, -1)
+
+    def row(self, r: int) -> tuple:
+        """(prices float64, depth float32) of ladder row r, sorted by price; empty arrays for r < 0."""
+        ticks, depth = self.row_ticks(r)
+        return ticks * self.tick_px, depth
+
+    def row_ticks(self, r: int) -> tuple:
+        """(absolute int64 ticks, depth float32) of ladder row r; price = ticks * tick_px."""
+        if r < 0:
+            return np.zeros(0, np.int64), np.zeros(0, np.float32)
+        s, e = self.offsets[r], self.offsets[r + 1]
+        return self.ticks[s:e].astype(np.int64) + self.ref_tick, self.depth[s:e]
+
+    def to_lists(self) -> list:
+        """Per-bar lists of (price, depth), the old cob_ask layout (debugging / export)."""
+        return [list(zip(*(a.tolist() for a in self.row(r)))) for r in range(len(self))]
+
+
+class ResistanceIndex:
+    """
+    "Nearest real resistance above price" over a ladder, built once per (min_depth, near_dist): each row's
+    levels with depth >= min_depth (CSR, prices in the caller's units: tick * unit), each flagged when within
+    near_dist of a round number (multiple of round_step), plus the next flagged level at or after every
+    position of its row. nearest_above() is a bisect, one lookup and a bisect per key level.
+    """
+
+    def __init__(self, ladder: CobLadder, min_depth: float, near_dist: float, round_step: float, unit: int = 1):
+        keep = ladder.depth >= min_depth
+        kept = np.concatenate(([0], np.cumsum(keep)))
+        self.offsets = kept[ladder.offsets]
+        self.px = (ladder.ticks[keep].astype(np.int64) + ladder.ref_tick) * unit
+        self.near_dist = near_dist
+        n = len(self.px)
+        round_near = np.abs(self.px - np.round(self.px / round_step) * round_step) <= near_dist
+        # Next round-near position at or after j (n if none); callers cap it at their row's end
+        flagged = np.where(round_near, np.arange(n), n)
+        self.next_round = np.minimum.accumulate(flagged[::-1])[::-1] if n else flagged
+
+    def key_bounds(self, key_levels: Optional[list]) -> Optional[list]:
+        """
+        [(lo, hi)] price ranges within near_dist of each key level (None / NaN skipped), built once per trade.
+        None for no key levels at all: nearest_above then takes the first level, round numbers or not.
+        """
+        if not key_levels:
+            return None
+        return [(kl - self.near_dist, kl + self.near_dist) for kl in key_levels if kl is not None and not np.isnan(kl)]
+
+    def nearest_above(self, row: int, price, key_bounds: Optional[list] = None):
+        """
+        First level above price in the row, preferring the first one near a round number or a key level
+        (key_bounds from key_bounds(); same choice as backtest_engine._nearest_cob_resistance_above).
+        None when the row has nothing above price.
+        """
+        if row < 0:
+            return None
+        s, e = self.offsets[row], self.offsets[row + 1]
+        j = s + int(np.searchsorted(self.px[s:e], price, side="right"))
+        if j >= e:
+            return None
+        if key_bounds is None:
+            return self.px[j].item()
+        best = min(int(self.next_round[j]), e)
+        for lo, hi in key_bounds:
+            q = j + int(np.searchsorted(self.px[j:best], lo, side="left"))
+            if q < best and self.px[q] <= hi:
+                best = q
+        return self.px[best if best < e else j].item()
+
+    def nearest_above_many(self, row: int, prices: np.ndarray, key_bounds: Optional[list] = None) -> np.ndarray:
+        """nearest_above for an array of prices (one row): float64 levels, NaN where nothing is above."""
+        prices = np.asarray(prices)
+        out = np.full(len(prices), np.nan)
+        if row < 0:
+            return out
+        s, e = self.offsets[row], self.offsets[row + 1]
+        px = self.px[s:e]
+        m = len(px)
+        j = np.searchsorted(px, prices, side="right")
+        has = j < m
+        if not has.any():
+            return out
+        jj = np.minimum(j, m - 1)
+        if key_bounds is None:
+            out[has] = px[jj[has]]
+            return out
+        best = np.minimum(self.next_round[s:e] - s, m)[jj]
+        for lo, hi in key_bounds:
+            # First level >= j inside [lo, hi]: the first level >= lo when that is at / after j, else j itself
+            q = int(np.searchsorted(px, lo, side="left"))
+            cand = np.maximum(j, q)
+            ok = (cand < best) & (px[np.minimum(cand, m - 1)] <= hi)
+            best = np.where(ok, cand, best)
+        pick = np.where(best < m, best, jj)
+        out[has] = px[pick[has]]
+        return out
@@ -4,7 +4,7 @@ import sys
 from pathlib import Path
 BASE = Path(__file__).resolve().parent
 sys.path.insert(0, str(BASE))
-from config import DATA_DIR
+from config import DATA_DIR, dbn_files
 from backtest_engine import load_dbn_streaming, run_backtest
 
 BAR_SEC = 60.0
@@ -22,7 +22,7 @@ configs = [
     ("Best (Time_lunch_skip)", best),
     ("Best, 1 bar earlier", {**best, "entry_bar_offset": -1}),
 ]
-files = sorted(DATA_DIR.glob("mnq_*_RTH_*.dbn"))
+files = dbn_files()
 if not files:
     print("No DBN files")
     sys.exit(1)
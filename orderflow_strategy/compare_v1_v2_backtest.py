@@ -14,8 +14,8 @@ sys_path = Path(__file__).resolve().parent
 if str(sys_path) not in __import__("sys").path:
     __import__("sys").path.insert(0, str(sys_path))
 
-from config import DATA_DIR
-from backtest_engine import load_dbn_streaming, run_backtest
+from config import DATA_DIR, dbn_files, dbn_stem
+from backtest_engine import load_dbn_multi, run_backtest
 
 BAR_SEC_V1 = 60.0
 BAR_SEC_V2 = 10.0  # sub-minute: 6x more bars per day, so we evaluate 6x more often
@@ -35,7 +35,7 @@ def main():
         return
     params = json.loads(params_path.read_text())
 
-    files = sorted(DATA_DIR.glob("mnq_*_RTH_*.dbn"))
+    files = dbn_files()
     if not files:
         print("No RTH .dbn files in data/")
         return
@@ -45,15 +45,17 @@ def main():
     all_v1 = []
     all_v2 = []
     for f in files:
-        day_label = f.stem
+        day_label = dbn_stem(f)
+        # One replay builds both granularities
+        by_freq = load_dbn_multi(f, [BAR_SEC_V1, BAR_SEC_V2])
         # V1: 1-min bars
-        bars_v1, tr_v1 = load_dbn_streaming(f, freq_sec=BAR_SEC_V1)
+        bars_v1, tr_v1 = by_freq[BAR_SEC_V1]
         r1, details_v1 = run_backtest(
             bars=bars_v1, trades_df=tr_v1, params=params, bar_sec=BAR_SEC_V1,
             return_trade_details=True, day_label=day_label,
         )
         # V2: 10-sec bars (same strategy, finer granularity)
-        bars_v2, tr_v2 = load_dbn_streaming(f, freq_sec=BAR_SEC_V2)
+        bars_v2, tr_v2 = by_freq[BAR_SEC_V2]
         r2, details_v2 = run_backtest(
             bars=bars_v2, trades_df=tr_v2, params=params, bar_sec=BAR_SEC_V2,
             return_trade_details=True, day_label=day_label,
@@ -44,3 +44,27 @@ SCHEMA = "mbp-10"                 # Level 2 depth, 10 levels
 # --- Paths ---
 DATA_DIR = Path(__file__).parent / "data"
 DATA_DIR.mkdir(exist_ok=True)
+
+# --- Day files: plain .dbn or zstd-compressed .dbn.zst (archive) ---
+DBN_SUFFIXES = (".dbn.zst", ".dbn")  # longest first: "x.dbn.zst" must not match ".dbn"
+
+
+def dbn_stem(path: Path) -> str:
+    """Day label of a DBN file: name without .dbn / .dbn.zst (Path.stem would keep '.dbn' on archives)."""
+    name = Path(path).name
+    for suffix in DBN_SUFFIXES:
+        if name.endswith(suffix):
+            return name[: -len(suffix)]
+    return Path(path).stem
+
+
+def dbn_files(pattern: str = "mnq_*_RTH_*", data_dir: Path = DATA_DIR) -> list:
+    """
+    Sorted day files matching pattern + .dbn or .dbn.zst. Use instead of DATA_DIR.glob("mnq_*_RTH_*.dbn")
+    so compressed archive days are picked up; when a day exists in both forms the plain .dbn is used.
+    """
+    by_day = {}
+    for suffix in DBN_SUFFIXES:  # plain .dbn last, so it wins over an archive of the same day
+        for f in data_dir.glob(pattern + suffix):
+            by_day[dbn_stem(f)] = f
+    return sorted(by_day.values())
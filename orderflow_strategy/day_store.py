@@ -0,0 +1,202 @@
+"""
+Shared-memory day store for parameter sweeps: one day's DayContext arrays published once, attached
+zero-copy by every worker of a process pool.
+
+SharedDay.publish(ctx) copies what the backtest reads (BarArrays columns, half-tick prices and session
+high / low, the trade tape with its buy / sell prefix sums, the COB ladder CSR and each bar's row in it)
+into one multiprocessing.shared_memory block. Its .spec (block name, offset / dtype / shape per array, a
+few scalars) is all a worker gets pickled: SharedDay.attach(spec) maps the block and builds a DayContext
+(DayContext.from_arrays) whose arrays are read-only views into it, so N workers share one copy of the day
+instead of each loading or unpickling its own. Features of one param (swing / passive masks, aggression
+windows, bounce windows, entry memo) are still built per worker on first use, from the shared arrays.
+
+run_backtest_batch_parallel(ctx, param_list, workers) is run_backtest_batch over a pool of such workers:
+configs are grouped by their ENTRY_PARAMS values (so each worker's entry memo keeps paying off), cut into
+disjoint slices and evaluated as the workers free up; rows come back in param_list order, the same as
+run_backtest_batch. The publishing process owns the block and unlinks it on close() / leaving its
+with-block; workers only map it.
+"""
+from __future__ import annotations
+
+import gc
+import multiprocessing
+import os
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from typing import Optional
+
+import numpy as np
+
+from backtest_engine import BATCH_METRICS, ENTRY_PARAMS, DayContext, run_backtest_batch
+from bar_arrays import BarArrays
+from cob_ladder import CobLadder, TICK_PX
+from trade_tape import TradeTape
+
+ALIGN = 64               # byte alignment of each array in the block (cache line)
+SLICES_PER_WORKER = 4    # config slices per worker: small enough to balance uneven slices, few enough to keep memos warm
+
+
+@dataclass(frozen=True)
+class DaySpec:
+    """Picklable layout of a published day: block name, {array: (offset, dtype, shape)}, scalars."""
+    shm_name: str
+    arrays: dict
+    bar_sec: float
+    cob_ref_tick: int = 0
+    cob_tick_px: float = TICK_PX
+
+    @property
+    def nbytes(self) -> int:
+        return sum(dtype.itemsize * int(np.prod(shape)) for _, dtype, shape in self.arrays.values())
+
+
+def _day_arrays(ctx: DayContext) -> dict:
+    """Arrays of ctx that a worker's DayContext is rebuilt from, by name."""
+    arr = ctx.arr
+    out = {
+        "ts_ns": arr.ts_ns,
+        "mid": arr.mid,
+        "bid_depth": arr.bid_depth,
+        "ask_depth": arr.ask_depth,
+        "price": ctx.price,
+        "running_max": ctx.running_max,
+        "running_min": ctx.running_min,
+    }
+    if arr.has_volume:
+        out["buy_vol"], out["sell_vol"] = arr.buy_vol, arr.sell_vol
+    if ctx.trades is not None:
+        out["tape"] = ctx.trades.records
+        out["tape_buy_cum"], out["tape_sell_cum"] = ctx.trades.prefix_sums()
+    ladder, rows = ctx.cob()
+    if ladder is not None:
+        out.update(cob_bar_ts=ladder.bar_ts, cob_offsets=ladder.offsets, cob_ticks=ladder.ticks,
+                   cob_depth=ladder.depth, cob_rows=rows)
+    return {name: np.ascontiguousarray(a) for name, a in out.items()}
+
+
+class SharedDay:
+    def __init__(self, shm: shared_memory.SharedMemory, spec: DaySpec, owner: bool):
+        self.shm = shm
+        self.spec = spec
+        self.owner = owner
+        self.ctx: Optional[DayContext] = None
+
+    @classmethod
+    def publish(cls, ctx: DayContext) -> "SharedDay":
+        """Copy ctx's arrays into a new shared block (owned by the caller: close() unlinks it)."""
+        arrays = _day_arrays(ctx)
+        layout, size = {}, 0
+        for name, a in arrays.items():
+            layout[name] = (size, a.dtype, a.shape)
+            size += -(-a.nbytes // ALIGN) * ALIGN
+        shm = shared_memory.SharedMemory(create=True, size=max(size, ALIGN))
+        for name, a in arrays.items():
+            offset, dtype, shape = layout[name]
+            np.ndarray(shape, dtype, buffer=shm.buf, offset=offset)[...] = a
+        ladder = ctx.cob()[0]
+        spec = DaySpec(
+            shm_name=shm.name,
+            arrays=layout,
+            bar_sec=ctx.bar_sec,
+            cob_ref_tick=ladder.ref_tick if ladder is not None else 0,
+            cob_tick_px=ladder.tick_px if ladder is not None else TICK_PX,
+        )
+        return cls(shm, spec, owner=True)
+
+    @classmethod
+    def attach(cls, spec: DaySpec) -> "SharedDay":
+        """Map a published day; .ctx is a DayContext over read-only views of the block."""
+        day = cls(shared_memory.SharedMemory(name=spec.shm_name), spec, owner=False)
+        day.ctx = day._context()
+        return day
+
+    def _view(self, name: str) -> np.ndarray:
+        offset, dtype, shape = self.spec.arrays[name]
+        a = np.ndarray(shape, dtype, buffer=self.shm.buf, offset=offset)
+        a.flags.writeable = False
+        return a
+
+    def _context(self) -> DayContext:
+        a = {name: self._view(name) for name in self.spec.arrays}
+        arr = BarArrays(
+            ts_ns=a["ts_ns"],
+            mid=a["mid"],
+            bid_depth=a["bid_depth"],
+            ask_depth=a["ask_depth"],
+            buy_vol=a.get("buy_vol"),
+            sell_vol=a.get("sell_vol"),
+        )
+        trades = TradeTape(a["tape"], a["tape_buy_cum"], a["tape_sell_cum"]) if "tape" in a else None
+        ladder = None
+        if "cob_bar_ts" in a:
+            ladder = CobLadder(a["cob_bar_ts"], a["cob_offsets"], a["cob_ticks"], a["cob_depth"],
+                               self.spec.cob_ref_tick, self.spec.cob_tick_px)
+        return DayContext.from_arrays(
+            arr, a["price"], a["running_max"], a["running_min"], self.spec.bar_sec,
+            trades=trades, cob=ladder, cob_rows=a.get("cob_rows"),
+        )
+
+    def close(self) -> None:
+        """Drop this process's views and mapping; the owner also unlinks the block."""
+        self.ctx = None
+        gc.collect()  # entry memos hold generators that reference the context
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+    def __enter__(self) -> "SharedDay":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def _config_slices(param_list: list, n_slices: int) -> list:
+    """Disjoint index slices of param_list, configs with the same entry params kept next to each other."""
+    groups: dict = {}
+    for j, params in enumerate(param_list):
+        key = tuple(params.get(name, default) for name, default in ENTRY_PARAMS.items())
+        groups.setdefault(key, []).append(j)
+    order = [j for idx in groups.values() for j in idx]
+    size = -(-len(order) // max(1, n_slices))
+    return [order[s : s + size] for s in range(0, len(order), size)]
+
+
+# Set in each pool worker by _init_worker: the attached day, kept mapped for the life of the worker
+_worker_day: Optional[SharedDay] = None
+
+
+def _init_worker(spec: DaySpec) -> None:
+    global _worker_day
+    _worker_day = SharedDay.attach(spec)
+
+
+def _run_slice(task: tuple) -> tuple:
+    idx, param_list, engine = task
+    return idx, run_backtest_batch(_worker_day.ctx, param_list, engine=engine)
+
+
+def run_backtest_batch_parallel(
+    ctx: DayContext,
+    param_list: list,
+    workers: Optional[int] = None,
+    engine: str = "python",
+) -> np.ndarray:
+    """
+    run_backtest_batch(ctx, param_list, engine) split over `workers` processes (default: all cores) that
+    share ctx's arrays through one SharedDay. Same (len(param_list), len(BATCH_METRICS)) result; runs
+    in-process when one worker (or one config) is all there is.
+    """
+    if engine not in ("python", "numba"):
+        raise ValueError(f"engine must be 'python' or 'numba', got {engine!r}")
+    workers = min(workers or os.cpu_count() or 1, len(param_list))
+    if workers <= 1:
+        return run_backtest_batch(ctx, param_list, engine=engine)
+    out = np.zeros((len(param_list), len(BATCH_METRICS)))
+    slices = _config_slices(param_list, workers * SLICES_PER_WORKER)
+    tasks = [(idx, [param_list[j] for j in idx], engine) for idx in slices]
+    with SharedDay.publish(ctx) as day:
+        with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(day.spec,)) as pool:
+            for idx, rows in pool.imap_unordered(_run_slice, tasks):
+                out[idx] = rows
+    return out
@@ -20,7 +20,7 @@ from backtest_engine import (
     TICK,
     POINT,
 )
-from config import DATA_DIR
+from config import DATA_DIR, dbn_files
 
 BAR_SEC = 60.0
 
@@ -29,7 +29,7 @@ def main():
     if len(sys.argv) > 1:
         path = Path(sys.argv[1])
     else:
-        files = list(DATA_DIR.glob("mnq_MNQc0_RTH_*.dbn"))
+        files = dbn_files("mnq_MNQc0_RTH_*")
         if not files:
             print("No mnq_MNQc0_RTH_*.dbn in data/. Run long backtest for one day first or pass a path.")
             return
@@ -14,7 +14,7 @@ from copy import deepcopy
 
 sys.path.insert(0, str(Path(__file__).parent))
 
-from config import DATA_DIR
+from config import dbn_files, dbn_stem
 from backtest_engine import load_dbn_streaming, run_backtest
 
 BAR_SEC = 60.0
@@ -29,7 +29,7 @@ def load_baseline():
 
 def run_all_days(params, days_limit=None, return_details=False):
     """Run backtest on all RTH days. Returns (trades, wins, losses, total_pnl_ticks, details_list)."""
-    files = sorted(DATA_DIR.glob("mnq_*_RTH_*.dbn"))
+    files = dbn_files()
     if days_limit:
         files = files[:days_limit]
     total_trades = total_wins = total_losses = total_pnl = 0
@@ -38,7 +38,7 @@ def run_all_days(params, days_limit=None, return_details=False):
         bars, trades_df = load_dbn_streaming(f, freq_sec=BAR_SEC, build_cob=True)
         out = run_backtest(
             bars=bars, trades_df=trades_df, params=params, bar_sec=BAR_SEC,
-            return_trade_details=return_details, day_label=f.stem,
+            return_trade_details=return_details, day_label=dbn_stem(f),
         )
         if return_details and isinstance(out, tuple):
             result, details = out
@@ -107,7 +107,7 @@ def main():
     baseline = load_baseline()
     days_msg = f" (first {args.days} days)" if args.days else ""
     print("Baseline params loaded from data/baseline_params.json")
-    print(f"Running on {len(list(DATA_DIR.glob('mnq_*_RTH_*.dbn')))} days{days_msg}...")
+    print(f"Running on {len(dbn_files())} days{days_msg}...")
     print()
 
     # 1) Run baseline
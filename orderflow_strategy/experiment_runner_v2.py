@@ -7,9 +7,11 @@ import sys
 import csv
 from pathlib import Path
 
+import numpy as np
+
 sys.path.insert(0, str(Path(__file__).parent))
-from config import DATA_DIR
-from backtest_engine import load_dbn_streaming, run_backtest
+from config import DATA_DIR, dbn_files
+from backtest_engine import load_dbn_streaming, DayContext, run_backtest_batch, BATCH_METRICS
 
 BAR_SEC = 60.0
 OUT_CSV = DATA_DIR / "experiment_results_v2.csv"
@@ -21,21 +23,24 @@ def get_base():
 
 
 def run_configs(config_list, phase_name, days_limit=None):
-    files = sorted(DATA_DIR.glob("mnq_*_RTH_*.dbn"))
+    files = dbn_files()
     if days_limit:
         files = files[: days_limit]
     if not files:
         return []
+    # Each day is loaded once and all configs run as one batch: configs that only change exit params
+    # (e.g. phase B's trail) share the day's memoized entries and skip the entry search
+    totals = np.zeros((len(config_list), len(BATCH_METRICS)))
+    for f in files:
+        bars, tr = load_dbn_streaming(f, freq_sec=BAR_SEC)
+        ctx = DayContext.build(bars=bars, trades_df=tr, bar_sec=BAR_SEC)
+        if ctx is not None:
+            totals += np.nan_to_num(run_backtest_batch(ctx, [params for _, params in config_list]))
+    col = {m: i for i, m in enumerate(BATCH_METRICS)}
     rows = []
-    for name, params in config_list:
-        total_t, total_pnl, total_w, total_l = 0, 0.0, 0, 0
-        for f in files:
-            bars, tr = load_dbn_streaming(f, freq_sec=BAR_SEC)
-            r = run_backtest(bars=bars, trades_df=tr, params=params, bar_sec=BAR_SEC)
-            total_t += r.trades
-            total_pnl += r.total_pnl_ticks
-            total_w += r.wins
-            total_l += r.losses
+    for (name, _), t in zip(config_list, totals):
+        total_t, total_pnl = int(t[col["trades"]]), t[col["total_pnl_ticks"]]
+        total_w, total_l = int(t[col["wins"]]), int(t[col["losses"]])
         pnl_pts = total_pnl * 0.25
         wr = (total_w / total_t * 100) if total_t else 0
         avg = (pnl_pts / total_t) if total_t else 0
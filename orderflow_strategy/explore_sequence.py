@@ -15,11 +15,11 @@ import numpy as np
 import pandas as pd
 
 sys.path.insert(0, str(Path(__file__).parent))
-from config import DATA_DIR
+from config import dbn_files
 from backtest_engine import load_dbn_streaming, _detect_bos, _passive_accumulation_count, _near_key_level, _aggressive_accumulation_bars, TICK
 
 def main():
-    files = sorted(DATA_DIR.glob("mnq_*_RTH_*.dbn"), key=lambda f: f.stat().st_size)
+    files = sorted(dbn_files(), key=lambda f: f.stat().st_size)
     if not files:
         print("No data.")
         return
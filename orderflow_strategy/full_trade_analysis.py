@@ -12,7 +12,7 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent))
 import numpy as np
 
-from config import DATA_DIR
+from config import DATA_DIR, dbn_files, dbn_stem
 from backtest_engine import load_dbn_streaming, run_backtest
 
 BAR_SEC = 60.0
@@ -21,13 +21,13 @@ POST_BARS = [30, 60, 120]  # bars after exit to measure forward run
 def main():
     params_path = DATA_DIR / "baseline_params.json"
     params = json.loads(params_path.read_text())
-    files = sorted(DATA_DIR.glob("mnq_*_RTH_*.dbn"))
+    files = dbn_files()
     all_trades = []
     for f in files:
         bars, trades_df = load_dbn_streaming(f, freq_sec=BAR_SEC)
         r, details = run_backtest(
             bars=bars, trades_df=trades_df, params=params, bar_sec=BAR_SEC,
-            return_trade_details=True, day_label=f.stem,
+            return_trade_details=True, day_label=dbn_stem(f),
         )
         if not details:
             continue
@@ -0,0 +1,85 @@
+"""
+Contract specs of the index futures the strategy can run on, and symbol / day file -> instrument lookup.
+
+Prices are decoded to integer ticks of the instrument (bar_builder.px_to_ticks with its px_per_tick) and
+the event-time engines work in half ticks of it, so tick_size is all the price math needs; point_value
+(USD per index point) turns ticks into dollars when results of different contracts are added up.
+
+Day files are named <root lowercase>_<symbol>_RTH_<YYYYMMDD>.dbn[.zst] (mnq_MNQc0_RTH_20260105.dbn,
+es_ESc0_RTH_20260105.dbn); instrument_days() pairs up the files of several instruments by day.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+
+from bar_builder import FIXED_PRICE_SCALE
+from config import DATA_DIR, dbn_files, dbn_stem
+
+
+@dataclass(frozen=True)
+class Instrument:
+    root: str
+    tick_size: float    # index points per tick
+    point_value: float  # USD per index point
+
+    @property
+    def tick_value(self) -> float:
+        return self.tick_size * self.point_value
+
+    @property
+    def px_per_tick(self) -> int:
+        """Databento fixed-point price units in one tick."""
+        return int(round(self.tick_size * FIXED_PRICE_SCALE))
+
+    @property
+    def half_ticks_per_point(self) -> int:
+        return int(round(2 / self.tick_size))
+
+
+INSTRUMENTS = {
+    "MNQ": Instrument("MNQ", 0.25, 2.0),
+    "NQ": Instrument("NQ", 0.25, 20.0),
+    "MES": Instrument("MES", 0.25, 5.0),
+    "ES": Instrument("ES", 0.25, 50.0),
+}
+DEFAULT_ROOT = "MNQ"
+_ROOTS_LONGEST_FIRST = sorted(INSTRUMENTS, key=len, reverse=True)  # MNQ / MES before NQ / ES
+
+
+def instrument(symbol: str) -> Instrument:
+    """Instrument of a root ("ES"), contract ("MESH6"), continuous symbol ("NQ.c.0") or day file name."""
+    head = Path(symbol).name.split("_")[0].split(".")[0].upper()
+    for root in _ROOTS_LONGEST_FIRST:
+        if head.startswith(root):
+            return INSTRUMENTS[root]
+    raise ValueError(f"unknown instrument {symbol!r} (known: {', '.join(INSTRUMENTS)})")
+
+
+def dbn_instrument(dbn_path: Path) -> Instrument:
+    """Instrument of a day file from its name prefix; files without one are MNQ (the original data)."""
+    try:
+        return instrument(Path(dbn_path).name)
+    except ValueError:
+        return INSTRUMENTS[DEFAULT_ROOT]
+
+
+def instrument_files(root: str, data_dir: Path = DATA_DIR) -> list:
+    """Sorted RTH day files of one instrument (see config.dbn_files)."""
+    return dbn_files(f"{root.lower()}_*_RTH_*", data_dir)
+
+
+def instrument_days(roots: list, data_dir: Path = DATA_DIR, complete: bool = True) -> dict:
+    """
+    {day: {root: path}} for the RTH days of several instruments, sorted by day. complete=True keeps only
+    days every root has a file for.
+    """
+    days: dict = {}
+    for root in roots:
+        root = instrument(root).root
+        for f in instrument_files(root, data_dir):
+            days.setdefault(dbn_stem(f).rsplit("_RTH_", 1)[-1], {})[root] = f
+    return {
+        day: by_root for day, by_root in sorted(days.items())
+        if not complete or len(by_root) == len(set(instrument(r).root for r in roots))
+    }
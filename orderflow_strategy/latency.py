@@ -0,0 +1,186 @@
+"""
+Latency histograms per pipeline stage, for the streaming loader and the live / replay engines.
+
+LatencyHistogram buckets nanosecond values HdrHistogram-style: exact below 2 * SUB_BUCKETS, above that
+one power of two per row split into SUB_BUCKETS linear sub-buckets, so every reported percentile is within
+1 / SUB_BUCKETS (< 1%) of the true value at any scale, in fixed memory and O(1) per value.
+
+LatencyRecorder keeps one histogram per named stage (insertion order = pipeline order): time(stage) context
+manager, add() / add_many() for measured ns, timed() around an iterator (e.g. decode = waiting on the next
+chunk). dump() writes JSON (summary + non-empty buckets, reloadable with load() to compare runs) and
+report() is the table printed at shutdown (count, mean, p50 / p99 / p99.9, max).
+"""
+from __future__ import annotations
+
+import json
+import math
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterable, Optional
+
+import numpy as np
+
+SUB_BITS = 7
+SUB_BUCKETS = 1 << SUB_BITS  # linear sub-buckets per power of two
+MAX_SHIFT = 40               # values up to 2^(MAX_SHIFT + SUB_BITS + 1) ns (~3 days); larger are clamped
+N_BUCKETS = (MAX_SHIFT + 2) * SUB_BUCKETS
+MAX_VALUE = (1 << (MAX_SHIFT + SUB_BITS + 1)) - 1
+REPORT_PERCENTILES = (50.0, 99.0, 99.9)
+
+
+def _bucket(ns: int) -> int:
+    ns = min(max(int(ns), 0), MAX_VALUE)
+    if ns < 2 * SUB_BUCKETS:
+        return ns
+    shift = ns.bit_length() - SUB_BITS - 1
+    return (shift + 1) * SUB_BUCKETS + (ns >> shift) - SUB_BUCKETS
+
+
+def _buckets(ns: np.ndarray) -> np.ndarray:
+    ns = np.clip(np.asarray(ns, dtype=np.int64), 0, MAX_VALUE)
+    bit_length = np.frexp(ns.astype(np.float64))[1]  # exact for ints < 2^53
+    shift = np.maximum(bit_length - SUB_BITS - 1, 0)
+    return np.where(ns < 2 * SUB_BUCKETS, ns, (shift + 1) * SUB_BUCKETS + (ns >> shift) - SUB_BUCKETS)
+
+
+def _highest_equivalent(idx: int) -> int:
+    """Largest value that falls in bucket idx."""
+    shift = idx // SUB_BUCKETS - 1
+    if shift <= 0:
+        return idx
+    return (((idx % SUB_BUCKETS) + SUB_BUCKETS) << shift) + (1 << shift) - 1
+
+
+class LatencyHistogram:
+    def __init__(self):
+        self.counts = np.zeros(N_BUCKETS, dtype=np.int64)
+        self.count = 0
+        self.total_ns = 0
+        self.min_ns: Optional[int] = None
+        self.max_ns: Optional[int] = None
+
+    def record(self, ns: int) -> None:
+        ns = int(ns)
+        self.counts[_bucket(ns)] += 1
+        self.count += 1
+        self.total_ns += ns
+        self.min_ns = ns if self.min_ns is None else min(self.min_ns, ns)
+        self.max_ns = ns if self.max_ns is None else max(self.max_ns, ns)
+
+    def record_many(self, ns: np.ndarray) -> None:
+        ns = np.asarray(ns, dtype=np.int64)
+        if not len(ns):
+            return
+        self.counts += np.bincount(_buckets(ns), minlength=N_BUCKETS)
+        self.count += len(ns)
+        self.total_ns += int(ns.sum())
+        lo, hi = int(ns.min()), int(ns.max())
+        self.min_ns = lo if self.min_ns is None else min(self.min_ns, lo)
+        self.max_ns = hi if self.max_ns is None else max(self.max_ns, hi)
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        self.counts += other.counts
+        self.count += other.count
+        self.total_ns += other.total_ns
+        for name, pick in (("min_ns", min), ("max_ns", max)):
+            a, b = getattr(self, name), getattr(other, name)
+            setattr(self, name, b if a is None else a if b is None else pick(a, b))
+
+    def percentile(self, p: float) -> Optional[int]:
+        """Value at percentile p (0-100), as the highest value of its bucket capped at the max seen."""
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(p / 100.0 * self.count))
+        idx = int(np.searchsorted(np.cumsum(self.counts), rank))
+        return min(_highest_equivalent(idx), self.max_ns)
+
+    def summary(self) -> dict:
+        out = {
+            "count": self.count,
+            "min_ns": self.min_ns,
+            "mean_ns": self.total_ns / self.count if self.count else None,
+            "max_ns": self.max_ns,
+        }
+        for p in REPORT_PERCENTILES:
+            out[f"p{p:g}_ns"] = self.percentile(p)
+        return out
+
+    def to_dict(self) -> dict:
+        nz = np.flatnonzero(self.counts)
+        return {**self.summary(), "total_ns": self.total_ns, "buckets": [[int(i), int(self.counts[i])] for i in nz]}
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "LatencyHistogram":
+        h = cls()
+        for idx, n in d.get("buckets", []):
+            h.counts[idx] = n
+        h.count = d["count"]
+        h.total_ns = d.get("total_ns", 0)
+        h.min_ns, h.max_ns = d["min_ns"], d["max_ns"]
+        return h
+
+
+class LatencyRecorder:
+    def __init__(self):
+        self.stages: dict = {}
+
+    def hist(self, stage: str) -> LatencyHistogram:
+        h = self.stages.get(stage)
+        if h is None:
+            h = self.stages[stage] = LatencyHistogram()
+        return h
+
+    def add(self, stage: str, ns: int) -> None:
+        self.hist(stage).record(ns)
+
+    def add_many(self, stage: str, ns: np.ndarray) -> None:
+        self.hist(stage).record_many(ns)
+
+    @contextmanager
+    def time(self, stage: str):
+        t0 = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter_ns() - t0)
+
+    def timed(self, items: Iterable, stage: str):
+        """Yield from items, recording the time spent waiting on each next item under stage."""
+        it = iter(items)
+        while True:
+            t0 = time.perf_counter_ns()
+            try:
+                item = next(it)
+            except StopIteration:
+                return
+            self.add(stage, time.perf_counter_ns() - t0)
+            yield item
+
+    def merge(self, other: "LatencyRecorder") -> None:
+        for stage, h in other.stages.items():
+            self.hist(stage).merge(h)
+
+    def summary(self) -> dict:
+        return {stage: h.summary() for stage, h in self.stages.items()}
+
+    def dump(self, path: Path) -> None:
+        Path(path).write_text(json.dumps({"stages": {s: h.to_dict() for s, h in self.stages.items()}}, indent=1))
+
+    @classmethod
+    def load(cls, path: Path) -> "LatencyRecorder":
+        rec = cls()
+        for stage, d in json.loads(Path(path).read_text())["stages"].items():
+            rec.stages[stage] = LatencyHistogram.from_dict(d)
+        return rec
+
+    def report(self, title: str = "Latency") -> str:
+        """Per-stage table in microseconds."""
+        cols = ["mean"] + [f"p{p:g}" for p in REPORT_PERCENTILES] + ["max"]
+        lines = [f"{title} (us)", f"  {'stage':18s} {'count':>9s} " + " ".join(f"{c:>10s}" for c in cols)]
+        for stage, h in self.stages.items():
+            s = h.summary()
+            vals = [s["mean_ns"]] + [s[f"p{p:g}_ns"] for p in REPORT_PERCENTILES] + [s["max_ns"]]
+            cells = " ".join(f"{v / 1e3:10.1f}" if v is not None else f"{'-':>10s}" for v in vals)
+            lines.append(f"  {stage:18s} {s['count']:9d} {cells}")
+        return "\n".join(lines)
@@ -5,7 +5,7 @@ Usage: python optimize.py [--configs 2000] [--data path/to/file.dbn]
 import argparse
 from pathlib import Path
 
-from config import DATA_DIR
+from config import dbn_files
 from backtest_engine import load_dbn, run_backtest, run_parameter_sweep, get_best_params
 from backtest_params import ParamGrid
 
@@ -19,7 +19,7 @@ def main():
     if args.data:
         dbn_path = Path(args.data)
     else:
-        files = list(DATA_DIR.glob("*.dbn"))
+        files = dbn_files("*")
         if not files:
             print("No .dbn files. Run fetch_data.py --confirm first.")
             return
@@ -10,8 +10,8 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent))
 import numpy as np
 
-from config import DATA_DIR
-from backtest_engine import load_dbn_streaming, run_backtest
+from config import DATA_DIR, dbn_files
+from backtest_engine import load_dbn_streaming, DayContext, run_backtest_batch, BATCH_METRICS
 
 BAR_SEC = 60.0
 
@@ -26,7 +26,7 @@ def main():
     ap.add_argument("--out", type=str, default=None, help="CSV path (default data/sweep_results.csv)")
     args = ap.parse_args()
     out_path = Path(args.out) if args.out else DATA_DIR / "sweep_results.csv"
-    files = sorted(DATA_DIR.glob("mnq_*_RTH_*.dbn"))[: args.days]
+    files = dbn_files()[: args.days]
 
     # Grid: focus on trail, min_tp, COB, selectivity, reversal_bos
     grid = [
@@ -50,20 +50,20 @@ def main():
     ]
 
     base = get_baseline()
+    # Each day is loaded once and every config runs on it as one batch (shared DayContext)
+    totals = np.zeros((len(grid), len(BATCH_METRICS)))
+    for f in files:
+        bars, trades_df = load_dbn_streaming(f, freq_sec=BAR_SEC)
+        ctx = DayContext.build(bars=bars, trades_df=trades_df, bar_sec=BAR_SEC)
+        if ctx is not None:
+            totals += np.nan_to_num(run_backtest_batch(ctx, [{**base, **overrides} for overrides in grid]))
+    col = {m: i for i, m in enumerate(BATCH_METRICS)}
     rows = []
-    for overrides in grid:
-        params = {**base, **overrides}
-        total_trades = 0
-        total_pnl_ticks = 0.0
-        total_wins = 0
-        total_losses = 0
-        for f in files:
-            bars, trades_df = load_dbn_streaming(f, freq_sec=BAR_SEC)
-            r = run_backtest(bars=bars, trades_df=trades_df, params=params, bar_sec=BAR_SEC)
-            total_trades += r.trades
-            total_pnl_ticks += r.total_pnl_ticks
-            total_wins += r.wins
-            total_losses += r.losses
+    for overrides, t in zip(grid, totals):
+        total_trades = int(t[col["trades"]])
+        total_pnl_ticks = t[col["total_pnl_ticks"]]
+        total_wins = int(t[col["wins"]])
+        total_losses = int(t[col["losses"]])
         pnl_pts = total_pnl_ticks * 0.25
         avg_pts = pnl_pts / total_trades if total_trades else 0
         wr = total_wins / total_trades if total_trades else 0
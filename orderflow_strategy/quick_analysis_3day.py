@@ -4,7 +4,7 @@ import sys
 from pathlib import Path
 import numpy as np
 sys.path.insert(0, str(Path(__file__).parent))
-from config import DATA_DIR
+from config import DATA_DIR, dbn_files, dbn_stem
 from backtest_engine import load_dbn_streaming, run_backtest
 
 BAR_SEC = 60.0
@@ -12,12 +12,12 @@ POST_BARS = [30, 60, 120]
 
 def main():
     params = json.loads((DATA_DIR / "baseline_params.json").read_text())
-    files = sorted(DATA_DIR.glob("mnq_*_RTH_*.dbn"))[:3]
+    files = dbn_files()[:3]
     all_trades = []
     for f in files:
         bars, trades_df = load_dbn_streaming(f, freq_sec=BAR_SEC)
         r, details = run_backtest(bars=bars, trades_df=trades_df, params=params, bar_sec=BAR_SEC,
-            return_trade_details=True, day_label=f.stem)
+            return_trade_details=True, day_label=dbn_stem(f))
         if not details:
             continue
         mid = bars["mid"].values
@@ -0,0 +1,138 @@
+"""
+Local stand-in for the live gateway: streams a stored .dbn as if it were arriving now.
+
+ReplayFeed(path, speed) yields record batches (structured arrays, the same dtype iter_dbn_chunks gives) at
+the wall-clock time their ts_recv would arrive, compressed by speed (1 = real time, 1000 = a 6.5 h session
+in ~23 s). Every record whose time has come is handed over in one batch (at most max_batch), like a
+gateway client draining its socket; speed=None replays as fast as the consumer takes it.
+
+MultiReplayFeed({name: path}, speed) replays several files (one per instrument) on one clock, as one
+gateway session subscribed to all of them, and yields (name, batch). Like a socket read, each step hands
+over every file's records up to one ts_recv horizon (paced: everything due by now; unpaced: up to the
+max_batch-th record of the file that is furthest behind), one batch per file in the order of their first
+record. Each file's records keep their order and no file gets more than one step ahead of the others;
+ReplayFeed is the one-file case.
+
+feed.last_lag_ns: for the latest batch of a paced replay, how late its first record was handed over versus
+schedule (consumer too slow); the distribution over the session is latency.hist("feed_lag").
+feed.due_ns(ts): perf_counter_ns at which a record stamped ts was due (unpaced: when its batch was handed
+over), the start of the record -> signal latency.
+latency: if given, "decode" (waiting on the next chunk), "exchange_to_recv" (ts_recv - ts_event of every
+record, as captured) and "feed_lag" (each batch's lag) are recorded into it.
+"""
+from __future__ import annotations
+
+import time
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from bar_builder import iter_dbn_chunks
+from latency import LatencyRecorder
+
+REPLAY_CHUNK_RECORDS = 65_536  # read-ahead per chunk; small enough that pacing starts at once
+MAX_SLEEP_SEC = 0.05           # re-check the clock at least this often while waiting for the next record
+
+
+class _Source:
+    """One file's read-ahead chunk and position in it."""
+
+    def __init__(self, name, chunks):
+        self.name = name
+        self.chunks = chunks
+        self.chunk: Optional[np.ndarray] = None
+        self.ts: Optional[np.ndarray] = None
+        self.pos = 0
+
+    def advance(self, latency: Optional[LatencyRecorder]) -> bool:
+        """Load the next non-empty chunk; False at the end of the file."""
+        for chunk in self.chunks:
+            if len(chunk):
+                self.chunk, self.pos = chunk, 0
+                self.ts = chunk["ts_recv"].astype(np.int64)
+                if latency is not None:
+                    latency.add_many("exchange_to_recv", self.ts - chunk["ts_event"].astype(np.int64))
+                return True
+        return False
+
+    @property
+    def head(self) -> int:
+        return int(self.ts[self.pos])
+
+
+class MultiReplayFeed:
+    def __init__(self, sources: dict, speed: Optional[float] = 1.0, max_batch: int = 4096,
+                 latency: Optional[LatencyRecorder] = None):
+        if speed is not None and speed <= 0:
+            raise ValueError(f"speed must be > 0 (or None for unpaced), got {speed}")
+        self.sources = {name: Path(path) for name, path in sources.items()}
+        self.speed = speed
+        self.max_batch = max_batch
+        self.records = 0
+        self.batches = 0
+        self.last_lag_ns = 0
+        self.latency = latency
+        self._t0_data: Optional[int] = None
+        self._t0_wall = 0
+        self._handover_ns = 0
+
+    def due_ns(self, ts_ns: int) -> int:
+        """perf_counter_ns at which the record stamped ts_ns was due (unpaced: its batch's handover)."""
+        if self.speed is None or self._t0_data is None:
+            return self._handover_ns
+        return self._t0_wall + int((ts_ns - self._t0_data) / self.speed)
+
+    def __iter__(self):
+        lat = self.latency
+        self._t0_wall = t0_wall = time.perf_counter_ns()
+        live = []
+        for name, path in self.sources.items():
+            chunks = iter_dbn_chunks(path, chunk_records=REPLAY_CHUNK_RECORDS)
+            src = _Source(name, lat.timed(chunks, "decode") if lat is not None else chunks)
+            if src.advance(lat):
+                live.append(src)
+        if not live:
+            return
+        self._t0_data = t0_data = min(src.head for src in live)
+        while live:
+            first = min(live, key=lambda src: src.head)
+            if self.speed is not None:
+                # Wall-clock ns after start at which the next record is due; hand over what is due by now
+                now = time.perf_counter_ns() - t0_wall
+                due = (first.head - t0_data) / self.speed
+                if due > now:
+                    time.sleep(min((due - now) / 1e9, MAX_SLEEP_SEC))
+                    continue
+                horizon = max(t0_data + now * self.speed, first.head)
+            else:
+                horizon = first.ts[min(first.pos + self.max_batch, len(first.ts)) - 1]
+            step = []
+            for src in live:
+                end = min(int(np.searchsorted(src.ts, horizon, side="right")), src.pos + self.max_batch)
+                if end > src.pos:
+                    step.append((src.head, src, end))
+            step.sort(key=lambda item: item[0])
+            for head, src, end in step:
+                if self.speed is not None:
+                    self.last_lag_ns = lag = max(0, now - int((head - t0_data) / self.speed))
+                    if lat is not None:
+                        lat.add("feed_lag", lag)
+                self.records += end - src.pos
+                self.batches += 1
+                self._handover_ns = time.perf_counter_ns()
+                yield src.name, src.chunk[src.pos:end]
+                src.pos = end
+                if end == len(src.ts) and not src.advance(lat):
+                    live.remove(src)
+
+
+class ReplayFeed(MultiReplayFeed):
+    def __init__(self, dbn_path: Path, speed: Optional[float] = 1.0, max_batch: int = 4096,
+                 latency: Optional[LatencyRecorder] = None):
+        super().__init__({dbn_path: dbn_path}, speed=speed, max_batch=max_batch, latency=latency)
+        self.dbn_path = Path(dbn_path)
+
+    def __iter__(self):
+        for _, batch in super().__iter__():
+            yield batch
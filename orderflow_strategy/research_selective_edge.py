@@ -15,7 +15,7 @@ sys_path = Path(__file__).resolve().parent
 import sys
 sys.path.insert(0, str(sys_path))
 
-from config import DATA_DIR
+from config import DATA_DIR, dbn_files, dbn_stem
 from backtest_engine import load_dbn_streaming, run_backtest
 
 BAR_SEC = 60.0
@@ -43,7 +43,7 @@ def get_configs():
 
 
 def run(days_limit=None):
-    files = sorted(DATA_DIR.glob("mnq_*_RTH_*.dbn"))
+    files = dbn_files()
     if not files:
         print("No RTH .dbn in data/")
         return
@@ -57,7 +57,7 @@ def run(days_limit=None):
 
     for f in files:
         bars, tr = load_dbn_streaming(f, freq_sec=BAR_SEC)
-        day = f.stem
+        day = dbn_stem(f)
         for name, params in configs:
             r, details = run_backtest(
                 bars=bars, trades_df=tr, params=params, bar_sec=BAR_SEC,
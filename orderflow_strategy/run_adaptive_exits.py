@@ -11,7 +11,7 @@ from pathlib import Path
 BASE = Path(__file__).resolve().parent
 sys.path.insert(0, str(BASE))
 
-from config import DATA_DIR
+from config import DATA_DIR, dbn_files, dbn_stem
 from backtest_engine import load_dbn_streaming, run_backtest
 
 BAR_SEC = 60.0
@@ -23,7 +23,7 @@ def main():
         i = sys.argv.index("--days")
         if i + 1 < len(sys.argv):
             days = int(sys.argv[i + 1])
-    files = sorted(DATA_DIR.glob("mnq_*_RTH_*.dbn"))[:days]
+    files = dbn_files()[:days]
     if not files:
         print("No DBN files")
         return
@@ -42,7 +42,7 @@ def main():
         details_all = []
         for f in files:
             bars, tr = load_dbn_streaming(f, freq_sec=BAR_SEC)
-            r, details = run_backtest(bars=bars, trades_df=tr, params=params, bar_sec=BAR_SEC, return_trade_details=True, day_label=f.stem)
+            r, details = run_backtest(bars=bars, trades_df=tr, params=params, bar_sec=BAR_SEC, return_trade_details=True, day_label=dbn_stem(f))
             total_t += r.trades
             total_pnl += r.total_pnl_ticks
             total_w += r.wins
@@ -8,7 +8,7 @@ from pathlib import Path
 # Add this dir for imports
 sys.path.insert(0, str(Path(__file__).parent))
 
-from config import DATA_DIR
+from config import dbn_files
 
 
 def main():
@@ -36,12 +36,12 @@ def main():
     print()
 
     # 2. Report what we got
-    dbn_files = list(DATA_DIR.glob("*.dbn"))
-    if not dbn_files:
+    day_files = dbn_files("*")
+    if not day_files:
         print("[2/2] No data files. Skipping tests.")
         return
 
-    latest = max(dbn_files, key=lambda p: p.stat().st_mtime)
+    latest = max(day_files, key=lambda p: p.stat().st_mtime)
     size_mb = latest.stat().st_size / (1024**2)
     print(f"[2/2] Data ready: {latest.name} ({size_mb:.1f} MB)")
     print()
@@ -2,7 +2,7 @@
 import json, sys
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent))
-from config import DATA_DIR
+from config import DATA_DIR, dbn_files
 from backtest_engine import load_dbn_streaming, run_backtest
 
 BAR_SEC = 60.0
@@ -17,7 +17,7 @@ configs = [
     ("no_rev_bos", {**base, "exit_on_reversal_bos": False}),
     ("select", {**base, "min_tp_pts_above_entry": 15, "trail_sl_pts": 25, "max_trades_per_day": 3, "passive_cob_threshold": 70, "aggressive_min_volume": 200}),
 ]
-files = sorted(DATA_DIR.glob("mnq_*_RTH_*.dbn"))[:4]
+files = dbn_files()[:4]
 results = {name: {"trades": 0, "pnl_ticks": 0.0, "wins": 0, "losses": 0} for name, _ in configs}
 for f in files:
     bars, tr = load_dbn_streaming(f, freq_sec=BAR_SEC)
@@ -5,7 +5,7 @@ import json
 import sys
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent))
-from config import DATA_DIR
+from config import DATA_DIR, dbn_files
 from backtest_engine import load_dbn_streaming, run_backtest
 
 BAR_SEC = 60.0
@@ -23,7 +23,7 @@ configs = [
     ("no_rev_bos", {**base, "exit_on_reversal_bos": False}),
     ("select_3td", {**base, "min_tp_pts_above_entry": 15, "trail_sl_pts": 25, "max_trades_per_day": 3, "passive_cob_threshold": 70, "aggressive_min_volume": 200}),
 ]
-files = sorted(DATA_DIR.glob("mnq_*_RTH_*.dbn"))
+files = dbn_files()
 
 results = {name: {"trades": 0, "pnl_ticks": 0.0, "wins": 0, "losses": 0} for name, _ in configs}
 
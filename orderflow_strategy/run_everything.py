@@ -12,7 +12,7 @@ from pathlib import Path
 BASE_DIR = Path(__file__).resolve().parent
 sys.path.insert(0, str(BASE_DIR))
 
-from config import DATA_DIR
+from config import DATA_DIR, dbn_files
 from backtest_engine import load_dbn_streaming, run_backtest
 
 BAR_SEC = 60.0
@@ -98,7 +98,7 @@ def get_phase_configs(phase):
 
 
 def run_nine_day():
-    files = sorted(DATA_DIR.glob("mnq_*_RTH_*.dbn"))
+    files = dbn_files()
     if not files:
         print("No RTH .dbn files in data/")
         return False
@@ -132,7 +132,7 @@ def run_nine_day():
 
 
 def run_phase(phase):
-    files = sorted(DATA_DIR.glob("mnq_*_RTH_*.dbn"))
+    files = dbn_files()
     if not files:
         return []
     configs = get_phase_configs(phase)
@@ -213,7 +213,7 @@ def run_first_4day_summary():
     Run best configs on first 4 days only — this is the '4-day proof' window that gave
     ~1 trade/day and 22–28 pt avg (min_tp_15/20). 9-day dilutes that with more, smaller trades.
     """
-    files = sorted(DATA_DIR.glob("mnq_*_RTH_*.dbn"))[:4]
+    files = dbn_files()[:4]
     if len(files) < 4:
         return
     base = get_base()
@@ -245,7 +245,7 @@ def run_entry_sensitivity(best_params):
     """Theoretical better entry: same edge, enter 1 bar earlier or later (no tick data)."""
     if not best_params:
         return
-    files = sorted(DATA_DIR.glob("mnq_*_RTH_*.dbn"))
+    files = dbn_files()
     if not files:
         return
     results = []
@@ -2,13 +2,13 @@
 One script: fetch RTH (9:30-4 PM ET) for as many days as budget allows, then optimize.
 Run: python run_full.py   or   python run_full.py --optimize-only
 
-Uses 1-min bars, streaming (low RAM), 1 worker, focused grid.
+Uses 1-min bars, streaming (low RAM), one day at a time, focused grid. --workers N splits each day's
+configs over N processes that share the day's arrays (day_store).
 Resumable: stop anytime, re-run same cmd to pick up where you left off.
 After changing param grid: clear data\\optimize_done.txt and data\\results\\*.npy
 """
 import sys
 from pathlib import Path
-from datetime import datetime, timedelta, timezone
 
 import numpy as np
 import pandas as pd
@@ -18,45 +18,34 @@ sys.path.insert(0, str(Path(__file__).parent))
 # --- BUDGET: edit this ---
 BUDGET_USD = 50.0              # Stop when spend would exceed this
 MAX_DAYS = 10                  # Max trading days to try
-RTH_START_UTC = "14:30"        # 9:30 AM ET (EST) = 14:30 UTC
-RTH_END_UTC = "21:00"          # 4:00 PM ET = 21:00 UTC (6.5 hrs)
 OPTIMIZE_CONFIGS = 48          # Focused grid: SL cap, key optional, passive 2vs3, entry relaxed
 BAR_SEC = 60.0                 # 1-min bars: zoom out, setups 10–200 min, trades 10–60+ min
 
 
-def _run_one_day(f_path, combs, keys, bar_sec):
+def _run_one_day(f_path, combs, keys, bar_sec, engine="python", workers=1):
     """
     Load one day via streaming (no full df), build bars+trades, run configs.
-    Returns (fname, day_arr). Keeps RAM low (~few GB max).
+    Returns (fname, day_arr) with day_arr columns trades, pnl_ticks, wins, losses. Keeps RAM low (~few GB max).
+    All configs run as one batch on a shared DayContext (swing / passive / aggression features built once).
+    workers > 1: the day is published once in shared memory and the configs are split over that many
+    processes (day_store.run_backtest_batch_parallel), still one copy of the day's arrays.
     """
     from pathlib import Path
     import gc
-    from backtest_engine import load_dbn_streaming, run_backtest
+    from backtest_engine import load_dbn_streaming, DayContext, BATCH_METRICS
+    from day_store import run_backtest_batch_parallel
     bars, trades_df = load_dbn_streaming(Path(f_path), freq_sec=bar_sec)
     day_arr = np.zeros((len(combs), 4))
-    for i, c in enumerate(combs):
-        params = dict(zip(keys, c))
-        r = run_backtest(bars=bars, trades_df=trades_df, params=params, bar_sec=bar_sec)
-        day_arr[i, 0] = r.trades
-        day_arr[i, 1] = r.total_pnl_ticks
-        day_arr[i, 2] = r.wins
-        day_arr[i, 3] = r.losses
-    del bars, trades_df
+    ctx = DayContext.build(bars=bars, trades_df=trades_df, bar_sec=bar_sec)
+    if ctx is not None:
+        metrics = run_backtest_batch_parallel(ctx, [dict(zip(keys, c)) for c in combs], workers=workers, engine=engine)
+        cols = [BATCH_METRICS.index(m) for m in ("trades", "total_pnl_ticks", "wins", "losses")]
+        day_arr[:] = metrics[:, cols]
+    del bars, trades_df, ctx
     gc.collect()
     return (Path(f_path).name, day_arr)
 
 
-def _trading_days_back(n: int) -> list:
-    """Last N trading days (no weekends)."""
-    days = []
-    d = datetime.now(timezone.utc).date()
-    while len(days) < n:
-        if d.weekday() < 5:  # Mon=0, Fri=4
-            days.append(d)
-        d -= timedelta(days=1)
-    return days
-
-
 def main():
     import argparse
     ap = argparse.ArgumentParser()
@@ -65,8 +54,11 @@ def main():
     ap.add_argument("--fast", action="store_true", help="100 configs (even faster first pass)")
     ap.add_argument("--configs", type=int, default=None, help="Max configs")
     ap.add_argument("--days", type=int, default=None, help="Use only N smallest days (fast iteration)")
+    ap.add_argument("--engine", choices=("python", "numba"), default="python", help="Backtest engine (numba: compiled kernel, needs numba)")
+    ap.add_argument("--workers", type=int, default=1, help="Processes per day for the configs (day shared in memory, 0 = all cores)")
     args = ap.parse_args()
-    from config import get_api_key, DATA_DIR, DATASET, SCHEMA, SYMBOL
+    from config import get_api_key, DATA_DIR, DATASET, SCHEMA, SYMBOL, dbn_files, dbn_stem
+    from session_calendar import last_trading_days, rth_utc_range
     import databento as db
     from backtest_engine import load_dbn, run_parameter_sweep, get_best_params
     from backtest_params import ParamGrid
@@ -79,7 +71,7 @@ def main():
     print()
 
     # If optimize-only, skip fetch and use existing files
-    all_files = list(DATA_DIR.glob(f"mnq_{SYMBOL}_RTH_*.dbn"))
+    all_files = dbn_files(f"mnq_{SYMBOL}_RTH_*")
     if args.optimize_only:
         if not all_files:
             print("No RTH data in data/. Run without --optimize-only to fetch first.")
@@ -90,11 +82,10 @@ def main():
         client = db.Historical(key)
         spent = 0.0
         fetched = []
-        days = _trading_days_back(MAX_DAYS)
+        days = last_trading_days(MAX_DAYS)  # exchange holidays skipped
 
         for day in days:
-            start_str = f"{day}T{RTH_START_UTC}"
-            end_str = f"{day}T{RTH_END_UTC}"
+            start_str, end_str = rth_utc_range(day)  # DST-correct, 1 PM ET on early-close days
 
             try:
                 cost = float(client.metadata.get_cost(
@@ -150,7 +141,7 @@ def main():
             return
 
         print(f"Fetched {len(fetched)} days, ~${spent:.2f} spent")
-        all_files = list(set(fetched) | {f for f in DATA_DIR.glob(f"mnq_{SYMBOL}_RTH_*.dbn")})
+        all_files = list(set(fetched) | {f for f in dbn_files(f"mnq_{SYMBOL}_RTH_*")})
     if not all_files:
         print("No data. Check budget or dates.")
         return
@@ -208,13 +199,13 @@ def main():
         if days_done:
             print(f"Resuming: {len(days_done)} day(s) done, {len(files_todo)} remaining.")
         print()
-        print(f"Running {len(combs)} configs on {len(files_todo)} day(s), 1 worker (low RAM ~few GB), streaming...")
+        n_workers = args.workers or multiprocessing.cpu_count()
+        print(f"Running {len(combs)} configs on {len(files_todo)} day(s), one day at a time over {n_workers} worker(s) (low RAM ~few GB), streaming...")
         import gc
         for fi, f in enumerate(files_todo):
             print(f"  Day {fi+1}/{len(files_todo)}: {f.name} ... ", end="", flush=True)
-            fname, day_arr = _run_one_day(str(f), combs, keys, bar_sec)
-            stem = fname.replace(".dbn", "")
-            np.save(results_dir / f"{stem}.npy", day_arr)
+            fname, day_arr = _run_one_day(str(f), combs, keys, bar_sec, args.engine, n_workers)
+            np.save(results_dir / f"{dbn_stem(fname)}.npy", day_arr)
             with open(done_file, "a") as fp:
                 fp.write(fname + "\n")
             gc.collect()
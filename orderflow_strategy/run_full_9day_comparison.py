@@ -9,7 +9,7 @@ import csv
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent))
-from config import DATA_DIR
+from config import DATA_DIR, dbn_files
 from backtest_engine import load_dbn_streaming, run_backtest
 
 BAR_SEC = 60.0
@@ -33,7 +33,7 @@ CONFIGS = [
 ]
 
 def main():
-    files = sorted(DATA_DIR.glob("mnq_*_RTH_*.dbn"))
+    files = dbn_files()
     if not files:
         print("No RTH .dbn files in data/")
         return
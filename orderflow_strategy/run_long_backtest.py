@@ -24,10 +24,11 @@ import argparse
 import gc
 import json
 import multiprocessing
+import os
 import sys
 import threading
 from collections import defaultdict
-from datetime import date, datetime, timedelta, timezone
+from datetime import date, datetime, timedelta
 from pathlib import Path
 
 import databento as db
@@ -39,15 +40,12 @@ if str(ROOT) not in sys.path:
 
 from backtest_engine import load_dbn_streaming, run_backtest
 from config import DATA_DIR, DATASET, SYMBOL, get_api_key
+from session_calendar import rth_utc_range, trading_days_between  # holidays / early closes / DST
 
 # Long backtest uses continuous front-month so every date has data (MNQH6 is only one contract; 2025 dates need then-front-month).
 CONTINUOUS_SYMBOL = "MNQ.c.0"
 
 BAR_SEC = 60.0
-# RTH 9:30 AM - 4:00 PM ET
-EST = __import__("zoneinfo").ZoneInfo("America/New_York")
-RTH_START = (9, 30)
-RTH_END = (16, 0)
 
 def _results_file_for_schema(schema: str) -> str:
     """Separate result files per schema so 1-month L2 vs L1 comparison doesn't overwrite."""
@@ -88,7 +86,7 @@ def append_day_results(results_path: Path, day: date, details: list[dict]) -> No
 
 
 def trading_days_back(n_months: int, end_date: date | None = None) -> list[date]:
-    """Trading days (weekdays) from (end - n calendar months) to end, inclusive.
+    """Trading days (exchange calendar, see session_calendar.py) from (end - n calendar months) to end, inclusive.
     Uses ~31 days per month so '1 month' = last ~31 days to today, not 'first of last month'.
     """
     end = end_date or date.today()
@@ -97,26 +95,6 @@ def trading_days_back(n_months: int, end_date: date | None = None) -> list[date]
     return trading_days_between(start, end)
 
 
-def trading_days_between(start_date: date, end_date: date) -> list[date]:
-    """Trading days (weekdays) from start_date to end_date, inclusive."""
-    days = []
-    d = start_date
-    while d <= end_date:
-        if d.weekday() < 5:  # Mon–Fri
-            days.append(d)
-        d += timedelta(days=1)
-    return days
-
-
-def rth_utc_range(day: date) -> tuple[str, str]:
-    """Return (start_utc_str, end_utc_str) for that day's RTH."""
-    start_et = datetime(day.year, day.month, day.day, RTH_START[0], RTH_START[1], 0, tzinfo=EST)
-    end_et = datetime(day.year, day.month, day.day, RTH_END[0], RTH_END[1], 0, tzinfo=EST)
-    start_utc = start_et.astimezone(timezone.utc)
-    end_utc = end_et.astimezone(timezone.utc)
-    return start_utc.strftime("%Y-%m-%dT%H:%M:%S"), end_utc.strftime("%Y-%m-%dT%H:%M:%S")
-
-
 def load_params(schema_override: str | None = None) -> dict:
     """Load params: SAME as 9-day (baseline_params.json) so we run the exact same edge. Add enable_shorts for both sides."""
     baseline_path = DATA_DIR / "baseline_params.json"
@@ -226,7 +204,7 @@ def _worker_process(
             continue
         total_cost += cost
         try:
-            details = run_one_day(out_path, params, day_str)
+            details = run_one_day(out_path, params, day_str, use_cache=keep_files)
             line = json.dumps({"day": day_str, "trades": details}) + "\n"
             with main_file_lock:
                 with open(results_path, "a", encoding="utf-8") as f:
@@ -244,10 +222,12 @@ def _worker_process(
     return (total_cost, done)
 
 
-def run_one_day(path: Path, params: dict, day_label: str) -> list[dict]:
-    """Build bars from DBN, run backtest with trade details. Return list of trade detail dicts."""
+def run_one_day(path: Path, params: dict, day_label: str, use_cache: bool = False, load_workers: int = 1) -> list[dict]:
+    """Build bars from DBN, run backtest with trade details. Return list of trade detail dicts.
+    use_cache only pays off with --keep-files (otherwise the .dbn is deleted right after this day).
+    load_workers > 1 decodes the day's file in parallel shards (sequential mode: cores are otherwise idle)."""
     import numpy as np
-    bars, trades_df = load_dbn_streaming(path, freq_sec=BAR_SEC, build_cob=True)
+    bars, trades_df = load_dbn_streaming(path, freq_sec=BAR_SEC, build_cob=True, use_cache=use_cache, workers=load_workers)
     if bars is None or len(bars) < 20:
         return []
     # Same edge as 9-day: only "big" setups (real accumulation). MBP-10 (L2) often has depth 50+ → use baseline.
@@ -381,6 +361,8 @@ def main():
     ap.add_argument("--end", type=str, default=None, help="End date YYYY-MM-DD (default: today)")
     ap.add_argument("--start", type=str, default=None, help="Start date YYYY-MM-DD. Omit for 'last N months to --end' (N from --months).")
     ap.add_argument("--workers", type=int, default=6, metavar="N", help="Parallel workers (default 6; use 10–12 for max speed, 1 for sequential)")
+    ap.add_argument("--load-workers", type=int, default=0, metavar="N",
+                    help="With --workers 1: decode each day's .dbn in N parallel shards (default 0 = all cores; 1 = off)")
     args = ap.parse_args()
 
     end_date = date.today()
@@ -413,6 +395,8 @@ def main():
     params["enable_shorts"] = True
 
     workers = max(1, min(args.workers, 12))
+    # Day-level workers already use the cores; shard the per-day load only when running days one by one
+    load_workers = (args.load_workers or os.cpu_count() or 1) if workers <= 1 else 1
     print("=" * 60, flush=True)
     print("LONG BACKTEST (long-horizon: BOTH longs and shorts)", flush=True)
     print(f"  Schema: {args.schema}  |  Range: {range_desc}  |  Trading days: {len(days)}", flush=True)
@@ -499,7 +483,7 @@ def main():
             total_cost += cost
             print(f"  [{num:3d}/{total_days}] {day}  fetched ({out_path.stat().st_size/1024**2:.0f} MB)  running backtest...", flush=True)
             try:
-                details = run_one_day(out_path, params, day_str)
+                details = run_one_day(out_path, params, day_str, use_cache=args.keep_files, load_workers=load_workers)
                 all_trades.extend(details)
                 append_day_results(results_path, day, details)
                 completed_days.add(day_str)
@@ -15,8 +15,8 @@ from pathlib import Path
 BASE_DIR = Path(__file__).resolve().parent
 sys.path.insert(0, str(BASE_DIR))
 
-from config import DATA_DIR
-from backtest_engine import load_dbn_streaming, run_backtest
+from config import DATA_DIR, dbn_files
+from backtest_engine import load_dbn_streaming, run_backtest, DayContext, run_backtest_batch, BATCH_METRICS
 
 BAR_SEC = 60.0
 MASTER_CSV = DATA_DIR / "master_results.csv"
@@ -97,18 +97,21 @@ def run_phase(phase_id: int):
     configs = get_configs_by_phase(phase_id)
     if not configs:
         return
-    files = sorted(DATA_DIR.glob("mnq_*_RTH_*.dbn"))
+    files = dbn_files()
     if not files:
         return
     results = {name: {"trades": 0, "pnl_ticks": 0.0, "wins": 0, "losses": 0} for name, _ in configs}
     for f in files:
         bars, tr = load_dbn_streaming(f, freq_sec=BAR_SEC)
-        for name, params in configs:
-            r = run_backtest(bars=bars, trades_df=tr, params=params, bar_sec=BAR_SEC)
-            results[name]["trades"] += r.trades
-            results[name]["pnl_ticks"] += r.total_pnl_ticks
-            results[name]["wins"] += r.wins
-            results[name]["losses"] += r.losses
+        ctx = DayContext.build(bars=bars, trades_df=tr, bar_sec=BAR_SEC)
+        if ctx is not None:
+            metrics = run_backtest_batch(ctx, [params for _, params in configs])
+            col = {m: i for i, m in enumerate(BATCH_METRICS)}
+            for (name, _), row in zip(configs, metrics):
+                results[name]["trades"] += int(row[col["trades"]])
+                results[name]["pnl_ticks"] += row[col["total_pnl_ticks"]]
+                results[name]["wins"] += int(row[col["wins"]])
+                results[name]["losses"] += int(row[col["losses"]])
         print(f"  Phase {phase_id}: {f.name}", flush=True)
     rows = []
     for name, _ in configs:
@@ -158,7 +161,7 @@ def pick_best_and_save():
 def run_entry_sensitivity(best_params):
     if not best_params:
         return
-    files = sorted(DATA_DIR.glob("mnq_*_RTH_*.dbn"))
+    files = dbn_files()
     if not files:
         return
     results = []
@@ -182,7 +185,7 @@ def run_entry_sensitivity(best_params):
 
 
 def run_first_4day_summary():
-    files = sorted(DATA_DIR.glob("mnq_*_RTH_*.dbn"))[:4]
+    files = dbn_files()[:4]
     if len(files) < 4:
         return
     base = get_base()
@@ -0,0 +1,150 @@
+"""
+CME equity-index (MNQ / NQ / ES) RTH session calendar, computed locally - no API calls.
+
+RTH here is the cash session the strategy trades: 9:30 AM - 4:00 PM America/New_York. On exchange
+holidays (NYSE closed: the CME equity products only run a shortened Globex session with no RTH) there
+is nothing to fetch or backtest. On early-close days (day after Thanksgiving, Christmas Eve, July 3)
+RTH ends at 1:00 PM ET. Session bounds are built in ET and converted with zoneinfo, so UTC times are
+right on both sides of DST (14:30-21:00 UTC in winter, 13:30-20:00 UTC in summer).
+
+Holiday rules (NYSE / CME equity calendar):
+- New Year's Day (Sunday -> Monday; Saturday is not observed on Dec 31)
+- MLK Day (3rd Mon Jan), Presidents Day (3rd Mon Feb), Good Friday, Memorial Day (last Mon May)
+- Juneteenth (from 2022), Independence Day, Christmas (Saturday -> Friday, Sunday -> Monday)
+- Labor Day (1st Mon Sep), Thanksgiving (4th Thu Nov)
+- SPECIAL_CLOSURES: one-off closures (national days of mourning)
+"""
+from __future__ import annotations
+
+from datetime import date, datetime, time, timedelta, timezone
+from functools import lru_cache
+from typing import Optional
+from zoneinfo import ZoneInfo
+
+ET = ZoneInfo("America/New_York")
+RTH_OPEN = time(9, 30)
+RTH_CLOSE = time(16, 0)
+EARLY_CLOSE = time(13, 0)
+
+SPECIAL_CLOSURES = {
+    date(2018, 12, 5): "National Day of Mourning (G.H.W. Bush)",
+    date(2025, 1, 9): "National Day of Mourning (Carter)",
+}
+
+
+def _easter(year: int) -> date:
+    """Gregorian Easter Sunday (anonymous Gregorian algorithm)."""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def _nth_weekday(year: int, month: int, weekday: int, n: int) -> date:
+    """n-th (1-based) weekday (Mon=0) of the month; n=-1 for the last one."""
+    if n > 0:
+        d = date(year, month, 1)
+        d += timedelta(days=(weekday - d.weekday()) % 7)
+        return d + timedelta(weeks=n - 1)
+    nxt = date(year + month // 12, month % 12 + 1, 1)
+    d = nxt - timedelta(days=1)
+    return d - timedelta(days=(d.weekday() - weekday) % 7)
+
+
+def _observed(d: date) -> date:
+    """Fixed-date holiday on a weekend: Saturday -> Friday, Sunday -> Monday."""
+    if d.weekday() == 5:
+        return d - timedelta(days=1)
+    if d.weekday() == 6:
+        return d + timedelta(days=1)
+    return d
+
+
+@lru_cache(maxsize=None)
+def holidays(year: int) -> dict:
+    """{date: name} of full-day RTH closures in that year."""
+    out = {}
+    new_year = date(year, 1, 1)
+    if new_year.weekday() != 5:  # Saturday New Year's is not observed on Dec 31
+        out[_observed(new_year)] = "New Year's Day"
+    out[_nth_weekday(year, 1, 0, 3)] = "Martin Luther King Jr. Day"
+    out[_nth_weekday(year, 2, 0, 3)] = "Presidents Day"
+    out[_easter(year) - timedelta(days=2)] = "Good Friday"
+    out[_nth_weekday(year, 5, 0, -1)] = "Memorial Day"
+    if year >= 2022:
+        out[_observed(date(year, 6, 19))] = "Juneteenth"
+    out[_observed(date(year, 7, 4))] = "Independence Day"
+    out[_nth_weekday(year, 9, 0, 1)] = "Labor Day"
+    out[_nth_weekday(year, 11, 3, 4)] = "Thanksgiving"
+    out[_observed(date(year, 12, 25))] = "Christmas"
+    out.update({d: name for d, name in SPECIAL_CLOSURES.items() if d.year == year})
+    return out
+
+
+@lru_cache(maxsize=None)
+def early_closes(year: int) -> dict:
+    """{date: name} of 1:00 PM ET early-close days in that year."""
+    out = {_nth_weekday(year, 11, 3, 4) + timedelta(days=1): "Day after Thanksgiving"}
+    for d, name in ((date(year, 7, 3), "Independence Day eve"), (date(year, 12, 24), "Christmas Eve")):
+        # Friday Jul 3 / Dec 24 is the observed holiday itself (closed), weekend has no session
+        if d.weekday() < 4:
+            out[d] = name
+    return {d: name for d, name in out.items() if d not in holidays(year)}
+
+
+def holiday_name(day: date) -> Optional[str]:
+    """Why there is no RTH session that day ("Weekend", holiday name), or None on a trading day."""
+    if day.weekday() >= 5:
+        return "Weekend"
+    return holidays(day.year).get(day)
+
+
+def is_trading_day(day: date) -> bool:
+    return holiday_name(day) is None
+
+
+def rth_close(day: date) -> time:
+    """RTH close (ET wall clock): 1:00 PM on early-close days, else 4:00 PM."""
+    return EARLY_CLOSE if day in early_closes(day.year) else RTH_CLOSE
+
+
+def session_bounds(day: date) -> tuple[datetime, datetime]:
+    """(open, close) of that day's RTH as tz-aware UTC datetimes (DST-correct)."""
+    start = datetime.combine(day, RTH_OPEN, tzinfo=ET)
+    end = datetime.combine(day, rth_close(day), tzinfo=ET)
+    return start.astimezone(timezone.utc), end.astimezone(timezone.utc)
+
+
+def rth_utc_range(day: date) -> tuple[str, str]:
+    """(start, end) of that day's RTH as UTC strings for Databento requests."""
+    start, end = session_bounds(day)
+    return start.strftime("%Y-%m-%dT%H:%M:%S"), end.strftime("%Y-%m-%dT%H:%M:%S")
+
+
+def trading_days_between(start_date: date, end_date: date) -> list[date]:
+    """RTH trading days from start_date to end_date, inclusive, oldest first."""
+    days = []
+    d = start_date
+    while d <= end_date:
+        if is_trading_day(d):
+            days.append(d)
+        d += timedelta(days=1)
+    return days
+
+
+def last_trading_days(n: int, end_date: Optional[date] = None) -> list[date]:
+    """The last n RTH trading days up to end_date (default today UTC), inclusive, newest first."""
+    days = []
+    d = end_date or datetime.now(timezone.utc).date()
+    while len(days) < n:
+        if is_trading_day(d):
+            days.append(d)
+        d -= timedelta(days=1)
+    return days
@@ -0,0 +1,327 @@
+"""
+Live signal engine: the strategy as an online state machine that emits entry / exit signals as records
+(or closed bars) arrive.
+
+SignalEngine is TickEngine (tick_engine.py) driven one update at a time: on_records(batch) for MBP records
+straight from the gateway (or ReplayFeed), on_bar(...) for closed bars. Each update costs O(records in
+it): bar closes, setups, aggression window and position checks are all incremental.
+
+Latency (latency.py histograms, engine.latency): every update is timed ("update") and split by TickEngine
+into bar_update / structure / triggers. replay_day adds the feed's stages (decode, exchange_to_recv,
+feed_lag), "emit" (the on_signal hand-off) and "record_to_signal": wall time from when the triggering
+record was due on the replay clock to the signal being handed off - the end-to-end latency a live
+session adds on top of exchange_to_recv. Bar-close signals (exhaustion exits) are stamped with the bar's
+last record, so theirs also includes the wait for the record that closes the bar.
+
+MultiSignalEngine runs one SignalEngine per instrument (MNQ / NQ / ES / MES, instruments.py) in one
+process: on_records(root, batch) routes each batch of a MultiReplayFeed (or a gateway session subscribed
+to all of them) to its instrument's engine, so the replays are interleaved by ts_recv in a single loop.
+
+Rules are tick_engine's: run_backtest's rules made causal. run_backtest itself cannot be run live (its
+entry search settles a BOS with swings confirmed after the break bar, checks the bounce over the bars
+after the retest, stops searching a fixed number of bars before the end of the day and applies the time
+exit retroactively), so the backtest a live session must agree with is run_tick_backtest on the same
+file. How far the two rule sets drift apart is measured instead: compare_with_run_backtest matches the
+live trades of a day against run_backtest's on the same file (same side, entry within a bar) and reports
+the trade overlap and the P&L difference.
+
+Usage: python signal_engine.py [--speed 1000] [--days N] [--max-batch 4096] [--instruments MNQ,NQ,ES,MES]
+                                [--latency-json PATH]
+  replays each stored day through ReplayFeed -> SignalEngine (with --instruments: every listed
+  instrument's file of the day, interleaved, through MultiSignalEngine), prints the signals as they
+  fire, then checks them against run_tick_backtest on the same file(s) and reports their drift from
+  run_backtest (trade overlap, P&L difference) per day; prints the drift totals and the latency report
+  of all days at the end (and dumps the latency as JSON).
+"""
+from __future__ import annotations
+
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent))
+from config import DATA_DIR, dbn_files, dbn_stem
+from instruments import Instrument, dbn_instrument, instrument, instrument_days
+from latency import LatencyRecorder
+from replay_feed import MultiReplayFeed, ReplayFeed
+from backtest_engine import load_dbn_streaming, run_backtest
+from tick_engine import TickEngine, Signal, run_tick_backtest
+
+DRIFT_MATCH_BARS = 1  # a live trade matches a run_backtest trade of the same side entered within this many bars
+
+
+class SignalEngine(TickEngine):
+    def __init__(self, params: dict, bar_sec: float = 60.0, day_label: Optional[str] = None,
+                 latency: Optional[LatencyRecorder] = None, instrument: Optional[Instrument] = None):
+        super().__init__(params, bar_sec=bar_sec, day_label=day_label,
+                         latency=latency if latency is not None else LatencyRecorder(), instrument=instrument)
+
+    def on_records(self, rec: np.ndarray) -> list:
+        """Feed a batch of MBP records (file / gateway order); returns the signals it triggered."""
+        t0 = time.perf_counter_ns()
+        self.feed(rec)
+        return self._drain(t0)
+
+    def on_bar(self, ts_ns: int, mid: float, bid_depth: float, ask_depth: float, buy_vol: int = 0,
+               sell_vol: int = 0, cob: Optional[tuple] = None) -> list:
+        """Feed one closed bar (see TickEngine.feed_bar); returns the signals it triggered."""
+        t0 = time.perf_counter_ns()
+        self.feed_bar(ts_ns, mid, bid_depth, ask_depth, buy_vol, sell_vol, cob)
+        return self._drain(t0)
+
+    def _drain(self, t0: int) -> list:
+        out, self.signals = self.signals, []
+        self.latency.add("update", time.perf_counter_ns() - t0)
+        return out
+
+    def latency_report(self) -> dict:
+        """Per-stage latency summary (ns): count, min / mean / max, p50 / p99 / p99.9."""
+        return self.latency.summary()
+
+
+class MultiSignalEngine:
+    """
+    One SignalEngine per instrument, all recording into one latency recorder (the book layout of a schema
+    is cached process-wide, so same-schema feeds share it). params apply to every instrument unless
+    params_by_root has the root (point params such as key_level_points are in that contract's points).
+    """
+
+    def __init__(self, roots: list, params: dict, bar_sec: float = 60.0, day_label: Optional[str] = None,
+                 latency: Optional[LatencyRecorder] = None, params_by_root: Optional[dict] = None):
+        self.latency = latency if latency is not None else LatencyRecorder()
+        self.engines = {}
+        for root in roots:
+            inst = instrument(root)
+            self.engines[inst.root] = SignalEngine(
+                (params_by_root or {}).get(inst.root, params), bar_sec=bar_sec, day_label=day_label,
+                latency=self.latency, instrument=inst,
+            )
+
+    def on_records(self, root: str, rec: np.ndarray) -> list:
+        """Feed a batch of one instrument's records; returns the signals it triggered."""
+        return self.engines[root].on_records(rec)
+
+    def finish(self) -> dict:
+        """{root: (BacktestResult, trade details)}."""
+        return {root: engine.finish() for root, engine in self.engines.items()}
+
+
+def _emit(sig: Signal, on_signal, feed, latency: LatencyRecorder) -> None:
+    t = time.perf_counter_ns()
+    if on_signal is not None:
+        on_signal(sig)
+    done = time.perf_counter_ns()
+    latency.add("emit", done - t)
+    latency.add("record_to_signal", done - feed.due_ns(sig.ts_ns))
+
+
+def replay_day(dbn_path: Path, params: dict, speed: Optional[float] = 1000.0, bar_sec: float = 60.0,
+               max_batch: int = 4096, on_signal=None, latency: Optional[LatencyRecorder] = None) -> tuple:
+    """
+    Replay one file through a SignalEngine; (engine, feed, every signal in order). Engine and feed record
+    into latency (a new recorder if None, engine.latency).
+    """
+    latency = latency if latency is not None else LatencyRecorder()
+    engine = SignalEngine(params, bar_sec=bar_sec, day_label=dbn_stem(Path(dbn_path)), latency=latency,
+                          instrument=dbn_instrument(dbn_path))
+    feed = ReplayFeed(dbn_path, speed=speed, max_batch=max_batch, latency=latency)
+    signals = []
+    for batch in feed:
+        for sig in engine.on_records(batch):
+            signals.append(sig)
+            _emit(sig, on_signal, feed, latency)
+    engine.finish()
+    return engine, feed, signals
+
+
+def replay_multi(sources: dict, params: dict, speed: Optional[float] = 1000.0, bar_sec: float = 60.0,
+                 max_batch: int = 4096, on_signal=None, latency: Optional[LatencyRecorder] = None,
+                 params_by_root: Optional[dict] = None, day_label: Optional[str] = None) -> tuple:
+    """
+    Replay one day of several instruments ({root: path}) interleaved on one clock through a
+    MultiSignalEngine; (engine, feed, every signal in order, each with its symbol).
+    """
+    latency = latency if latency is not None else LatencyRecorder()
+    engine = MultiSignalEngine(list(sources), params, bar_sec=bar_sec, day_label=day_label, latency=latency,
+                               params_by_root=params_by_root)
+    feed = MultiReplayFeed({instrument(root).root: path for root, path in sources.items()}, speed=speed,
+                           max_batch=max_batch, latency=latency)
+    signals = []
+    for root, batch in feed:
+        for sig in engine.on_records(root, batch):
+            signals.append(sig)
+            _emit(sig, on_signal, feed, latency)
+    engine.finish()
+    return engine, feed, signals
+
+
+def signals_match_backtest(signals: list, details: list) -> bool:
+    """Closed trades from the live signals == run_tick_backtest's trade details (same order, ts and prices)."""
+    entries = [s for s in signals if s.kind == "entry"]
+    exits = [s for s in signals if s.kind == "exit"]
+    live = [
+        (e.side, e.ts_ns, e.price, x.ts_ns, x.price, x.reason)
+        for e, x in zip(entries, exits)
+    ]
+    backtest = [
+        (d["side"], d["entry_ts"].value, d["entry_price"], d["exit_ts"].value, d["exit_price"], d["exit_reason"])
+        for d in details
+    ]
+    return live == backtest
+
+
+def compare_with_run_backtest(signals: list, bars, details: list, match_bars: int = DRIFT_MATCH_BARS) -> dict:
+    """
+    Drift of the live signals from run_backtest's trades on the same day (details, run on bars). A closed
+    live trade matches the first unmatched run_backtest trade of the same side whose entry bar is within
+    match_bars of the bar the live entry fell in. Returns trade counts, matched, overlap (matched / trades
+    of either, 1.0 when both are empty), total P&L of each (ticks), pnl_diff_ticks (live - backtest) and
+    matched_pnl_diff_ticks (the same over matched pairs only: exit drift, apart from entry drift).
+    """
+    bar_ts = bars.index.as_unit("ns").asi8 if len(bars) else np.zeros(0, np.int64)
+    entries = [s for s in signals if s.kind == "entry"]
+    exits = [s for s in signals if s.kind == "exit"]
+    live = [
+        (e.side, int(np.searchsorted(bar_ts, e.ts_ns, side="right")) - 1, x.pnl_ticks)
+        for e, x in zip(entries, exits)
+    ]
+    backtest = [(d["side"], d["entry_bar"], d["pnl_ticks"]) for d in details]
+    unmatched = list(range(len(backtest)))
+    matched_diff = 0.0
+    matched = 0
+    for side, bar, pnl in live:
+        for k in unmatched:
+            if backtest[k][0] == side and abs(backtest[k][1] - bar) <= match_bars:
+                unmatched.remove(k)
+                matched += 1
+                matched_diff += pnl - backtest[k][2]
+                break
+    live_pnl = sum(t[2] for t in live)
+    backtest_pnl = sum(t[2] for t in backtest)
+    either = len(live) + len(backtest) - matched
+    return {
+        "live_trades": len(live),
+        "backtest_trades": len(backtest),
+        "matched": matched,
+        "overlap": matched / either if either else 1.0,
+        "live_pnl_ticks": live_pnl,
+        "backtest_pnl_ticks": backtest_pnl,
+        "pnl_diff_ticks": live_pnl - backtest_pnl,
+        "matched_pnl_diff_ticks": matched_diff,
+    }
+
+
+def _drift(signals: list, dbn_path: Path, params: dict, bar_sec: float, inst: Optional[Instrument] = None) -> dict:
+    """compare_with_run_backtest against run_backtest on the file's bars."""
+    bars, trades_df = load_dbn_streaming(Path(dbn_path), freq_sec=bar_sec, instrument=inst)
+    out = run_backtest(bars=bars, trades_df=trades_df, params=params, bar_sec=bar_sec, return_trade_details=True,
+                       day_label=dbn_stem(Path(dbn_path)))
+    details = out[1] if isinstance(out, tuple) else []  # fewer than 20 bars: no backtest, no trades
+    return compare_with_run_backtest(signals, bars, details)
+
+
+def _drift_line(d: dict) -> str:
+    return (f"vs run_backtest: {d['live_trades']} live / {d['backtest_trades']} backtest trades, {d['matched']} "
+            f"matched (overlap {d['overlap']:.0%}); P&L {d['live_pnl_ticks']:+.0f} vs {d['backtest_pnl_ticks']:+.0f} "
+            f"ticks (diff {d['pnl_diff_ticks']:+.0f}, matched trades {d['matched_pnl_diff_ticks']:+.0f})")
+
+
+def _drift_total(drifts: list) -> dict:
+    total = {k: sum(d[k] for d in drifts) for k in drifts[0] if k != "overlap"}
+    either = total["live_trades"] + total["backtest_trades"] - total["matched"]
+    total["overlap"] = total["matched"] / either if either else 1.0
+    return total
+
+
+def _print_signal(sig: Signal) -> None:
+    when = f"{np.datetime64(sig.ts_ns, 'ns')} {sig.symbol or ''}"
+    if sig.kind == "entry":
+        print(f"  {when} ENTER {sig.side:5s} @ {sig.price:.2f} (level {sig.level:.2f}, stop {sig.stop:.2f})", flush=True)
+    else:
+        print(f"  {when} EXIT  {sig.side:5s} @ {sig.price:.2f} {sig.reason} {sig.pnl_ticks:+.0f} ticks", flush=True)
+
+
+def _report(latency: LatencyRecorder, title: str, args) -> None:
+    print(latency.report(title))
+    if args.latency_json:
+        latency.dump(args.latency_json)
+        print(f"Latency histograms -> {args.latency_json}")
+
+
+def main():
+    import argparse
+    ap = argparse.ArgumentParser(description="Replay stored days through the live signal engine")
+    ap.add_argument("--speed", type=float, default=1000.0, help="Replay speed (1 = real time; 0 = unpaced)")
+    ap.add_argument("--days", type=int, default=None, help="Limit to first N days")
+    ap.add_argument("--bar-sec", type=float, default=60.0, help="Bar size for structure")
+    ap.add_argument("--max-batch", type=int, default=4096, help="Max records handed to the engine per update")
+    ap.add_argument("--instruments", type=str, default=None,
+                    help="Comma-separated roots (MNQ,NQ,ES,MES): replay each day's files of all of them together")
+    ap.add_argument("--latency-json", type=Path, default=None, help="Dump the latency histograms to this JSON file")
+    args = ap.parse_args()
+    baseline = DATA_DIR / "baseline_params.json"
+    params = json.loads(baseline.read_text()) if baseline.exists() else {}
+    latency = LatencyRecorder()
+    if args.instruments:
+        roots = [r.strip() for r in args.instruments.split(",") if r.strip()]
+        days = list(instrument_days(roots).items())[: args.days]
+        if not days:
+            print(f"No day in data/ with RTH .dbn files of all of {', '.join(roots)}")
+            return
+        all_ok = True
+        drifts = []
+        for day, sources in days:
+            print(f"{day} {'+'.join(sources)} @ {args.speed:g}x", flush=True)
+            t0 = time.perf_counter()
+            engine, feed, signals = replay_multi(
+                sources, params, speed=args.speed or None, bar_sec=args.bar_sec, max_batch=args.max_batch,
+                on_signal=_print_signal, latency=latency, day_label=day,
+            )
+            wall = time.perf_counter() - t0
+            for root, f in sources.items():
+                _, details = run_tick_backtest(f, params, bar_sec=args.bar_sec, return_trade_details=True,
+                                               instrument=instrument(root))
+                own = [s for s in signals if s.symbol == root]
+                ok = signals_match_backtest(own, details)
+                all_ok &= ok
+                print(f"  {root}: {'agrees with' if ok else 'DIFFERS from'} run_tick_backtest ({len(details)} trades)")
+                drifts.append(_drift(own, f, params, args.bar_sec, instrument(root)))
+                print(f"  {root}: {_drift_line(drifts[-1])}")
+            print(f"  {feed.records:,} records, {feed.batches:,} updates in {wall:.1f}s")
+        print(f"All days {_drift_line(_drift_total(drifts))}")
+        _report(latency, f"Latency, {len(days)} day(s) x {len(roots)} instruments @ {args.speed:g}x", args)
+        sys.exit(0 if all_ok else 1)
+    files = dbn_files()
+    if args.days:
+        files = files[: args.days]
+    if not files:
+        print("No RTH .dbn files in data/")
+        return
+    all_ok = True
+    drifts = []
+    for f in files:
+        print(f"{dbn_stem(f)} @ {args.speed:g}x", flush=True)
+        t0 = time.perf_counter()
+        engine, feed, signals = replay_day(
+            f, params, speed=args.speed or None, bar_sec=args.bar_sec, max_batch=args.max_batch,
+            on_signal=_print_signal, latency=latency,
+        )
+        wall = time.perf_counter() - t0
+        _, details = run_tick_backtest(f, params, bar_sec=args.bar_sec, return_trade_details=True)
+        ok = signals_match_backtest(signals, details)
+        all_ok &= ok
+        print(f"  {'agrees with' if ok else 'DIFFERS from'} run_tick_backtest ({len(details)} trades) | "
+              f"{feed.records:,} records, {feed.batches:,} updates in {wall:.1f}s")
+        drifts.append(_drift(signals, f, params, args.bar_sec, dbn_instrument(f)))
+        print(f"  {_drift_line(drifts[-1])}")
+    print(f"All days {_drift_line(_drift_total(drifts))}")
+    _report(latency, f"Latency, {len(files)} day(s) @ {args.speed:g}x", args)
+    sys.exit(0 if all_ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+"""
+Signal fan-out: an asyncio publisher next to SignalEngine that serves its signals to any number of
+subscribers (Discord bots, dashboards, order routers) over a local TCP or Unix socket, one JSON object
+per line.
+
+Ingestion never waits on a subscriber. publish() only appends to each subscriber's buffer and wakes its
+writer task; the writer drains that buffer to its own socket, so a slow reader stalls nobody but itself:
+- "signal" messages (entries / exits) go to a bounded queue (max_queue); when a slow consumer lets it
+  fill, the oldest pending signal is dropped and counted
+- "state" messages (last mid, open position) are coalesced: a subscriber only ever has the newest one
+  per symbol pending, stale ones are replaced and counted
+The engine runs in a worker thread and hands messages over with publish_threadsafe(). With --instruments it
+is a MultiSignalEngine over the day's files of every listed instrument, replayed interleaved; every
+message carries its symbol.
+
+metrics(): per subscriber queue depth, sent / dropped / coalesced counts and publish-to-write lag (last
+and max); publisher totals. The server prints them every --metrics-every seconds and at the end, followed
+by the ingestion latency report (replay_day's stages, "emit" = publish_threadsafe; --latency-json dumps it).
+
+Usage:
+  python signal_publisher.py serve [--port 8765 | --unix PATH] [--speed 1000] [--days N] [--file F.dbn]
+                                   [--instruments MNQ,NQ,ES,MES]
+  python signal_publisher.py client [--port 8765 | --unix PATH] [--slow SEC]
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import socket
+import sys
+import time
+from collections import deque
+from dataclasses import asdict
+from pathlib import Path
+from typing import Optional
+
+sys.path.insert(0, str(Path(__file__).parent))
+from config import DATA_DIR, dbn_files, dbn_stem
+from instruments import dbn_instrument, instrument_days
+from latency import LatencyRecorder
+from replay_feed import MultiReplayFeed
+from signal_engine import MultiSignalEngine
+
+DEFAULT_PORT = 8765
+MAX_QUEUE = 1024  # pending signals per subscriber before the oldest is dropped
+# Bytes a connection may have in flight (asyncio transport + kernel send buffer) before its writer waits:
+# small, so a slow reader's backlog stays in its queue, where states coalesce, not in socket buffers
+WRITE_BUFFER_BYTES = 16_384
+
+
+class _Subscriber:
+    def __init__(self, name: str, writer: asyncio.StreamWriter, max_queue: int):
+        self.name = name
+        self.writer = writer
+        self.queue: deque = deque()   # (published_ns, line) signals, oldest first
+        self.max_queue = max_queue
+        self.states: dict = {}        # symbol -> newest pending (published_ns, line) state
+        self.wake = asyncio.Event()
+        self.sent = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.last_lag_ns = 0
+        self.max_lag_ns = 0
+
+    def push(self, kind: str, published_ns: int, line: bytes, key=None) -> None:
+        if kind == "state":
+            if self.states.pop(key, None) is not None:
+                self.coalesced += 1
+            self.states[key] = (published_ns, line)  # re-inserted: states go out oldest first
+        else:
+            if len(self.queue) >= self.max_queue:
+                self.queue.popleft()
+                self.dropped += 1
+            self.queue.append((published_ns, line))
+        self.wake.set()
+
+    def pop(self) -> Optional[tuple]:
+        """Next message to write: pending signals in order, then the newest state of each symbol."""
+        if self.queue:
+            return self.queue.popleft()
+        if self.states:
+            return self.states.pop(next(iter(self.states)))
+        return None
+
+
+class SignalPublisher:
+    def __init__(self, max_queue: int = MAX_QUEUE):
+        self.max_queue = max_queue
+        self.subscribers: dict = {}
+        self.published = {"signal": 0, "state": 0}
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._next_id = 0
+
+    def publish(self, kind: str, payload: dict) -> None:
+        """Queue a message for every subscriber (event-loop thread; never blocks)."""
+        line = (json.dumps({"type": kind, **payload}, default=float) + "\n").encode()
+        now = time.monotonic_ns()
+        self.published[kind] = self.published.get(kind, 0) + 1
+        key = payload.get("symbol")
+        for sub in self.subscribers.values():
+            sub.push(kind, now, line, key)
+
+    def publish_threadsafe(self, kind: str, payload: dict) -> None:
+        """publish() from another thread (the ingestion worker): hands over and returns at once."""
+        self.loop.call_soon_threadsafe(self.publish, kind, payload)
+
+    async def start(self, host: str = "127.0.0.1", port: int = DEFAULT_PORT, unix_path: Optional[str] = None):
+        """Listen on a Unix socket (unix_path) or TCP host:port; returns the asyncio server."""
+        self.loop = asyncio.get_running_loop()
+        if unix_path:
+            return await asyncio.start_unix_server(self._serve_client, path=unix_path)
+        return await asyncio.start_server(self._serve_client, host=host, port=port)
+
+    async def _serve_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._next_id += 1
+        peer = writer.get_extra_info("peername")
+        sub = _Subscriber(f"{self._next_id}:{peer or 'unix'}", writer, self.max_queue)
+        self.subscribers[sub.name] = sub
+        writer.transport.set_write_buffer_limits(high=WRITE_BUFFER_BYTES)
+        sock = writer.get_extra_info("socket")
+        if sock is not None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, WRITE_BUFFER_BYTES)
+        try:
+            while True:
+                await sub.wake.wait()
+                sub.wake.clear()
+                while (item := sub.pop()) is not None:
+                    published_ns, line = item
+                    writer.write(line)
+                    await writer.drain()  # a slow reader only holds up its own writer
+                    sub.sent += 1
+                    sub.last_lag_ns = time.monotonic_ns() - published_ns
+                    sub.max_lag_ns = max(sub.max_lag_ns, sub.last_lag_ns)
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self.subscribers.pop(sub.name, None)
+            writer.close()
+
+    def pending(self) -> int:
+        return sum(len(s.queue) + len(s.states) for s in self.subscribers.values())
+
+    def metrics(self) -> dict:
+        return {
+            "published": dict(self.published),
+            "subscribers": {
+                s.name: {
+                    "queue_depth": len(s.queue),
+                    "states_pending": len(s.states),
+                    "sent": s.sent,
+                    "dropped": s.dropped,
+                    "coalesced": s.coalesced,
+                    "lag_ms": s.last_lag_ns / 1e6,
+                    "max_lag_ms": s.max_lag_ns / 1e6,
+                }
+                for s in self.subscribers.values()
+            },
+        }
+
+
+def ingest(publisher: SignalPublisher, days: list, params: dict, speed: Optional[float], bar_sec: float,
+           latency: Optional[LatencyRecorder] = None) -> dict:
+    """
+    Replay days through a MultiSignalEngine (worker thread), publishing signals and per-update state.
+    days: (day label, {root: path}) pairs; a day's files are replayed interleaved on one clock.
+    """
+    stats = {"records": 0, "updates": 0, "signals": 0, "seconds": 0.0}
+    latency = latency if latency is not None else LatencyRecorder()
+    t0 = time.perf_counter()
+    for day, sources in days:
+        engines = MultiSignalEngine(list(sources), params, bar_sec=bar_sec, day_label=day, latency=latency)
+        feed = MultiReplayFeed(sources, speed=speed, latency=latency)
+        for root, batch in feed:
+            for sig in engines.on_records(root, batch):
+                t = time.perf_counter_ns()
+                publisher.publish_threadsafe("signal", {"day": day, **asdict(sig)})
+                done = time.perf_counter_ns()
+                latency.add("emit", done - t)
+                latency.add("record_to_signal", done - feed.due_ns(sig.ts_ns))
+                stats["signals"] += 1
+            engine = engines.engines[root]
+            pos = engine.position
+            publisher.publish_threadsafe("state", {
+                "day": day,
+                "symbol": root,
+                "ts_ns": int(batch["ts_recv"][-1]),
+                "mid": engine.last_mid / engine.pt if engine.last_mid is not None else None,
+                "position": pos.side if pos is not None else None,
+            })
+            stats["records"] += len(batch)
+            stats["updates"] += 1
+        engines.finish()
+    stats["seconds"] = time.perf_counter() - t0
+    return stats
+
+
+async def _serve(args) -> None:
+    baseline = DATA_DIR / "baseline_params.json"
+    params = json.loads(baseline.read_text()) if baseline.exists() else {}
+    if args.instruments:
+        roots = [r.strip() for r in args.instruments.split(",") if r.strip()]
+        days = list(instrument_days(roots).items())[: args.days]
+    else:
+        files = [Path(f) for f in args.file] if args.file else dbn_files()
+        days = [(dbn_stem(f), {dbn_instrument(f).root: f}) for f in files[: args.days]]
+    if not days:
+        print("No RTH .dbn files in data/")
+        return
+    publisher = SignalPublisher(max_queue=args.max_queue)
+    server = await publisher.start(port=args.port, unix_path=args.unix)
+    print(f"Serving on {args.unix or f'127.0.0.1:{args.port}'}", flush=True)
+    if args.wait:
+        await asyncio.sleep(args.wait)  # let subscribers connect before the replay starts
+
+    async def report():
+        while True:
+            await asyncio.sleep(args.metrics_every)
+            print(json.dumps(publisher.metrics()), flush=True)
+
+    reporter = asyncio.create_task(report())
+    latency = LatencyRecorder()
+    stats = await asyncio.get_running_loop().run_in_executor(
+        None, ingest, publisher, days, params, args.speed or None, args.bar_sec, latency,
+    )
+    publisher.publish("end", {})
+    # Give subscribers a moment to drain, then report and stop
+    deadline = time.monotonic() + args.drain
+    while publisher.pending() and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+    reporter.cancel()
+    print(f"Ingested {stats['records']:,} records in {stats['updates']:,} updates, {stats['signals']} signals, "
+          f"{stats['seconds']:.1f}s")
+    print(json.dumps(publisher.metrics(), indent=1), flush=True)
+    print(latency.report("Ingestion latency"), flush=True)
+    if args.latency_json:
+        latency.dump(args.latency_json)
+    server.close()
+    for sub in list(publisher.subscribers.values()):
+        sub.writer.close()
+    await server.wait_closed()
+
+
+async def _client(args) -> None:
+    if args.unix:
+        reader, _ = await asyncio.open_unix_connection(args.unix)
+    else:
+        reader, _ = await asyncio.open_connection("127.0.0.1", args.port)
+    counts: dict = {}
+    while line := await reader.readline():
+        msg = json.loads(line)
+        counts[msg["type"]] = counts.get(msg["type"], 0) + 1
+        if msg["type"] == "signal":
+            print(line.decode().rstrip(), flush=True)
+        if msg["type"] == "end":
+            break
+        if args.slow:
+            await asyncio.sleep(args.slow)  # stand-in for a slow consumer
+    print(f"client received {counts}", flush=True)
+
+
+def main():
+    import argparse
+    ap = argparse.ArgumentParser(description="Signal publisher (serve) and stand-in subscriber (client)")
+    ap.add_argument("mode", choices=("serve", "client"))
+    ap.add_argument("--port", type=int, default=DEFAULT_PORT, help="TCP port on 127.0.0.1")
+    ap.add_argument("--unix", type=str, default=None, help="Unix socket path instead of TCP")
+    ap.add_argument("--speed", type=float, default=1000.0, help="serve: replay speed (0 = unpaced)")
+    ap.add_argument("--days", type=int, default=None, help="serve: limit to first N days")
+    ap.add_argument("--file", action="append", default=[], help="serve: .dbn file(s) instead of data/")
+    ap.add_argument("--instruments", type=str, default=None,
+                    help="serve: comma-separated roots (MNQ,NQ,ES,MES), each day's files replayed together")
+    ap.add_argument("--bar-sec", type=float, default=60.0, help="serve: bar size for structure")
+    ap.add_argument("--max-queue", type=int, default=MAX_QUEUE, help="serve: pending signals per subscriber")
+    ap.add_argument("--wait", type=float, default=0.0, help="serve: seconds to wait for subscribers before replay")
+    ap.add_argument("--drain", type=float, default=2.0, help="serve: seconds to let subscribers drain at the end")
+    ap.add_argument("--metrics-every", type=float, default=5.0, help="serve: metrics print interval (sec)")
+    ap.add_argument("--latency-json", type=Path, default=None, help="serve: dump the latency histograms to this file")
+    ap.add_argument("--slow", type=float, default=0.0, help="client: sleep per message (slow consumer)")
+    args = ap.parse_args()
+    asyncio.run(_serve(args) if args.mode == "serve" else _client(args))
+
+
+if __name__ == "__main__":
+    main()
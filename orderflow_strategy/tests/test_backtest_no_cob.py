@@ -0,0 +1,65 @@
+"""run_backtest on bars without a COB ladder (build_cob=False, nocob cache, plain frames): no COB take-profit."""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from backtest_engine import BATCH_METRICS, DayContext, run_backtest, run_backtest_batch  # noqa: E402
+
+TRADING = {  # trades on the synthetic day below
+    "passive_cob_threshold": 20, "min_passive_accumulation_count": 1, "key_level_points": 5, "bos_swing_lookback": 3,
+    "bos_min_break_ticks": 1, "aggressive_window_seconds": 180, "passive_lookback_bars": 60, "bos_search_bars": 60,
+    "no_first_minutes": 15, "sl_style": "fixed", "trail_sl_pts": 15, "trail_activation_pts": 10,
+}
+PARAM_SETS = [
+    {},  # run_backtest's defaults: tp_style "cob"
+    {**TRADING, "tp_style": "cob"},
+    {**TRADING, "tp_style": "session_high"},
+]
+
+def _bars_without_cob(seed: int = 0, n: int = 390):
+    rng = np.random.default_rng(seed)
+    steps = rng.choice([-2, -1, 0, 1, 2], size=n, p=[0.1, 0.25, 0.3, 0.25, 0.1]) * rng.integers(1, 9, size=n)
+    idx = pd.date_range("2025-10-09 13:30", periods=n, freq="60s", name="ts")
+    bars = pd.DataFrame({
+        "mid": 25000 + 0.125 * np.cumsum(steps),
+        "bid_depth": rng.gamma(2.0, 30.0, n),
+        "ask_depth": rng.gamma(2.0, 30.0, n),
+        "buy_vol": rng.integers(0, 300, n),
+        "sell_vol": rng.integers(0, 300, n),
+    }, index=idx)
+    ts = np.sort(rng.integers(idx[0].value, idx[-1].value + 60_000_000_000, 5000))
+    trades = pd.DataFrame({"ts_recv": pd.to_datetime(ts), "side": rng.choice(["B", "A"], 5000),
+                           "size": rng.integers(1, 20, 5000)})
+    return bars, trades
+
+
+def test_day_context_cob_is_none_without_ladder():
+    bars, trades = _bars_without_cob()
+    ctx = DayContext.build(bars=bars, trades_df=trades, bar_sec=60)
+    assert ctx.cob() == (None, None)
+    assert ctx.resistance(30, 20) is None
+
+
+@pytest.mark.parametrize("params", PARAM_SETS)
+def test_run_backtest_without_cob_python_and_numba(params):
+    bars, trades = _bars_without_cob()
+    results = {
+        engine: run_backtest(bars=bars, trades_df=trades, params=params, bar_sec=60,
+                             return_trade_details=True, day_label="d", engine=engine)
+        for engine in ("python", "numba")
+    }
+    (py, py_details), (nb, nb_details) = results["python"], results["numba"]
+    if params:
+        assert py.trades > 0
+    assert vars(py) == vars(nb)
+    assert py_details == nb_details
+
+    ctx = DayContext.build(bars=bars, trades_df=trades, bar_sec=60)
+    for engine in ("python", "numba"):
+        row = run_backtest_batch(ctx, [params], engine=engine)[0]
+        assert row[BATCH_METRICS.index("trades")] == py.trades
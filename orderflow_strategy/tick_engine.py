@@ -0,0 +1,777 @@
+"""
+Event-time backtest: the strategy run on the MBP record stream itself, in one pass, without a bars DataFrame.
+
+TickEngine.feed(chunk) takes records in file order (iter_dbn_chunks' structured arrays) and keeps O(1)
+incremental state:
+- open bar (bar_sec grid from the first record, as BarAccumulator): depth sums, last mid, buy / sell volume,
+  ask depth per price (COB TP)
+- on each bar close: passive accumulation over the last passive_lookback_bars bars (monotonic deques),
+  retest / bounce setups with their own BosDetector, exhaustion check of the open position
+- trailing aggression window: buy / sell volume of the trades in (ts - aggressive_window_seconds, ts]
+- position manager: SL / trail, reversal BOS, TP and max hold checked at every record
+
+Rules are run_backtest's moved to event time:
+- structure (passive level, retest within key_level_points, bounce within bounce_bars, swings) is read on
+  bar closes; a bounced setup stays armed for bos_search_bars bars after its retest
+- ENTER at the first record whose mid breaks the setup's swing (BOS since the retest bar), is still within
+  key_level_points of the level, and whose trailing aggression window passes
+- exits trigger on the first record that crosses them: SL (ratcheting trail), reversal BOS, TP (fixed /
+  session_high / COB resistance of the last closed bar), max_hold_bars * bar_sec after entry. Exhaustion
+  is a bar-close pattern and is checked on bar closes
+- one position at a time; no_first_minutes / lunch_window count minutes since the first record;
+  entry_bar_offset does not apply; a position still open at the end of the data is dropped
+
+Between bar closes every level a record is compared with is fixed, so each bar's slice of a chunk is
+checked with a few vectorized passes (cumulative max for the trail, searchsorted for the aggression
+window); Python work is per bar and per trade, not per record. Prices are int64 half ticks, as in
+run_backtest.
+
+Usage: python tick_engine.py [--days N] [--bar-sec 60] [--details] [--instruments MNQ,ES] [--latency] [--latency-json PATH]
+"""
+from __future__ import annotations
+
+import json
+import sys
+import time
+from collections import deque
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).parent))
+from config import DATA_DIR, dbn_files, dbn_stem
+from bar_builder import CHUNK_RECORDS, UNDEF_PRICE, iter_dbn_chunks, px_to_ticks
+from backtest_engine import HALF_TICKS_PER_POINT, HALF_TICKS_PER_TICK, _summarize
+from bos_detector import BosDetector
+from cob_ladder import CobLadder, ResistanceIndex
+from instruments import INSTRUMENTS, DEFAULT_ROOT, Instrument, dbn_instrument, instrument_files
+from latency import LatencyRecorder
+
+PT = HALF_TICKS_PER_POINT  # MNQ's; a TickEngine uses its instrument's (engine.pt)
+TK = HALF_TICKS_PER_TICK
+# lunch_window -> [start, end) in minutes since the first record (run_backtest's bar numbers on 1-min bars)
+LUNCH_WINDOWS = {"11-1": (90, 210), "11:30-1": (120, 210), "12-1": (150, 210)}
+
+
+@lru_cache(maxsize=None)
+def _book_layout(dtype: np.dtype) -> tuple:
+    """(book levels in the record, byte step between a field's consecutive levels or None if uneven)."""
+    fields = dtype.fields
+    n_levels = sum(1 for k in range(10) if f"bid_px_{k:02d}" in fields)
+    steps = set()
+    for prefix in ("bid_sz", "ask_sz", "ask_px"):
+        offsets = [fields[f"{prefix}_{k:02d}"][1] for k in range(n_levels)]
+        steps.update(b - a for a, b in zip(offsets, offsets[1:]))
+    return n_levels, (steps.pop() if len(steps) == 1 else 0 if n_levels == 1 else None)
+
+
+def _levels(rec: np.ndarray, prefix: str) -> np.ndarray:
+    """(records, levels) view of the fields prefix_00, prefix_01, ... (copied if not evenly spaced)."""
+    n_levels, step = _book_layout(rec.dtype)
+    first = rec[f"{prefix}_00"]
+    if step is not None:
+        return np.lib.stride_tricks.as_strided(first, shape=(len(rec), n_levels), strides=(first.strides[0], step), writeable=False)
+    return np.stack([rec[f"{prefix}_{k:02d}"] for k in range(n_levels)], axis=1)
+
+
+class _TradeWindow:
+    """
+    Trades of the trailing aggression window with running buy / sell totals: appended chunk by chunk and
+    trimmed from the front as the window moves, so a lookup is two prefix-sum reads and each trade is
+    copied O(1) times amortized (the live span is moved to the front when the buffer fills).
+    """
+
+    def __init__(self, size: int = 4096):
+        self.ts = np.zeros(size, np.int64)
+        self.cum_buy = np.zeros(size + 1, np.int64)
+        self.cum_sell = np.zeros(size + 1, np.int64)
+        self.start = 0
+        self.end = 0
+
+    def append(self, ts: np.ndarray, buy: np.ndarray, sell: np.ndarray) -> int:
+        """Add trades in order; returns the buffer position of the first (valid until the next append)."""
+        k = len(ts)
+        if self.end + k > len(self.ts):
+            live = self.end - self.start
+            size = max(len(self.ts), 2 * (live + k))
+            for name in ("ts", "cum_buy", "cum_sell"):
+                old = getattr(self, name)
+                new = np.zeros(size + (name != "ts"), np.int64)
+                stop = self.end + (name != "ts")
+                new[: stop - self.start] = old[self.start : stop]
+                setattr(self, name, new)
+            self.start, self.end = 0, live
+        base = self.end
+        self.ts[base : base + k] = ts
+        self.cum_buy[base + 1 : base + k + 1] = self.cum_buy[base] + np.cumsum(buy)
+        self.cum_sell[base + 1 : base + k + 1] = self.cum_sell[base] + np.cumsum(sell)
+        self.end += k
+        return base
+
+    def volumes(self, upto: np.ndarray, after_ns: np.ndarray) -> tuple:
+        """Buy / sell volume of the trades before buffer position upto with ts > after_ns."""
+        lo = self.start + np.searchsorted(self.ts[self.start : self.end], after_ns, side="right")
+        lo = np.minimum(lo, upto)
+        return self.cum_buy[upto] - self.cum_buy[lo], self.cum_sell[upto] - self.cum_sell[lo]
+
+    def trim(self, after_ns: int) -> None:
+        """Forget trades at or before after_ns."""
+        self.start += int(np.searchsorted(self.ts[self.start : self.end], after_ns, side="right"))
+
+
+@dataclass
+class Signal:
+    """Entry or exit emitted by the engine at the record (or bar close) that triggered it; prices in points."""
+    kind: str                      # "entry" | "exit"
+    side: str                      # "long" | "short"
+    ts_ns: int
+    price: float
+    level: float                   # passive level of the setup
+    stop: Optional[float] = None   # entry: initial SL
+    reason: Optional[str] = None   # exit: sl / reversal_bos / exhaustion / tp / time
+    pnl_ticks: Optional[float] = None
+    symbol: Optional[str] = None   # instrument root
+
+
+class _PassiveWindow:
+    """Count and min (long) / max (short) close of the qualifying bars among the last lookback + 1 bars."""
+
+    def __init__(self, lookback: int, direction: str):
+        self.lookback = lookback
+        self.sign = 1 if direction == "long" else -1
+        self._bars: deque = deque()     # qualifying bar numbers in the window
+        self._extreme: deque = deque()  # (bar, close), sign * close increasing: [0] is the level
+
+    def push(self, bar: int, close: int, qualifies: bool) -> None:
+        if qualifies:
+            self._bars.append(bar)
+            key = self.sign * close
+            while self._extreme and self.sign * self._extreme[-1][1] >= key:
+                self._extreme.pop()
+            self._extreme.append((bar, close))
+        first = bar - self.lookback
+        while self._bars and self._bars[0] < first:
+            self._bars.popleft()
+        while self._extreme and self._extreme[0][0] < first:
+            self._extreme.popleft()
+
+    def level(self, min_count: int) -> Optional[int]:
+        return self._extreme[0][1] if len(self._bars) >= min_count and self._extreme else None
+
+
+class _Setup:
+    """A retest of the passive level at bar retest_bar; swings / BOS counted from that bar on."""
+
+    __slots__ = ("level", "retest_bar", "bounced", "bos", "swing")
+
+    def __init__(self, level: int, retest_bar: int, bos: BosDetector):
+        self.level = level
+        self.retest_bar = retest_bar
+        self.bounced = False
+        self.bos = bos
+        self.swing = None  # swing high (long) / low (short) the next bar's records must break
+
+
+class _Position:
+    __slots__ = (
+        "side", "entry_ts", "entry_px", "entry_bar", "level", "sl", "high", "low", "bos", "reversal",
+        "key_bounds", "time_exit",
+    )
+
+
+class TickEngine:
+    """
+    Streaming event-time backtest of one session. feed() every chunk of records in file order, then
+    finish() -> (BacktestResult, trade details).
+    latency: if given, every feed() records its time split into "bar_update" (bar aggregates), "structure"
+    (bar closes: passive level, setups, BOS swings, exhaustion) and "triggers" (per-record entry / exit
+    checks incl. the aggression window).
+    instrument: tick grid and point value (instruments.py; default MNQ). Prices are half ticks of its
+    tick, point params are scaled by its half_ticks_per_point; trade details add pnl_usd.
+    """
+
+    def __init__(self, params: dict, bar_sec: float = 60.0, day_label: Optional[str] = None,
+                 latency: Optional[LatencyRecorder] = None, instrument: Optional[Instrument] = None):
+        self.params = params
+        self.latency = latency
+        self.instrument = instrument if instrument is not None else INSTRUMENTS[DEFAULT_ROOT]
+        self.pt = self.instrument.half_ticks_per_point
+        self._px_per_tick = self.instrument.px_per_tick
+        g = params.get
+        self.day_label = day_label
+        self.bar_ns = int(bar_sec * 1_000_000_000)
+        self.min_pa = g("min_passive_accumulation_count", 3)
+        self.cob_threshold = g("passive_cob_threshold", 50)
+        self.kl = g("key_level_points", 20) * self.pt
+        self.agg_vol = g("aggressive_min_volume", 150)
+        self.agg_win_ns = int(g("aggressive_window_seconds", 60) * 1_000_000_000)
+        self.bos_lookback = g("bos_swing_lookback", 10)
+        self.min_break = g("bos_min_break_ticks", 2) * TK
+        self.bos_search_bars = g("bos_search_bars", 120)
+        self.bounce_bars = g("bounce_bars", 3)
+        self.enable_shorts = g("enable_shorts", True)
+        self.tp_style = g("tp_style", "cob")
+        self.max_trades = g("max_trades_per_day", 5)
+        self.exit_on_reversal = g("exit_on_reversal_bos", True)
+        lunch = g("lunch_window", "none")
+        self.lunch = LUNCH_WINDOWS.get(lunch, (0, 0)) if lunch != "none" else (0, 0)
+        self.no_first_ns = int(g("no_first_minutes", 0) * 60_000_000_000)
+
+        self.first_ts: Optional[int] = None
+        self.records_seen = 0
+        self.last_mid: Optional[int] = None
+        self.session_high: Optional[int] = None
+        self.session_low: Optional[int] = None
+        # Open bar
+        self.cur_bar: Optional[int] = None
+        self._reset_bar()
+        # Closed bars
+        self.n_bars = 0
+        self.closes: deque = deque(maxlen=3)
+        self.volumes: deque = deque(maxlen=2)  # (buy, sell) of the last closed bars
+        self.depth = (0.0, 0.0)                # last bar's mean (bid, ask) depth, carried over bars without levels
+        lookback = g("passive_lookback_bars", 60)
+        self.passive = {"long": _PassiveWindow(lookback, "long"), "short": _PassiveWindow(lookback, "short")}
+        self.setups = {"long": [], "short": []}
+        self.cob_row: Optional[tuple] = None   # (ticks, depth) of the last closed bar
+        self._resistance: Optional[ResistanceIndex] = None
+        # Trades in the trailing aggression window, carried from chunk to chunk
+        self._trades = _TradeWindow()
+        self.position: Optional[_Position] = None
+        self.trade_pnls: list = []
+        self.trade_details: list = []
+        self.signals: list = []  # Signal per entry / exit, in order (SignalEngine drains it)
+        self.n_entries = 0
+
+    # --- stream ---
+
+    def feed(self, rec: np.ndarray) -> None:
+        if len(rec) == 0:
+            return
+        clock = time.perf_counter_ns
+        t_start = clock()
+        structure_ns = triggers_ns = 0
+        ts = rec["ts_recv"].astype(np.int64)
+        if self.first_ts is None:
+            self.first_ts = int(ts[0])
+        self.records_seen += len(rec)
+        ok = ts >= self.first_ts
+        if not ok.all():
+            rec, ts = rec[ok], ts[ok]
+            if len(rec) == 0:
+                return
+        n = len(rec)
+        bar = (ts - self.first_ts) // self.bar_ns
+        is_trade = rec["action"] == b"T"
+        t_idx = np.flatnonzero(is_trade)
+        t_size = rec["size"][t_idx].astype(np.int64)
+        t_buy = np.where(rec["side"][t_idx] == b"B", t_size, 0)
+        n_levels = _book_layout(rec.dtype)[0]
+
+        # Mid of each record in half ticks (trade price for trade-only schemas), carried over undefined ones
+        if n_levels:
+            bid_px, ask_px = rec["bid_px_00"], rec["ask_px_00"]
+            has_mid = (bid_px != UNDEF_PRICE) & (ask_px != UNDEF_PRICE)
+            mid = px_to_ticks(bid_px, self._px_per_tick) + px_to_ticks(ask_px, self._px_per_tick)
+            bid_sz, ask_sz = _levels(rec, "bid_sz"), _levels(rec, "ask_sz")
+        else:
+            px = rec["price"]
+            mid = px_to_ticks(px, self._px_per_tick) * 2
+            has_mid = is_trade & (px != UNDEF_PRICE) & (mid > 0)
+        if has_mid.all():
+            valid = has_mid
+        else:
+            src = np.maximum.accumulate(np.where(has_mid, np.arange(n), -1))
+            valid = src >= 0
+            mid = np.where(valid, mid[np.maximum(src, 0)], self.last_mid if self.last_mid is not None else 0)
+            if self.last_mid is not None:
+                valid[:] = True
+
+        base = self._open_chunk(ts, mid, valid, ts[t_idx], t_buy, t_size - t_buy, is_trade)
+        trades_upto = self._chunk[3]
+        cum_buy, cum_sell = self._trades.cum_buy, self._trades.cum_sell
+
+        cuts = np.flatnonzero(np.diff(bar)) + 1
+        for s, e in zip(np.concatenate(([0], cuts)).tolist(), np.concatenate((cuts, [n])).tolist()):
+            b = int(bar[s])
+            if b != self.cur_bar:
+                if self.cur_bar is not None:
+                    t = clock()
+                    self._close_bar()
+                    structure_ns += clock() - t
+                self.cur_bar = b
+            # Bar aggregates are read only when the bar closes: add the whole slice at once
+            t0 = int(trades_upto[s - 1]) if s else base
+            t1 = int(trades_upto[e - 1])
+            self.bar_buy += int(cum_buy[t1] - cum_buy[t0])
+            self.bar_sell += int(cum_sell[t1] - cum_sell[t0])
+            if n_levels:
+                self.bar_n += e - s
+                self.bar_bid += int(bid_sz[s:e].sum())
+                self.bar_ask += int(ask_sz[s:e].sum())
+                if self.tp_style == "cob":
+                    self._add_cob(_levels(rec, "ask_px")[s:e], ask_sz[s:e])
+            if valid[e - 1]:
+                self.bar_close = int(mid[e - 1])
+                self.bar_close_ts = int(ts[e - 1])
+            t = clock()
+            self._scan(s, e)
+            triggers_ns += clock() - t
+            self._session_range(s, e)
+        self._close_chunk()
+        if self.latency is not None:
+            self.latency.add("bar_update", clock() - t_start - structure_ns - triggers_ns)
+            self.latency.add("structure", structure_ns)
+            self.latency.add("triggers", triggers_ns)
+
+    def feed_bar(self, ts_ns: int, mid: float, bid_depth: float, ask_depth: float, buy_vol: int = 0,
+                 sell_vol: int = 0, cob: Optional[tuple] = None) -> None:
+        """
+        One closed bar instead of its records (a bars DataFrame row: ts_ns = bar start, mid in points;
+        cob = (ticks, depth) of the bar's asks). The bar is a single event at its close: its mid is checked
+        for entries / exits and its volume is one trade stamped at the close, then the bar closes.
+        """
+        if self.first_ts is None:
+            self.first_ts = int(ts_ns)
+        b = (int(ts_ns) - self.first_ts) // self.bar_ns
+        if self.cur_bar is not None and b != self.cur_bar:
+            self._close_bar()
+        self.cur_bar = b
+        close_ts = self.first_ts + (b + 1) * self.bar_ns - 1
+        px = int(round(mid * self.pt)) if mid == mid else self.last_mid
+        self.records_seen += 1
+        self.bar_n += 1
+        self.bar_bid += bid_depth
+        self.bar_ask += ask_depth
+        self.bar_buy += int(buy_vol)
+        self.bar_sell += int(sell_vol)
+        if cob is not None and self.tp_style == "cob" and len(cob[0]):
+            self._cob_ticks.append(np.asarray(cob[0], np.int64))
+            self._cob_depth.append(np.asarray(cob[1], np.float64))
+        ts = np.array([close_ts], np.int64)
+        valid = np.array([px is not None])
+        mid_arr = np.array([px if px is not None else 0], np.int64)
+        if px is not None:
+            self.bar_close, self.bar_close_ts = px, close_ts
+        self._open_chunk(ts, mid_arr, valid, ts, np.array([buy_vol], np.int64), np.array([sell_vol], np.int64),
+                         np.ones(1, bool))
+        self._scan(0, 1)
+        self._session_range(0, 1)
+        self._close_chunk()
+        self._close_bar()
+        self.cur_bar = None
+
+    def _open_chunk(self, ts, mid, valid, trade_ts, trade_buy, trade_sell, is_trade) -> int:
+        """Set the arrays _scan reads; returns the trade window position of this chunk's first trade."""
+        base = self._trades.append(trade_ts, trade_buy, trade_sell)
+        # Trade window position after each record's trades (file order: a trade counts from its own record on)
+        trades_upto = base + np.cumsum(is_trade)
+        self._chunk = (ts, mid, valid, trades_upto)
+        return base
+
+    def _close_chunk(self) -> None:
+        ts, mid, valid, _ = self._chunk
+        if valid[-1]:
+            self.last_mid = int(mid[-1])
+        self._trades.trim(int(ts[-1]) - self.agg_win_ns)
+        self._chunk = None
+
+    def _session_range(self, s: int, e: int) -> None:
+        _, mid, valid = self._chunk[:3]
+        if valid[s:e].any():
+            seg = mid[s:e][valid[s:e]]
+            hi, lo = int(seg.max()), int(seg.min())
+            self.session_high = hi if self.session_high is None else max(self.session_high, hi)
+            self.session_low = lo if self.session_low is None else min(self.session_low, lo)
+
+    def finish(self) -> tuple:
+        """Close the last bar; (BacktestResult, trade details). An open position is dropped."""
+        if self.cur_bar is not None:
+            self._close_bar()
+            self.cur_bar = None
+        self.position = None
+        return _summarize(self.params, self.trade_pnls), self.trade_details
+
+    # --- bars ---
+
+    def _reset_bar(self) -> None:
+        self.bar_n = 0
+        self.bar_bid = self.bar_ask = 0
+        self.bar_buy = self.bar_sell = 0
+        self.bar_close: Optional[int] = None
+        self.bar_close_ts: Optional[int] = None
+        self._cob_ticks: list = []
+        self._cob_depth: list = []
+
+    def _add_cob(self, ask_px: np.ndarray, ask_sz: np.ndarray) -> None:
+        keep = (ask_px != UNDEF_PRICE) & (ask_sz > 0)
+        if keep.any():
+            self._cob_ticks.append(px_to_ticks(ask_px[keep], self._px_per_tick))
+            self._cob_depth.append(ask_sz[keep])
+
+    def _close_bar(self) -> None:
+        k = self.n_bars
+        self.n_bars += 1
+        if self.bar_n:
+            self.depth = (self.bar_bid / self.bar_n, self.bar_ask / self.bar_n)
+        if self._cob_ticks:
+            # One bar's asks span a few hundred ticks: dense bincount over the span
+            ticks = np.concatenate(self._cob_ticks)
+            lo = int(ticks.min())
+            dense = np.bincount(ticks - lo, weights=np.concatenate(self._cob_depth))
+            nz = np.flatnonzero(dense)
+            self.cob_row = (nz + lo, dense[nz])
+            self._resistance = None
+        close = self.bar_close if self.bar_close is not None else self.last_mid
+        close_ts = self.bar_close_ts
+        buy, sell = self.bar_buy, self.bar_sell
+        self._reset_bar()
+        if close is None:
+            return
+        self.closes.append(close)
+        self.volumes.append((buy, sell))
+        self.passive["long"].push(k, close, self.depth[0] >= self.cob_threshold)
+        self.passive["short"].push(k, close, self.depth[1] >= self.cob_threshold)
+
+        pos = self.position
+        if pos is not None:
+            if pos.bos is not None:
+                pos.bos.push(close)
+                high, low = pos.bos.levels()
+                pos.reversal = low if pos.side == "long" else high
+            if self._exhausted(pos, k, close):
+                self._exit(close_ts if close_ts is not None else pos.entry_ts, close, "exhaustion")
+            return
+        if self.n_entries >= self.max_trades:
+            return
+        for direction in ("long", "short") if self.enable_shorts else ("long",):
+            self._update_setups(direction, k, close)
+
+    def _update_setups(self, direction: str, k: int, close: int) -> None:
+        sign = 1 if direction == "long" else -1
+        kept = []
+        for st in self.setups[direction]:
+            st.bos.push(close)
+            if k - st.retest_bar >= self.bos_search_bars:
+                continue
+            if not st.bounced:
+                if k - st.retest_bar > self.bounce_bars:
+                    continue
+                # Bounce: a close beyond the key-level band within bounce_bars bars of the retest
+                st.bounced = sign * (close - st.level) > self.kl
+            high, low = st.bos.levels()
+            st.swing = high if direction == "long" else low
+            kept.append(st)
+        level = self.passive[direction].level(self.min_pa)
+        if level is not None and sign * (close - level) <= self.kl:
+            st = _Setup(level, k, BosDetector(self.bos_lookback, self.min_break))
+            st.bos.push(close)
+            kept.append(st)
+        self.setups[direction] = kept
+
+    def _exhausted(self, pos: _Position, k: int, close: int) -> bool:
+        """run_backtest's exhaustion exit (longs): up > 5 pts, two lower closes, sellers ahead on both bars."""
+        if pos.side != "long" or not self.params.get("exit_on_exhaustion", False) or k < pos.entry_bar + 2:
+            return False
+        if len(self.closes) < 3 or (close - pos.entry_px) / self.pt <= 5:
+            return False
+        c2, c1, c0 = self.closes
+        return c0 < c1 < c2 and all(s > b for b, s in self.volumes)
+
+    # --- records ---
+
+    def _scan(self, s: int, e: int) -> None:
+        """Entries / exits among records [s, e) of the current chunk (one bar's slice)."""
+        while s < e:
+            if self.position is not None:
+                s = self._scan_exit(s, e)
+            elif self.n_entries < self.max_trades and any(
+                st.bounced and st.swing is not None for sts in self.setups.values() for st in sts
+            ):
+                s = self._scan_entry(s, e)
+            else:
+                return
+
+    def _aggression(self, idx: np.ndarray) -> tuple:
+        """Buy / sell volume of the trades in (ts - window, ts] up to each record idx of the chunk."""
+        ts, _, _, trades_upto = self._chunk
+        return self._trades.volumes(trades_upto[idx], ts[idx] - self.agg_win_ns)
+
+    def _time_ok(self, ts: np.ndarray) -> np.ndarray:
+        since = ts - self.first_ts
+        ok = since >= self.no_first_ns
+        start, end = self.lunch
+        if end > start:
+            minutes = since // 60_000_000_000
+            ok &= (minutes < start) | (minutes >= end)
+        return ok
+
+    def _scan_entry(self, s: int, e: int) -> int:
+        ts, mid, valid = self._chunk[:3]
+        m = mid[s:e]
+        best = None  # (record, setup order, direction, setup)
+        order = 0
+        for direction, sts in self.setups.items():
+            sign = 1 if direction == "long" else -1
+            for st in sts:
+                order += 1
+                if not st.bounced or st.swing is None:
+                    continue
+                hit = valid[s:e] & (sign * (m - st.swing) > self.min_break) & (sign * (m - st.level) >= -self.kl)
+                cand = np.flatnonzero(hit)
+                if best is not None:
+                    cand = cand[cand <= best[0]]
+                if not len(cand):
+                    continue
+                cand = cand[self._time_ok(ts[s + cand])]
+                if not len(cand):
+                    continue
+                buy, sell = self._aggression(s + cand)
+                own, other = (buy, sell) if direction == "long" else (sell, buy)
+                ok = np.flatnonzero((own > other) & (own >= self.agg_vol))
+                if not len(ok):
+                    continue
+                r = int(cand[ok[0]])
+                # Earliest record wins; long before short on the same record, then the older retest
+                if best is None or (r, order) < best[:2]:
+                    best = (r, order, direction, st)
+        if best is None:
+            return e
+        r, _, direction, st = best
+        self._enter(s + r, direction, st.level, int(m[: r + 1].min()), int(m[: r + 1].max()))
+        return s + r + 1
+
+    def _enter(self, r: int, side: str, level: int, seg_low: int, seg_high: int) -> None:
+        ts, mid = self._chunk[:2]
+        g = self.params.get
+        entry = int(mid[r])
+        running_low = seg_low if self.session_low is None else min(self.session_low, seg_low)
+        running_high = seg_high if self.session_high is None else max(self.session_high, seg_high)
+        sl_fallback = g("sl_points_fallback", 15) * self.pt
+        if side == "long":
+            if g("sl_style", "level") == "level":
+                sl = running_low - g("sl_buffer_pts", 2) * self.pt
+                dist = entry - sl
+                if sl >= entry or dist < 3 * self.pt or dist > g("sl_max_pts", 25) * self.pt:
+                    sl = entry - sl_fallback
+            else:
+                sl = entry - g("sl_ticks", 12) * TK
+        else:
+            sl = running_high + g("sl_buffer_pts", 2) * self.pt
+            dist = sl - entry
+            if dist < 3 * self.pt or dist > g("sl_max_pts", 25) * self.pt:
+                sl = entry + sl_fallback
+        pos = _Position()
+        pos.side = side
+        pos.entry_ts = int(ts[r])
+        pos.entry_px = entry
+        pos.entry_bar = self.n_bars  # the open bar
+        pos.level = level
+        pos.sl = sl
+        pos.high = pos.low = entry
+        pos.bos = BosDetector(self.bos_lookback, self.min_break) if self.exit_on_reversal else None
+        pos.reversal = None
+        if pos.bos is not None:
+            pos.bos.push(entry)
+        pos.key_bounds = (running_low, running_high, level)
+        pos.time_exit = pos.entry_ts + g("max_hold_bars", 80) * self.bar_ns
+        self.position = pos
+        self.n_entries += 1
+        self.signals.append(Signal(
+            "entry", side, pos.entry_ts, entry / self.pt, level / self.pt, stop=sl / self.pt, symbol=self.instrument.root,
+        ))
+        self.setups = {"long": [], "short": []}
+
+    def _resistance_index(self) -> Optional[ResistanceIndex]:
+        """Depth-filtered resistance of the last closed bar's COB row (built once per bar, when needed)."""
+        if self._resistance is None and self.cob_row is not None:
+            ticks, depth = self.cob_row
+            ref = int(ticks[0]) if len(ticks) else 0
+            ladder = CobLadder(
+                bar_ts=np.zeros(1, np.int64), offsets=np.array([0, len(ticks)], np.int64),
+                ticks=(ticks - ref).astype(np.int32), depth=depth.astype(np.float32), ref_tick=ref,
+            )
+            g = self.params.get
+            self._resistance = ResistanceIndex(
+                ladder, g("cob_tp_threshold", 30), g("cob_near_key_pts", 20) * self.pt, 50 * self.pt, unit=TK,
+            )
+        return self._resistance
+
+    def _scan_exit(self, s: int, e: int) -> int:
+        ts, mid = self._chunk[:2]
+        pos = self.position
+        g = self.params.get
+        m = mid[s:e]
+        entry = pos.entry_px
+        trail = g("trail_sl_pts", 15)
+        hits = []  # (first record, priority, reason, exit prices)
+        if pos.side == "long":
+            high = np.maximum.accumulate(np.maximum(m, pos.high))
+            high_prior = np.concatenate(([pos.high], high[:-1]))
+            sl = np.full(len(m), pos.sl, np.int64)
+            if trail:
+                act = g("trail_activation_pts", 0)
+                if act > 0:
+                    sl = np.maximum(sl, np.where(high >= entry + act * self.pt, high - trail * self.pt, pos.sl))
+                else:
+                    sl = np.maximum.accumulate(np.where(m >= entry + trail * self.pt, max(pos.sl, entry - 2 * self.pt), pos.sl))
+            hits.append((m <= sl, 0, "sl", sl))
+            if pos.reversal is not None:
+                hits.append((m < pos.reversal - self.min_break, 1, "reversal_bos", m))
+            if self.tp_style == "cob":
+                resistance = self._resistance_index()
+                if resistance is not None:
+                    level = resistance.nearest_above_many(0, m, resistance.key_bounds(list(pos.key_bounds)))
+                    tp = level - g("tp_buffer_pts_cob", 2) * self.pt
+                    min_tp = g("min_tp_pts_above_entry", 0)
+                    ok = (tp > entry) & (m >= tp)  # NaN level: False
+                    if min_tp > 0:
+                        ok &= tp - entry >= min_tp * self.pt
+                    hits.append((ok, 2, "tp", tp))
+            elif self.tp_style == "session_high":
+                tp = high_prior - g("tp_buffer", 15) * self.pt
+                ok = (high_prior >= entry + g("min_run_pts", 10) * self.pt) & (tp > entry) & (m >= tp)
+                hits.append((ok, 2, "tp", tp))
+            elif self.tp_style != "hold":
+                tp = entry + g("tp_points", 40) * TK
+                hits.append((m >= tp, 2, "tp", np.full(len(m), tp)))
+        else:
+            sl = np.full(len(m), pos.sl, np.int64)
+            if trail:
+                sl = np.minimum.accumulate(np.where(m <= entry - trail * self.pt, min(pos.sl, entry + 2 * self.pt), pos.sl))
+            hits.append((m >= sl, 0, "sl", sl))
+            if pos.reversal is not None:
+                hits.append((m > pos.reversal + self.min_break, 1, "reversal_bos", m))
+            if self.tp_style not in ("hold", "cob", "session_high"):
+                tp = entry - g("tp_points", 40) * TK
+                hits.append((m <= tp, 2, "tp", np.full(len(m), tp)))
+        hits.append((ts[s:e] >= pos.time_exit, 3, "time", m))
+
+        first = None
+        for mask, priority, reason, prices in hits:
+            j = int(np.argmax(mask))
+            if mask[j] and (first is None or (j, priority) < first[:2]):
+                first = (j, priority, reason, prices[j])
+        if first is None:
+            pos.high = max(pos.high, int(m.max()))
+            pos.low = min(pos.low, int(m.min()))
+            pos.sl = int(sl[-1])
+            return e
+        j, _, reason, exit_px = first
+        pos.high = max(pos.high, int(m[: j + 1].max()))
+        pos.low = min(pos.low, int(m[: j + 1].min()))
+        self._exit(int(ts[s + j]), exit_px.item(), reason)
+        return s + j + 1
+
+    def _exit(self, exit_ts: int, exit_px, reason: str) -> None:
+        pos = self.position
+        self.position = None
+        sign = 1 if pos.side == "long" else -1
+        pnl_ticks = sign * (exit_px - pos.entry_px) / TK
+        self.trade_pnls.append(pnl_ticks)
+        self.signals.append(Signal(
+            "exit", pos.side, exit_ts, exit_px / self.pt, pos.level / self.pt, reason=reason, pnl_ticks=pnl_ticks,
+            symbol=self.instrument.root,
+        ))
+        up, down = (pos.high - pos.entry_px) / self.pt, (pos.entry_px - pos.low) / self.pt
+        self.trade_details.append({
+            "day": self.day_label,
+            "symbol": self.instrument.root,
+            "side": pos.side,
+            "entry_ts": pd.Timestamp(pos.entry_ts, unit="ns", tz="UTC"),
+            "exit_ts": pd.Timestamp(exit_ts, unit="ns", tz="UTC"),
+            "minutes_from_open": (pos.entry_ts - self.first_ts) / 60e9,
+            "entry_price": pos.entry_px / self.pt,
+            "exit_price": exit_px / self.pt,
+            "pnl_ticks": pnl_ticks,
+            "pnl_pts": pnl_ticks * self.instrument.tick_size,
+            "pnl_usd": pnl_ticks * self.instrument.tick_value,
+            "exit_reason": reason,
+            "mfe_pts": up if pos.side == "long" else down,
+            "mae_pts": down if pos.side == "long" else up,
+            "acc_level": pos.level / self.pt,
+            "tp_distance_pts": abs(exit_px - pos.entry_px) / self.pt if reason == "tp" else None,
+        })
+
+
+def run_tick_backtest(
+    dbn_path: Path,
+    params: dict,
+    bar_sec: float = 60.0,
+    return_trade_details: bool = False,
+    day_label: Optional[str] = None,
+    chunk_records: int = CHUNK_RECORDS,
+    latency: Optional[LatencyRecorder] = None,
+    instrument: Optional[Instrument] = None,
+):
+    """
+    TickEngine over one DBN file in a single streaming pass. Same return shape as run_backtest.
+    latency: per chunk "decode" plus TickEngine's stages. instrument: default from the file name.
+    """
+    engine = TickEngine(
+        params, bar_sec=bar_sec, day_label=day_label, latency=latency,
+        instrument=instrument if instrument is not None else dbn_instrument(dbn_path),
+    )
+    chunks = iter_dbn_chunks(Path(dbn_path), chunk_records=chunk_records)
+    for chunk in latency.timed(chunks, "decode") if latency is not None else chunks:
+        engine.feed(chunk)
+    result, details = engine.finish()
+    return (result, details) if return_trade_details else result
+
+
+def main():
+    import argparse
+    ap = argparse.ArgumentParser(description="Event-time (tick) backtest, one streaming pass per day")
+    ap.add_argument("--days", type=int, default=None, help="Limit to first N days")
+    ap.add_argument("--bar-sec", type=float, default=60.0, help="Bar size for structure (passive level, swings)")
+    ap.add_argument("--details", action="store_true", help="Print every trade")
+    ap.add_argument("--instruments", type=str, default=None, help="Comma-separated roots, e.g. MNQ,NQ,ES,MES (default: MNQ files)")
+    ap.add_argument("--latency", action="store_true", help="Print per-stage latency of all days at the end")
+    ap.add_argument("--latency-json", type=Path, default=None, help="Dump the latency histograms to this JSON file")
+    args = ap.parse_args()
+    baseline = DATA_DIR / "baseline_params.json"
+    params = json.loads(baseline.read_text()) if baseline.exists() else {}
+    if args.instruments:
+        roots = [r.strip() for r in args.instruments.split(",") if r.strip()]
+        files = [f for root in roots for f in instrument_files(root)[: args.days]]
+    else:
+        files = dbn_files()[: args.days]
+    if not files:
+        print("No RTH .dbn files in data/")
+        return
+    totals: dict = {}  # root -> (ticks, usd)
+    latency = LatencyRecorder() if args.latency or args.latency_json else None
+    for f in files:
+        t0 = time.perf_counter()
+        n_rec = 0
+        inst = dbn_instrument(f)
+        engine = TickEngine(params, bar_sec=args.bar_sec, day_label=dbn_stem(f), latency=latency, instrument=inst)
+        chunks = iter_dbn_chunks(f)
+        for chunk in latency.timed(chunks, "decode") if latency is not None else chunks:
+            n_rec += len(chunk)
+            engine.feed(chunk)
+        r, details = engine.finish()
+        dt = time.perf_counter() - t0
+        ticks, usd = totals.get(inst.root, (0.0, 0.0))
+        totals[inst.root] = (ticks + r.total_pnl_ticks, usd + sum(d["pnl_usd"] for d in details))
+        print(f"{dbn_stem(f)}: {r.trades} trades, {r.total_pnl_ticks:+.0f} ticks | {n_rec:,} records in {dt:.1f}s ({n_rec / max(dt, 1e-9):,.0f}/s)")
+        if args.details:
+            for d in details:
+                print(f"  {d['side']:5s} {d['entry_ts']:%H:%M:%S.%f} @ {d['entry_price']:.2f} -> {d['exit_ts']:%H:%M:%S.%f} @ {d['exit_price']:.2f} {d['exit_reason']} {d['pnl_ticks']:+.0f}")
+    for root, (ticks, usd) in totals.items():
+        print(f"Total {root}: {ticks:+.0f} ticks (${usd:+,.0f} per contract)")
+    if len(totals) > 1:
+        print(f"Total: ${sum(usd for _, usd in totals.values()):+,.0f} (one contract each)")
+    if latency is not None:
+        print(latency.report(f"Latency per {CHUNK_RECORDS:,}-record chunk"))
+        if args.latency_json:
+            latency.dump(args.latency_json)
+            print(f"Latency histograms -> {args.latency_json}")
+
+
+if __name__ == "__main__":
+    main()
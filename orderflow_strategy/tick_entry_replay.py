@@ -1,6 +1,7 @@
 """
-Targeted tick replay: for each 1-min backtest entry we only expand 9:58–10:02 (or entry_bar ± 2 min)
-to event-level data and find the first moment we would have entered on a live/tick feed.
+Targeted tick replay: for each 1-min backtest entry we only look at 9:58–10:02 (or entry_bar ± 2 min)
+on 1-sec bars and find the first moment we would have entered on a live/tick feed.
+1-min and 1-sec bars come from ONE pass over the DBN (load_dbn_multi).
 So we get "1-min said enter at 10:00 @ 25,000; tick would have been 9:59:12 @ 24,998" = X pts better.
 No full tick backtest — only ~4 min of events per trade. Run after you have trade details.
 Usage: python tick_entry_replay.py [--days N]
@@ -10,7 +11,6 @@ from __future__ import annotations
 import json
 import sys
 from pathlib import Path
-from collections import defaultdict
 
 import numpy as np
 import pandas as pd
@@ -21,9 +21,9 @@ except ImportError:
     db = None
 
 sys.path.insert(0, str(Path(__file__).parent))
-from config import DATA_DIR
+from config import DATA_DIR, dbn_files, dbn_stem
 from backtest_engine import (
-    load_dbn_streaming,
+    load_dbn_multi,
     run_backtest,
     _detect_bos,
     TICK,
@@ -38,71 +38,17 @@ WINDOW_BARS_AFTER = 2
 FINE_BAR_SEC = 1.0
 
 
-def collect_events_for_windows(dbn_path: Path, windows: list[tuple[int, int]]) -> dict[int, list[dict]]:
+def fine_bars_for_window(fine_bars: pd.DataFrame, session_start_ns: int, entry_bar: int) -> pd.DataFrame:
     """
-    Replay DBN once; for each (session_start_ns, entry_bar) in windows, collect events in that 4-min window.
-    windows: list of (session_start_ns, entry_bar). Returns dict keyed by (entry_bar,) or index into windows.
+    1-sec bars (mid, buy_vol, sell_vol) from entry_bar - 2 min to entry_bar + 2 min (inclusive end),
+    sliced out of the day's fine bars that load_dbn_multi built in the same pass as the 1-min bars.
     """
-    # key = entry_bar (we assume one session per file so session_start is same for all)
-    by_key = defaultdict(list)
-    if not windows:
-        return dict(by_key)
-    session_start_ns = windows[0][0]
-    window_list = [
-        (entry_bar,
-         session_start_ns + int((entry_bar - WINDOW_BARS_BEFORE) * 60 * 1e9),
-         session_start_ns + int((entry_bar + WINDOW_BARS_AFTER + 1) * 60 * 1e9))
-        for _, entry_bar in windows
-    ]
-
-    def callback(r):
-        ts_ns = r.ts_recv
-        rec = {"ts_ns": ts_ns}
-        if r.action == "T":
-            rec["action"] = "T"
-            rec["side"] = str(getattr(r, "side", "B"))
-            rec["size"] = int(r.size)
-        elif hasattr(r, "levels") and r.levels:
-            mid = (r.levels[0].pretty_bid_px + r.levels[0].pretty_ask_px) / 2
-            rec["mid"] = mid
-        for entry_bar, w_start, w_end in window_list:
-            if w_start <= ts_ns <= w_end:
-                by_key[entry_bar].append(rec)
-                break
-
-    store = db.DBNStore.from_file(str(dbn_path))
-    store.replay(callback)
-    return dict(by_key)
-
-
-def events_to_fine_bars(events: list[dict], fine_sec: float = 1.0) -> pd.DataFrame:
-    """Build 1-sec (or fine_sec) bars: mid (last), buy_vol, sell_vol from event list."""
-    if not events:
+    if fine_bars is None or fine_bars.empty:
         return pd.DataFrame(columns=["mid", "buy_vol", "sell_vol"])
-    first_ns = min(e["ts_ns"] for e in events)
-    bar_ns = int(fine_sec * 1e9)
-    bars_dict = defaultdict(lambda: {"mid": 0.0, "buy_vol": 0, "sell_vol": 0})
-    for e in events:
-        ts_ns = e["ts_ns"]
-        idx = (ts_ns - first_ns) // bar_ns
-        if e.get("action") == "T":
-            if e.get("side") == "B":
-                bars_dict[idx]["buy_vol"] += e.get("size", 0)
-            else:
-                bars_dict[idx]["sell_vol"] += e.get("size", 0)
-        elif "mid" in e:
-            bars_dict[idx]["mid"] = e["mid"]
-    idx_sorted = sorted(bars_dict.keys())
-    # Forward-fill mid
-    last_mid = None
-    for i in idx_sorted:
-        if bars_dict[i]["mid"] != 0:
-            last_mid = bars_dict[i]["mid"]
-        elif last_mid is not None:
-            bars_dict[i]["mid"] = last_mid
-    times = [pd.Timestamp(first_ns + i * bar_ns, unit="ns") for i in idx_sorted]
-    rows = [{"mid": bars_dict[i]["mid"], "buy_vol": bars_dict[i]["buy_vol"], "sell_vol": bars_dict[i]["sell_vol"]} for i in idx_sorted]
-    return pd.DataFrame(rows, index=pd.DatetimeIndex(times))
+    w_start = pd.Timestamp(session_start_ns + int((entry_bar - WINDOW_BARS_BEFORE) * BAR_SEC * 1e9), unit="ns")
+    w_end = pd.Timestamp(session_start_ns + int((entry_bar + WINDOW_BARS_AFTER + 1) * BAR_SEC * 1e9), unit="ns")
+    ts = fine_bars.index
+    return fine_bars.loc[(ts >= w_start) & (ts <= w_end), ["mid", "buy_vol", "sell_vol"]]
 
 
 def first_tick_entry_in_window(
@@ -173,26 +119,13 @@ def main():
     else:
         params = json.loads(baseline.read_text())
         params_v2 = {**params, "min_tp_pts_above_entry": 15, "trail_sl_pts": 25}
-    files = sorted(DATA_DIR.glob("mnq_*_RTH_*.dbn"))
+    files = dbn_files()
     if args.days:
         files = files[: args.days]
     if not files:
         print("No RTH .dbn files in data/")
         return
 
-    all_details = []
-    for f in files:
-        bars, tr = load_dbn_streaming(f, freq_sec=BAR_SEC)
-        r, details = run_backtest(bars=bars, trades_df=tr, params=params_v2, bar_sec=BAR_SEC, return_trade_details=True, day_label=f.stem)
-        for d in details:
-            d["_dbn_path"] = f
-            d["_session_start_ns"] = int(bars.index[0].value)
-        all_details.extend(details)
-
-    if not all_details:
-        print("No trades to replay.")
-        return
-
     kl_pts = params_v2.get("key_level_points", 20)
     bounce_bars = params_v2.get("bounce_bars", 3)
     bos_lookback = params_v2.get("bos_swing_lookback", 10)
@@ -202,17 +135,19 @@ def main():
     # On 1-sec bars, use smaller lookback for BOS
     bos_lookback_fine = max(3, bos_lookback // 6)
 
-    # Group by day (dbn path) so we replay each DBN only once
-    by_day = defaultdict(list)
-    for d in all_details:
-        by_day[d["_dbn_path"]].append(d)
-
+    n_trades = 0
     results = []
-    for dbn_path, day_details in by_day.items():
-        session_start_ns = day_details[0]["_session_start_ns"]
-        windows = [(session_start_ns, d["entry_bar"]) for d in day_details]
-        events_by_bar = collect_events_for_windows(dbn_path, windows)
-        for d in day_details:
+    for f in files:
+        # One replay per day: 1-min bars for the backtest, 1-sec bars for the entry windows
+        by_freq = load_dbn_multi(f, [BAR_SEC, FINE_BAR_SEC])
+        bars, tr = by_freq[BAR_SEC]
+        fine_bars = by_freq[FINE_BAR_SEC][0]
+        r, details = run_backtest(bars=bars, trades_df=tr, params=params_v2, bar_sec=BAR_SEC, return_trade_details=True, day_label=dbn_stem(f))
+        if not details:
+            continue
+        n_trades += len(details)
+        session_start_ns = int(bars.index[0].value)
+        for d in details:
             day_label = d["day"]
             entry_bar = d["entry_bar"]
             entry_price_1min = d["entry_price"]
@@ -220,10 +155,9 @@ def main():
             if acc_level is None:
                 results.append({"day": day_label, "entry_bar": entry_bar, "entry_1min": entry_price_1min, "tick_idx": None, "tick_price": None, "pts_better": None})
                 continue
-            events = events_by_bar.get(entry_bar, [])
-            fine_bars = events_to_fine_bars(events, FINE_BAR_SEC)
+            window_bars = fine_bars_for_window(fine_bars, session_start_ns, entry_bar)
             tick_idx, tick_price = first_tick_entry_in_window(
-                fine_bars, acc_level, kl_pts, bounce_bars, bos_lookback_fine, bos_ticks, agg_win, agg_vol
+                window_bars, acc_level, kl_pts, bounce_bars, bos_lookback_fine, bos_ticks, agg_win, agg_vol
             )
             pts_better = None
             if tick_price is not None and entry_price_1min is not None:
@@ -237,14 +171,19 @@ def main():
                 "pts_better": pts_better,
             })
             print(f"  {day_label} bar={entry_bar} 1min={entry_price_1min:.2f} tick_price={tick_price} pts_better={pts_better}", flush=True)
-        print(f"  Replayed {dbn_path.name} once for {len(day_details)} trades", flush=True)
+        print(f"  Replayed {f.name} once for {len(details)} trades", flush=True)
+        del bars, tr, fine_bars, by_freq
+
+    if not n_trades:
+        print("No trades to replay.")
+        return
 
     # Summary
     with_tick = [r for r in results if r["tick_price"] is not None]
     pts_better_list = [r["pts_better"] for r in with_tick if r["pts_better"] is not None]
     lines = [
         "=== Tick entry replay (4-min window per trade, 1-sec bars) ===",
-        f"Trades: {len(all_details)}  With tick entry found: {len(with_tick)}",
+        f"Trades: {n_trades}  With tick entry found: {len(with_tick)}",
         "",
     ]
     if pts_better_list:
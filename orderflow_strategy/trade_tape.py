@@ -0,0 +1,126 @@
+"""
+Trade tape: one NumPy structured array per day instead of a trades DataFrame built from a
+pd.Timestamp per trade. Fields: ts_ns (int64 ts_recv), side (int8: +1 buy "B", -1 sell "A", 0 "N"),
+size (int32), price_ticks (int64, -1 = no price).
+
+Windowed buy/sell volume (aggressive accumulation) is two searchsorted calls on ts_ns plus cumulative
+buy/sell sums, so each window is O(log n) instead of a boolean mask over the whole day.
+The bar cache saves the tape as one .npy next to the day's bar entries and reopens it memory-mapped.
+"""
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+TAPE_DTYPE = np.dtype([("ts_ns", "<i8"), ("side", "i1"), ("size", "<i4"), ("price_ticks", "<i8")])
+SIDE_CODES = {"B": 1, "A": -1, "N": 0}
+SIDE_LETTERS = np.array(["N", "B", "A"])  # indexed by side code (-1 -> last)
+
+
+class TradeTape:
+    def __init__(self, records: np.ndarray, buy_cum: Optional[np.ndarray] = None, sell_cum: Optional[np.ndarray] = None):
+        if records.dtype != TAPE_DTYPE:
+            raise ValueError(f"trade tape dtype must be {TAPE_DTYPE}, got {records.dtype}")
+        ts = records["ts_ns"]
+        if len(ts) > 1 and (np.diff(ts) < 0).any():
+            records = records[np.argsort(ts, kind="stable")]
+            buy_cum = sell_cum = None
+        self.records = records
+        # Buy / sell prefix sums, built on first window query unless given (a shared-memory day passes its own)
+        self._buy_cum = buy_cum
+        self._sell_cum = sell_cum
+
+    # Read-only; safe to share between copies of the frames / dicts that hold it
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    @property
+    def empty(self) -> bool:
+        return len(self.records) == 0
+
+    @property
+    def ts_ns(self) -> np.ndarray:
+        return self.records["ts_ns"]
+
+    @classmethod
+    def from_arrays(cls, ts_ns, side_codes, size, price_ticks=None) -> "TradeTape":
+        rec = np.empty(len(ts_ns), dtype=TAPE_DTYPE)
+        rec["ts_ns"] = ts_ns
+        rec["side"] = side_codes
+        rec["size"] = size
+        rec["price_ticks"] = -1 if price_ticks is None else price_ticks
+        return cls(rec)
+
+    @classmethod
+    def from_frame(cls, trades_df: pd.DataFrame) -> "TradeTape":
+        """From the old trades_df layout (ts_recv, side "B"/"A"/other, size[, price_ticks])."""
+        if trades_df is None or len(trades_df) == 0:
+            return cls(np.zeros(0, dtype=TAPE_DTYPE))
+        ts = pd.to_datetime(trades_df["ts_recv"]).to_numpy(dtype="datetime64[ns]").astype(np.int64)
+        side = trades_df["side"].astype(str).to_numpy()
+        codes = np.where(side == "B", 1, np.where(side == "A", -1, 0))
+        px = trades_df["price_ticks"].to_numpy() if "price_ticks" in trades_df.columns else None
+        return cls.from_arrays(ts, codes, trades_df["size"].to_numpy(), px)
+
+    @classmethod
+    def coerce(cls, trades) -> Optional["TradeTape"]:
+        """TradeTape as-is, a trades DataFrame converted, None stays None."""
+        if trades is None or isinstance(trades, cls):
+            return trades
+        return cls.from_frame(trades)
+
+    def to_frame(self) -> pd.DataFrame:
+        """The old trades_df layout: ts_recv (datetime64), side ("B"/"A"/"N"), size, price_ticks."""
+        return pd.DataFrame({
+            "ts_recv": pd.to_datetime(np.asarray(self.records["ts_ns"]), unit="ns"),
+            "side": SIDE_LETTERS[np.asarray(self.records["side"])],
+            "size": np.asarray(self.records["size"]),
+            "price_ticks": np.asarray(self.records["price_ticks"]),
+        })
+
+    def _prefix_sums(self) -> None:
+        size = self.records["size"].astype(np.int64)
+        side = self.records["side"]
+        self._buy_cum = np.concatenate(([0], np.cumsum(np.where(side == 1, size, 0))))
+        self._sell_cum = np.concatenate(([0], np.cumsum(np.where(side == -1, size, 0))))
+
+    def prefix_sums(self) -> tuple:
+        """(buy, sell) cumulative aggressive volume, len(tape) + 1 each: window volume = cum[hi] - cum[lo]."""
+        if self._buy_cum is None:
+            self._prefix_sums()
+        return self._buy_cum, self._sell_cum
+
+    def window_volume(self, start_ns: int, end_ns: int) -> tuple:
+        """(buy volume, sell volume) of trades with start_ns <= ts_ns <= end_ns."""
+        if self._buy_cum is None:
+            self._prefix_sums()
+        ts = self.records["ts_ns"]
+        lo = int(np.searchsorted(ts, start_ns, side="left"))
+        hi = int(np.searchsorted(ts, end_ns, side="right"))
+        if hi <= lo:
+            return 0, 0
+        return int(self._buy_cum[hi] - self._buy_cum[lo]), int(self._sell_cum[hi] - self._sell_cum[lo])
+
+    def window_volumes(self, start_ns: np.ndarray, end_ns: np.ndarray) -> tuple:
+        """window_volume for many windows at once: (buy, sell) int64 arrays."""
+        if self._buy_cum is None:
+            self._prefix_sums()
+        ts = self.records["ts_ns"]
+        lo = np.searchsorted(ts, start_ns, side="left")
+        hi = np.maximum(np.searchsorted(ts, end_ns, side="right"), lo)
+        return self._buy_cum[hi] - self._buy_cum[lo], self._sell_cum[hi] - self._sell_cum[lo]
+
+    def save(self, path: Path) -> None:
+        np.save(path, np.asarray(self.records))
+
+    @classmethod
+    def open(cls, path: Path) -> "TradeTape":
+        """Memory-mapped (read-only) view of a saved tape."""
+        return cls(np.load(path, mmap_mode="r"))